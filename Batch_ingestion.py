@@ -0,0 +1,149 @@
+"""
+Модуль пакетной загрузки исходных данных с SFTP сервера.
+Файлы, подходящие под директорию или шаблон, загружаются несколькими
+SFTP каналами одного транспорта и разбираются параллельно, затем по порядку
+имен записываются в Исходные_данные_продаж - одна транзакция на файл.
+"""
+import time
+import fnmatch
+import posixpath
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from Input_schema import ORIGIN_SCHEMA, SchemaValidationError
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class BatchIngestor:
+    """
+    Пакетная загрузка файлов исходных данных с SFTP в БД.
+
+    Каждый поток пула открывает собственный SFTP канал в общем транспорте
+    SFTPDataLoader (без повторной аутентификации). Одновременно в памяти
+    находится не больше 2 * workers разобранных файлов: следующие файлы
+    загружаются по мере записи предыдущих в БД.
+    """
+
+    def __init__(self, sftp_loader, data_loader, workers=4, max_files=1000, batch_size=100000):
+        """
+        Args:
+            sftp_loader: Подключенный SFTPDataLoader
+            data_loader: DataLoader для записи в БД
+            workers: Количество параллельных загрузок и разборов файлов
+            max_files: Максимальное количество файлов в одном запросе
+            batch_size: Размер пакета вставки в БД
+        """
+        self.sftp_loader = sftp_loader
+        self.data_loader = data_loader
+        self.workers = max(1, workers)
+        self.max_files = max_files
+        self.batch_size = batch_size
+
+    def match_files(self, remote_pattern):
+        """
+        Список файлов по директории или шаблону (например /data/sales_2024-*.csv).
+        Для директории выбираются все CSV файлы. Файлы сортируются по имени.
+
+        Returns:
+            List[str]: Полные пути файлов на сервере
+        """
+        connector = self.sftp_loader.sftp_connector
+        if any(char in remote_pattern for char in '*?['):
+            directory, pattern = posixpath.split(remote_pattern)
+            directory = directory or '/'
+        else:
+            directory, pattern = remote_pattern, '*.csv'
+
+        files = sorted(name for name in connector.list_files(directory) if fnmatch.fnmatchcase(name, pattern))
+        if len(files) > self.max_files:
+            raise ValueError(f"Под шаблон {remote_pattern} подходит {len(files)} файлов, "
+                             f"допустимо не больше {self.max_files}")
+        logger.info(f"Под шаблон {remote_pattern} подходит {len(files)} файлов")
+        return [posixpath.join(directory, name) for name in files]
+
+    def _iter_frames(self, paths):
+        """
+        Генератор (путь, DataFrame или None, ошибка, время загрузки) в порядке paths.
+        Загрузка и разбор выполняются в пуле потоков с окном 2 * workers файлов.
+        """
+        connector = self.sftp_loader.sftp_connector
+        local = threading.local()
+        channels = []
+        channels_lock = threading.Lock()
+
+        def fetch(path):
+            start = time.perf_counter()
+            channel = getattr(local, 'channel', None)
+            if channel is None:
+                channel = local.channel = connector.open_channel()
+                with channels_lock:
+                    channels.append(channel)
+            try:
+                df = connector.download_csv_as_dataframe(path, sftp=channel, schema=ORIGIN_SCHEMA)
+                error = None if df is not None else "Не удалось загрузить или разобрать файл"
+            except SchemaValidationError as e:
+                df, error = None, f"Файл не соответствует схеме: {e}"
+            return path, df, error, time.perf_counter() - start
+
+        paths = iter(paths)
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sftp-batch') as executor:
+                for path in paths:
+                    pending.append(executor.submit(fetch, path))
+                    if len(pending) >= 2 * self.workers:
+                        break
+                while pending:
+                    yield pending.popleft().result()
+                    path = next(paths, None)
+                    if path is not None:
+                        pending.append(executor.submit(fetch, path))
+        finally:
+            for future in pending:
+                future.cancel()
+            for channel in channels:
+                try:
+                    channel.close()
+                except Exception as e:
+                    logger.debug(f"Ошибка при закрытии SFTP канала: {e}")
+
+    def ingest(self, remote_pattern, check_existing=False):
+        """
+        Загрузка всех файлов по шаблону в Исходные_данные_продаж.
+
+        Args:
+            remote_pattern: Директория или шаблон файлов на SFTP сервере
+            check_existing: Пропускать строки не новее последней даты в БД. Для
+                догрузки истории отключено: запись по ключу (Дата, Магазин, Товар)
+                выполняется через ON CONFLICT DO UPDATE и повторная загрузка безопасна
+
+        Returns:
+            List[dict]: Отчет по файлам: file, status (loaded, failed), rows, rows_loaded,
+                dropped_rows (строки с некорректной датой), fetch_seconds, load_seconds, error
+        """
+        report = []
+        for path, df, error, fetch_seconds in self._iter_frames(self.match_files(remote_pattern)):
+            status = {'file': path, 'status': 'failed', 'rows': 0, 'rows_loaded': 0, 'dropped_rows': 0,
+                      'fetch_seconds': round(fetch_seconds, 3), 'load_seconds': 0.0, 'error': error}
+            report.append(status)
+            if df is None:
+                continue
+            status['dropped_rows'] = df.attrs.get('input_report', {}).get('dropped_rows', 0)
+
+            status['rows'] = len(df)
+            start = time.perf_counter()
+            try:
+                status['rows_loaded'] = self.data_loader.load_to_origin_table(
+                    df, batch_size=self.batch_size, check_existing=check_existing, single_transaction=True)
+                status['status'] = 'loaded'
+            except Exception as e:
+                logger.error(f"Файл {path} не загружен в БД: {e}")
+                status['error'] = str(e)
+            status['load_seconds'] = round(time.perf_counter() - start, 3)
+
+        failed = sum(item['status'] == 'failed' for item in report)
+        logger.info(f"Пакетная загрузка {remote_pattern}: файлов {len(report)}, с ошибками {failed}")
+        return report
@@ -0,0 +1,114 @@
+"""
+Модуль кодирования категориальных признаков.
+Словарь категорий (codebook) переводит строки в int32-коды через хэш-индекс
+и обратно через массив категорий, заменяя sklearn LabelEncoder.
+"""
+import numpy as np
+import pandas as pd
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class CategoricalCodebook:
+    """
+    Словарь категорий одного признака.
+
+    Категории хранятся отсортированными, поэтому коды совпадают с кодами
+    LabelEncoder, обученного на тех же значениях, и модели, обученные со старыми
+    энкодерами, продолжают работать после конвертации.
+    """
+
+    # Код для значений, отсутствующих в словаре
+    UNKNOWN = -1
+
+    def __init__(self, classes):
+        """
+        Args:
+            classes: Уникальные категории в порядке их кодов
+        """
+        self.classes = np.asarray(classes, dtype=object)
+        self._index = None
+
+    @classmethod
+    def fit(cls, values):
+        """Строит словарь по значениям признака (значения приводятся к строкам)"""
+        values = pd.Series(values, copy=False).astype(str)
+        return cls(np.sort(values.unique()))
+
+    @classmethod
+    def from_encoder(cls, encoder):
+        """
+        Возвращает словарь для сохраненного энкодера.
+        Энкодеры LabelEncoder из старых записей конвертируются по classes_.
+        """
+        if isinstance(encoder, cls):
+            return encoder
+        if hasattr(encoder, 'classes_'):
+            logger.debug("Энкодер LabelEncoder конвертирован в CategoricalCodebook")
+            return cls(np.asarray(encoder.classes_).astype(str))
+        raise TypeError(f"Неподдерживаемый тип энкодера: {type(encoder).__name__}")
+
+    @property
+    def index(self):
+        """Хэш-индекс категория -> код (строится при первом обращении)"""
+        if self._index is None:
+            self._index = pd.Index(self.classes)
+        return self._index
+
+    @property
+    def classes_(self):
+        """Категории в формате LabelEncoder.classes_"""
+        return self.classes
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __getstate__(self):
+        # Хэш-индекс не сериализуется - он восстанавливается по classes
+        return {'classes': self.classes}
+
+    def __setstate__(self, state):
+        self.classes = state['classes']
+        self._index = None
+
+    def encode(self, values):
+        """
+        Кодирует значения за один проход по хэш-индексу.
+
+        Returns:
+            tuple: (codes, known) - int32-коды (UNKNOWN для неизвестных значений)
+                и булева маска известных значений
+        """
+        codes = self.index.get_indexer(np.asarray(values, dtype=object)).astype(np.int32)
+        return codes, codes != self.UNKNOWN
+
+    def decode(self, codes, missing=None):
+        """
+        Декодирует коды в категории.
+        Коды вне словаря (в том числе UNKNOWN) заменяются на missing.
+        """
+        codes = np.asarray(codes)
+        known = (codes >= 0) & (codes < len(self.classes))
+        if known.all():
+            return self.classes[codes]
+
+        result = np.full(len(codes), missing, dtype=object)
+        result[known] = self.classes[codes[known]]
+        return result
+
+    def transform(self, values):
+        """Кодирует значения; неизвестные значения вызывают ValueError (как в LabelEncoder)"""
+        codes, known = self.encode(values)
+        if not known.all():
+            unseen = pd.unique(np.asarray(values, dtype=object)[~known])
+            raise ValueError(f"Неизвестные значения: {list(unseen[:10])}")
+        return codes
+
+    def inverse_transform(self, codes):
+        """Декодирует коды; коды вне словаря вызывают ValueError (как в LabelEncoder)"""
+        codes = np.asarray(codes)
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(self.classes)):
+            raise ValueError("Коды вне словаря категорий")
+        return self.classes[codes]
@@ -3,10 +3,12 @@
 Предоставляет классы и функции для работы с базой данных.
 """
 import psycopg2
-from sqlalchemy import create_engine
 import logging
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import sqlalchemy
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -67,7 +69,7 @@ class DBConnector:
             logger.error(f"Неожиданная ошибка при подключении к БД: {e}")
             raise
 
-    def get_sqlalchemy_engine(self) -> create_engine:
+    def get_sqlalchemy_engine(self) -> "sqlalchemy.engine.Engine":
         """
         Возвращает SQLAlchemy engine для работы с pandas.
         
@@ -77,6 +79,8 @@ class DBConnector:
         Raises:
             Exception: При ошибке создания engine
         """
+        # sqlalchemy нужен только здесь, импорт не замедляет запуск API
+        from sqlalchemy import create_engine
         try:
             # Безопасное формирование строки подключения
             connection_string = (
@@ -5,11 +5,17 @@
 from DB_Connector import DBConnector
 import pickle
 import gzip
+import os
+import struct
+import tempfile
 import pandas as pd
 import time
 import datetime
 import logging
 from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+from Forecast_cache import forecast_cache
+from Feature_store import FEATURES_TABLE, STATE_TABLE, LAG_FEATURES
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -331,12 +337,32 @@ class Create_tables:
                                 label_encoder_mnn BYTEA NOT NULL,
                                 minmax_scaler BYTEA NOT NULL,
                                 catboost_model BYTEA NOT NULL,
+                                catboost_model_cbm BYTEA NULL,
+                                artifact_codec VARCHAR(16) NULL,
+                                artifact_format_version SMALLINT NULL,
+                                train_cutoff DATE NULL,
+                                segment_column VARCHAR(50) NULL,
                                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                                 comment TEXT
                             )
                         """)
                         logger.info(f"Таблица {table_name} успешно создана")
 
+                    # Столбцы, добавленные после первой версии таблицы
+                    new_columns = {
+                        'catboost_model_cbm': 'BYTEA NULL',
+                        'artifact_codec': 'VARCHAR(16) NULL',
+                        'artifact_format_version': 'SMALLINT NULL',
+                        'train_cutoff': 'DATE NULL',
+                        'segment_column': 'VARCHAR(50) NULL',
+                    }
+
+                    for column, column_type in new_columns.items():
+                        cursor.execute(f"""
+                            ALTER TABLE "{table_name}"
+                            ADD COLUMN IF NOT EXISTS {column} {column_type};
+                        """)
+
                     # Проверка существования индексов
                     indexes_to_create = {
                         'load_id_idx': '"load_id"',
@@ -442,6 +468,164 @@ class Create_tables:
             logger.error(f"Ошибка при работе с таблицей {table_name}: {e}", exc_info=True)
             raise
 
+    def create_metrics_table(self, db_connector):
+        """Создает таблицу Метрики_модели если она не существует"""
+        table_name = "Метрики_модели"
+
+        try:
+            with db_connector.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Проверка существования таблицы
+                    cursor.execute("""
+                        SELECT EXISTS (
+                            SELECT FROM information_schema.tables 
+                            WHERE table_name = %s
+                            AND table_schema = current_schema()
+                        );
+                    """, (table_name,))
+
+                    table_exists = cursor.fetchone()[0]
+
+                    if not table_exists:
+                        # Создание таблицы: метрики хранятся по load_id модели,
+                        # scope - summary, store, category, histogram_true, histogram_pred
+                        cursor.execute(f"""
+                            CREATE TABLE "{table_name}" (
+                                metric_id SERIAL PRIMARY KEY,
+                                load_id int4 NOT NULL REFERENCES "ML_данные_для_работы_модели" (load_id) ON DELETE CASCADE,
+                                scope varchar(20) NOT NULL,
+                                group_key text NULL,
+                                metrics JSONB NOT NULL,
+                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                            )
+                        """)
+                        logger.info(f"Таблица {table_name} успешно создана")
+
+                    # Проверка существования индексов
+                    indexes_to_create = {
+                        'load_id_idx_metrics': '"load_id", "scope"',
+                    }
+
+                    created_indexes = 0
+
+                    for index_name, column in indexes_to_create.items():
+                        cursor.execute(f"""
+                            SELECT EXISTS (
+                                SELECT FROM pg_indexes 
+                                WHERE indexname = %s 
+                                AND tablename = %s
+                            );
+                        """, (index_name, table_name))
+
+                        if not cursor.fetchone()[0]:
+                            cursor.execute(f"""
+                                CREATE INDEX {index_name} 
+                                ON "{table_name}" ({column});
+                            """)
+                            created_indexes += 1
+
+                    if created_indexes > 0:
+                        logger.info(f"Создано {created_indexes} новых индекса для таблицы {table_name}")
+                    else:
+                        if table_exists:
+                            logger.debug(f"Таблица {table_name} и все индексы уже существуют")
+
+                    conn.commit()
+
+        except Exception as e:
+            logger.error(f"Ошибка при работе с таблицей {table_name}: {e}", exc_info=True)
+            raise
+
+    def create_processed_files_table(self, db_connector):
+        """Создает таблицу Обработанные_файлы если она не существует"""
+        table_name = "Обработанные_файлы"
+
+        try:
+            with db_connector.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Файл определяется путем, размером и временем изменения на SFTP:
+                    # перезаписанный файл с тем же именем обрабатывается заново
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS "{table_name}" (
+                            file_path text NOT NULL,
+                            file_size int8 NOT NULL,
+                            file_mtime int8 NOT NULL,
+                            status varchar(20) NOT NULL,
+                            attempts int4 NOT NULL DEFAULT 1,
+                            rows_count int4 NULL,
+                            error text NULL,
+                            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            CONSTRAINT processed_files_pk PRIMARY KEY (file_path, file_size, file_mtime)
+                        )
+                    """)
+                    conn.commit()
+                    logger.debug(f"Таблица {table_name} готова")
+
+        except Exception as e:
+            logger.error(f"Ошибка при работе с таблицей {table_name}: {e}", exc_info=True)
+            raise
+
+    def create_seasonality_table(self, db_connector):
+        """Создает таблицу Сезонность_товаров если она не существует"""
+        table_name = "Сезонность_товаров"
+
+        try:
+            with db_connector.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Сезонность пар, определенная при первичной предобработке истории
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS "{table_name}" (
+                            "Магазин" varchar(50) NOT NULL,
+                            "Товар" varchar(50) NOT NULL,
+                            "Сезонность" varchar(20) NOT NULL,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            CONSTRAINT seasonality_pk PRIMARY KEY ("Магазин", "Товар")
+                        )
+                    """)
+                    conn.commit()
+                    logger.debug(f"Таблица {table_name} готова")
+
+        except Exception as e:
+            logger.error(f"Ошибка при работе с таблицей {table_name}: {e}", exc_info=True)
+            raise
+
+    def create_lag_features_table(self, db_connector):
+        """Создает таблицы Признаки_лагов и Состояние_окон_признаков если они не существуют"""
+        table_name = FEATURES_TABLE
+
+        try:
+            with db_connector.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Лаговые признаки следующего дня пар (Feature_store.LagFeatureStore);
+                    # float8, чтобы прочитанные признаки совпадали с пересчитанными
+                    features = ',\n'.join(f'"{col}" float8 NULL' for col in LAG_FEATURES)
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS "{table_name}" (
+                            "Дата" date NOT NULL,
+                            "Магазин" varchar(50) NOT NULL,
+                            "Товар" varchar(50) NOT NULL,
+                            {features},
+                            CONSTRAINT lag_features_pk PRIMARY KEY ("Дата", "Магазин", "Товар")
+                        )
+                    """)
+                    # Состояние окон признаков (RollingState) - одна запись
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS "{STATE_TABLE}" (
+                            state_id int4 NOT NULL,
+                            data bytea NOT NULL,
+                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            CONSTRAINT rolling_state_pk PRIMARY KEY (state_id)
+                        )
+                    """)
+                    conn.commit()
+                    logger.debug(f"Таблица {table_name} готова")
+
+        except Exception as e:
+            logger.error(f"Ошибка при работе с таблицей {table_name}: {e}", exc_info=True)
+            raise
+
+
+
 class DataLoader:
     def __init__(self, db_connector):
         self.db = db_connector
@@ -792,7 +976,8 @@ class DataLoader:
             logger.info("Продолжаем загрузку без проверки существующих данных")
             return df
 
-    def load_data(self, df, table_name, batch_size=100000, on_conflict_update=True, check_existing=True):
+    def load_data(self, df, table_name, batch_size=100000, on_conflict_update=True, check_existing=True,
+                  single_transaction=False):
         """
         Универсальный метод для загрузки данных в указанную таблицу
 
@@ -801,6 +986,9 @@ class DataLoader:
         :param batch_size: Размер пакета для вставки
         :param on_conflict_update: Обновлять существующие записи при конфликте
         :param check_existing: Проверять существующие данные перед загрузкой
+        :param single_transaction: Фиксировать все пакеты одной транзакцией
+            (при ошибке DataFrame не загружается частично)
+        :return: Количество записанных строк
         """
         try:
             if table_name not in self.table_configs:
@@ -815,7 +1003,7 @@ class DataLoader:
                 # Если нет новых данных для загрузки
                 if len(df) == 0:
                     logger.info(f"Все данные уже существуют в таблице {table_name}")
-                    return
+                    return 0
                 elif len(df) < len(df_original):
                     logger.info(f"Загружаем только недостающие записи: {len(df)} из {len(df_original)}")
 
@@ -864,19 +1052,28 @@ class DataLoader:
                                    for _, row in batch.iterrows()]
 
                         cursor.executemany(insert_sql, records)
-                        conn.commit()
+                        if not single_transaction:
+                            conn.commit()
                         logger.debug(f"Загружено {min(i + batch_size, len(df))}/{len(df)} записей в {table_name}")
 
+                    if single_transaction:
+                        conn.commit()
                     logger.info(f"Успешно загружено {len(df)} записей в {table_name}")
 
+            # Прогнозы записанных ключей (Дата, Магазин) больше не актуальны в кэше чтения
+            if table_name == "Прогноз":
+                forecast_cache.invalidate(zip(df['Дата'], df['Магазин']))
+            return len(df)
+
         except Exception as e:
             logger.error(f"Ошибка при загрузке данных в {table_name}: {str(e)}", exc_info=True)
             raise
 
     # Специализированные методы для удобства
-    def load_to_origin_table(self, df, batch_size=100000, check_existing=True):
+    def load_to_origin_table(self, df, batch_size=100000, check_existing=True, single_transaction=False):
         """Загрузка в Исходные_данные_продаж"""
-        self.load_data(df, "Исходные_данные_продаж", batch_size, check_existing=check_existing)
+        return self.load_data(df, "Исходные_данные_продаж", batch_size, check_existing=check_existing,
+                              single_transaction=single_transaction)
 
     def load_to_enriched_table(self, df, batch_size=100000, check_existing=True):
         """Загрузка в Обогащённые_данные_продаж"""
@@ -906,30 +1103,319 @@ class DataLoader:
         """Принудительная загрузка в таблицу Прогноз (без проверки существующих)"""
         self.load_data(df, "Прогноз", batch_size, check_existing=False)
 
+# Столбцы с артефактами модели в порядке, в котором их возвращает load_latest_models
+ARTIFACT_COLUMNS = (
+    'label_encoder_product',
+    'label_encoder_shop',
+    'label_encoder_category',
+    'label_encoder_potreb_group',
+    'label_encoder_mnn',
+    'minmax_scaler',
+    'catboost_model',
+)
+
+# Формат артефакта: заголовок + данные, сжатые кодеком.
+# Заголовок: сигнатура, версия формата, идентификатор кодека,
+# размер исходных данных и размер сжатых данных (big-endian)
+ARTIFACT_MAGIC = b'MLAF'
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_HEADER = struct.Struct('>4sBBQQ')
+ARTIFACT_CODECS = {'none': 0, 'gzip': 1, 'zstd': 2, 'lz4': 3}
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _import_codec_module(codec):
+    """Импортирует необязательную библиотеку сжатия для кодеков zstd и lz4"""
+    try:
+        if codec == 'zstd':
+            import zstandard
+            return zstandard
+        import lz4.frame
+        return lz4.frame
+    except ImportError:
+        package = 'zstandard' if codec == 'zstd' else 'lz4'
+        raise ImportError(f"Для кодека {codec} требуется пакет {package}: pip install {package}")
+
+
+def pack_artifact(payload, codec='none'):
+    """
+    Упаковывает байты артефакта в версионированный формат с заголовком.
+
+    Args:
+        payload: Сериализованный артефакт (bytes)
+        codec: Кодек сжатия - none, gzip, zstd или lz4
+
+    Returns:
+        bytes: Заголовок и сжатые данные
+    """
+    if codec not in ARTIFACT_CODECS:
+        raise ValueError(f"Неизвестный кодек артефакта: {codec}. Допустимые: {', '.join(ARTIFACT_CODECS)}")
+
+    if codec == 'gzip':
+        data = gzip.compress(payload)
+    elif codec == 'zstd':
+        data = _import_codec_module(codec).ZstdCompressor(level=3).compress(payload)
+    elif codec == 'lz4':
+        data = _import_codec_module(codec).compress(payload)
+    else:
+        data = payload
+
+    header = ARTIFACT_HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_FORMAT_VERSION, ARTIFACT_CODECS[codec], len(payload), len(data))
+    return header + data
+
+
+def unpack_artifact(data):
+    """
+    Распаковывает артефакт, сохраненный pack_artifact.
+
+    Записи, сохраненные до появления формата с заголовком, распознаются
+    по содержимому: gzip - по сигнатуре 1f 8b, иначе данные возвращаются как есть.
+
+    Returns:
+        bytes: Исходные байты артефакта
+    """
+    data = bytes(data)
+
+    if not data.startswith(ARTIFACT_MAGIC):
+        if data.startswith(GZIP_MAGIC):
+            return gzip.decompress(data)
+        return data
+
+    magic, version, codec_id, raw_size, data_size = ARTIFACT_HEADER.unpack_from(data)
+    if version > ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Версия формата артефакта {version} не поддерживается (максимум {ARTIFACT_FORMAT_VERSION})")
+
+    codecs_by_id = {codec_id: name for name, codec_id in ARTIFACT_CODECS.items()}
+    codec = codecs_by_id.get(codec_id)
+    if codec is None:
+        raise ValueError(f"Неизвестный идентификатор кодека артефакта: {codec_id}")
+
+    body = data[ARTIFACT_HEADER.size:]
+    if len(body) != data_size:
+        raise ValueError(f"Артефакт поврежден: ожидалось {data_size} байт данных, получено {len(body)}")
+
+    if codec == 'gzip':
+        payload = gzip.decompress(body)
+    elif codec == 'zstd':
+        payload = _import_codec_module(codec).ZstdDecompressor().decompress(body, max_output_size=raw_size)
+    elif codec == 'lz4':
+        payload = _import_codec_module(codec).decompress(body)
+    else:
+        payload = body
+
+    if len(payload) != raw_size:
+        raise ValueError(f"Артефакт поврежден: ожидалось {raw_size} байт после распаковки, получено {len(payload)}")
+
+    return payload
+
+
+class ModelArtifacts:
+    """
+    Набор артефактов одной записи ML_данные_для_работы_модели.
+
+    Артефакты выгружаются из БД и десериализуются лениво - при первом обращении,
+    поэтому, например, для декодирования Товар/Магазин не нужно загружать модель.
+    """
+
+    def __init__(self, storage, load_id, codec=None, has_native=False, prefer_native=True, created_at=None, comment=None, train_cutoff=None, segment_column=None):
+        self.storage = storage
+        self.load_id = load_id
+        self.codec = codec
+        self.has_native = has_native
+        self.prefer_native = prefer_native
+        self.created_at = created_at
+        self.comment = comment
+        self.train_cutoff = train_cutoff
+        self.segment_column = segment_column
+        self._cache = {}
+
+    def _source_column(self, name):
+        """Столбец БД, из которого загружается артефакт"""
+        if name == 'catboost_model' and self.prefer_native and self.has_native:
+            return 'catboost_model_cbm'
+        return name
+
+    def prefetch(self, names=ARTIFACT_COLUMNS):
+        """Загружает еще не загруженные артефакты одним запросом"""
+        for name in names:
+            if name not in ARTIFACT_COLUMNS:
+                raise KeyError(f"Неизвестный артефакт: {name}")
+
+        missing = [name for name in names if name not in self._cache]
+        if not missing:
+            return self
+
+        columns = [self._source_column(name) for name in missing]
+        row = self.storage._fetch_columns(self.load_id, columns)
+        for name, column, data in zip(missing, columns, row):
+            self._cache[name] = self.storage._read_artifact(column, data)
+        return self
+
+    def get(self, name):
+        """Возвращает артефакт, загружая его при первом обращении"""
+        if name not in self._cache:
+            self.prefetch((name,))
+        return self._cache[name]
+
+    @property
+    def label_encoder_product(self):
+        return self.get('label_encoder_product')
+
+    @property
+    def label_encoder_shop(self):
+        return self.get('label_encoder_shop')
+
+    @property
+    def label_encoder_category(self):
+        return self.get('label_encoder_category')
+
+    @property
+    def label_encoder_potreb_group(self):
+        return self.get('label_encoder_potreb_group')
+
+    @property
+    def label_encoder_mnn(self):
+        return self.get('label_encoder_mnn')
+
+    @property
+    def scaler(self):
+        return self.get('minmax_scaler')
+
+    @property
+    def catboost_model(self):
+        return self.get('catboost_model')
+
+    def as_tuple(self):
+        """Все артефакты в порядке ARTIFACT_COLUMNS (загружаются одним запросом)"""
+        self.prefetch()
+        return tuple(self._cache[name] for name in ARTIFACT_COLUMNS)
+
+
 class ModelStorage:
     def __init__(self, db_connector):
         self.db = db_connector
 
-    def _compress(self, data):
-        """Сжимает данные с помощью gzip"""
-        
-        return gzip.compress(pickle.dumps(data))
+    def _serialize_native(self, catboost_model):
+        """Сериализует модель CatBoost в нативный бинарный формат (cbm)"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_path = os.path.join(tmp_dir, 'model.cbm')
+            catboost_model.save_model(model_path, format='cbm')
+            with open(model_path, 'rb') as f:
+                return f.read()
+
+    def _deserialize_native(self, data):
+        """Загружает модель CatBoost из нативного бинарного формата (cbm)"""
+        import catboost as cb
+
+        model = cb.CatBoostRegressor()
+        model.load_model(blob=bytes(data))
+        return model
+
+    def _read_artifact(self, column, data):
+        """Распаковывает и десериализует артефакт из указанного столбца"""
+        if data is None:
+            raise ValueError(f"Артефакт {column} отсутствует в записи")
+
+        payload = unpack_artifact(data)
+        if column == 'catboost_model_cbm':
+            logger.debug("Модель CatBoost загружается из нативного формата")
+            return self._deserialize_native(payload)
+        return pickle.loads(payload)
+
+    def _fetch_columns(self, load_id, columns):
+        """Выгружает указанные BYTEA-столбцы одной записи"""
+        query = sql.SQL('SELECT {} FROM "ML_данные_для_работы_модели" WHERE load_id = %s').format(
+            sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+        )
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (load_id,))
+                    row = cursor.fetchone()
+                    if row is None:
+                        raise ValueError(f"Модели с ID {load_id} не найдены в таблице ML_данные_для_работы_модели")
+                    return row
+        except Exception as e:
+            logger.error(f"Ошибка загрузки артефактов {', '.join(columns)}: {str(e)}", exc_info=True)
+            raise
+
+    def _open_models(self, load_id=None, prefer_native=True):
+        """Читает метаданные записи (последней или по ID) без выгрузки артефактов"""
+        where = "WHERE load_id = %s" if load_id is not None else ""
+        params = (load_id,) if load_id is not None else ()
 
-    def _decompress(self, data):
-        """Распаковывает данные, сжатые gzip"""
-        return pickle.loads(gzip.decompress(data))
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT load_id, artifact_codec, catboost_model_cbm IS NOT NULL, created_at, comment, train_cutoff, segment_column
+                        FROM "ML_данные_для_работы_модели"
+                        {where}
+                        ORDER BY load_id DESC
+                        LIMIT 1
+                    """, params)
+
+                    result = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки: {str(e)}", exc_info=True)
+            raise
 
-    def save_models(self, label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, catboost_model, comment=None, compress=False):
+        if result is None:
+            if load_id is not None:
+                raise ValueError(f"Модели с ID {load_id} не найдены в таблице ML_данные_для_работы_модели")
+            raise ValueError("В таблице ML_данные_для_работы_модели нет сохраненных моделей")
+
+        return ModelArtifacts(
+            self,
+            load_id=result[0],
+            codec=result[1],
+            has_native=result[2],
+            prefer_native=prefer_native,
+            created_at=result[3],
+            comment=result[4],
+            train_cutoff=result[5],
+            segment_column=result[6]
+        )
+
+    def open_latest_models(self, prefer_native=True):
+        """
+        Возвращает ModelArtifacts последнего набора моделей.
+        Артефакты загружаются из БД только при обращении к ним.
+        """
+        return self._open_models(prefer_native=prefer_native)
+
+    def open_models_by_id(self, load_id, prefer_native=True):
+        """Возвращает ModelArtifacts набора моделей с указанным ID"""
+        return self._open_models(load_id=load_id, prefer_native=prefer_native)
+
+    def save_models(self, label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, catboost_model, comment=None, compress=False, save_native=True, codec=None, train_cutoff=None):
         """
         Сохраняет все энкодеры, скалер и модель CatBoost в таблицу ML_данные_для_работы_модели
+
+        Каждый артефакт сохраняется с заголовком, в котором указаны кодек сжатия
+        (none, gzip, zstd, lz4) и размер данных; кодек также записывается в artifact_codec.
+        compress=True без явного codec соответствует кодеку gzip.
+
+        При save_native=True модель дополнительно сохраняется в нативном формате
+        CatBoost (catboost_model_cbm): он загружается быстрее, чем pickle.
+        train_cutoff - последняя дата данных, на которых обучена модель
+        (от нее считаются новые дни при дообучении).
+
+        Набор моделей сегментов (SegmentedModel) сохраняется одной записью в столбце
+        catboost_model, столбец сегментации записывается в segment_column;
+        нативный формат для него не используется.
         """
+        if codec is None:
+            codec = 'gzip' if compress else 'none'
+        if codec not in ARTIFACT_CODECS:
+            raise ValueError(f"Неизвестный кодек артефакта: {codec}. Допустимые: {', '.join(ARTIFACT_CODECS)}")
 
         try:
             with self.db.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    # Сериализация и (опционально) сжатие моделей
+                    # Сериализация и сжатие артефактов
                     def serializer(obj):
-                        return self._compress(obj) if compress else pickle.dumps(obj)
+                        return pack_artifact(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), codec)
 
                     product_bytes = serializer(label_encoder_product)
                     shop_bytes = serializer(label_encoder_shop)
@@ -938,52 +1424,35 @@ class ModelStorage:
                     mnn_bytes = serializer(label_encoder_mnn)
                     scaler_bytes = serializer(scaler)
                     catboost_bytes = serializer(catboost_model)
+                    segment_column = getattr(catboost_model, 'segment_column', None)
+                    save_native = save_native and segment_column is None
+                    catboost_native_bytes = pack_artifact(self._serialize_native(catboost_model), codec) if save_native else None
 
                     cursor.execute("""
                         INSERT INTO "ML_данные_для_работы_модели" 
-                        (label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, minmax_scaler, catboost_model, comment)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        (label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, minmax_scaler, catboost_model, catboost_model_cbm, artifact_codec, artifact_format_version, train_cutoff, segment_column, comment)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                         RETURNING load_id
-                    """, (product_bytes, shop_bytes, category_bytes, potreb_group_bytes, mnn_bytes, scaler_bytes, catboost_bytes, comment))
+                    """, (product_bytes, shop_bytes, category_bytes, potreb_group_bytes, mnn_bytes, scaler_bytes, catboost_bytes, catboost_native_bytes, codec, ARTIFACT_FORMAT_VERSION, train_cutoff, segment_column, comment))
 
                     load_id = cursor.fetchone()[0]
                     conn.commit()
-                    logger.info(f"Модели и энкодеры сохранены в таблицу ML_данные_для_работы_модели под ID: {load_id}")
+                    logger.info(f"Модели и энкодеры сохранены в таблицу ML_данные_для_работы_модели под ID: {load_id} (кодек: {codec})")
                     return load_id
         except Exception as e:
             logger.error(f"Ошибка сохранения: {str(e)}", exc_info=True)
             raise
 
-    def load_latest_models(self, compressed=False):
+    def load_latest_models(self, compressed=None, prefer_native=True):
         """
         Загружает последний набор моделей и энкодеров из таблицы
-        """
-        try:
-            with self.db.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, minmax_scaler, catboost_model
-                        FROM "ML_данные_для_работы_модели"
-                        ORDER BY load_id DESC
-                        LIMIT 1
-                    """)
 
-                    result = cursor.fetchone()
-                    if result:
-                        def deserializer(data):
-                            return self._decompress(data) if compressed else pickle.loads(data)
-                        label_encoder_product = deserializer(result[0])
-                        label_encoder_shop = deserializer(result[1])
-                        label_encoder_category = deserializer(result[2])
-                        label_encoder_potreb_group = deserializer(result[3])
-                        label_encoder_mnn = deserializer(result[4])
-                        scaler = deserializer(result[5])
-                        catboost_model = deserializer(result[6])
-                        return (label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, catboost_model)
-                    raise ValueError("В таблице ML_данные_для_работы_модели нет сохраненных моделей")
-        except Exception as e:
-            logger.error(f"Ошибка загрузки: {str(e)}", exc_info=True)
-            raise
+        Кодек определяется по заголовку артефакта, параметр compressed
+        оставлен для совместимости и не используется.
+        При prefer_native=True модель CatBoost берется из нативного формата (если он
+        сохранен), pickle-версия модели в этом случае из БД не выгружается.
+        """
+        return self.open_latest_models(prefer_native=prefer_native).as_tuple()
 
 
     def delete_models(self, load_id):
@@ -1023,38 +1492,212 @@ class ModelStorage:
             logger.error(f"Ошибка проверки таблицы: {str(e)}", exc_info=True)
             return False
 
-    def load_models_by_id(self, load_id, compressed=False):
+    def load_models_by_id(self, load_id, compressed=None, prefer_native=True):
         """
         Загружает модели и энкодеры по конкретному ID из таблицы
         """
-        import pickle
-        import gzip
+        return self.open_models_by_id(load_id, prefer_native=prefer_native).as_tuple()
+
+
+class MetricsStorage:
+    """Хранение метрик точности модели в таблице Метрики_модели по load_id"""
+
+    # Разделы отчета ForecastEvaluator с разбивкой по группам
+    GROUP_SCOPES = {'by_store': 'store', 'by_category': 'category'}
+
+    def __init__(self, db_connector):
+        self.db = db_connector
+
+    def save_metrics(self, load_id, report):
+        """
+        Сохраняет отчет ForecastEvaluator.evaluate для модели load_id.
+
+        Returns:
+            int: Количество сохраненных строк
+        """
+        rows = [(load_id, 'summary', None, Json(report['summary']))]
+
+        for report_key, scope in self.GROUP_SCOPES.items():
+            if report_key in report:
+                for record in report[report_key].to_dict('records'):
+                    group_key = str(record.pop('Группа'))
+                    record = {key: (value.item() if hasattr(value, 'item') else value) for key, value in record.items()}
+                    rows.append((load_id, scope, group_key, Json(record)))
+
+        for scope in ('histogram_true', 'histogram_pred'):
+            if scope in report:
+                histogram = {str(value): count for value, count in report[scope].items()}
+                rows.append((load_id, scope, None, Json(histogram)))
+
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    execute_values(cursor, """
+                        INSERT INTO "Метрики_модели" (load_id, scope, group_key, metrics)
+                        VALUES %s
+                    """, rows)
+                    conn.commit()
+                    logger.info(f"Метрики модели ID {load_id} сохранены ({len(rows)} строк)")
+                    return len(rows)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения метрик: {str(e)}", exc_info=True)
+            raise
+
+    def load_metrics(self, load_id):
+        """
+        Загружает метрики модели load_id в формате отчета ForecastEvaluator.
+
+        Returns:
+            dict: summary, by_store / by_category (DataFrame), histogram_true / histogram_pred
+        """
         try:
             with self.db.get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("""
-                        SELECT label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, minmax_scaler, catboost_model
-                        FROM "ML_данные_для_работы_модели"
+                        SELECT scope, group_key, metrics
+                        FROM "Метрики_модели"
                         WHERE load_id = %s
+                        ORDER BY metric_id
                     """, (load_id,))
+                    rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки метрик: {str(e)}", exc_info=True)
+            raise
 
-                    result = cursor.fetchone()
-                    if result:
-                        def deserializer(data):
-                            return self._decompress(data) if compressed else pickle.loads(data)
-                        label_encoder_product = deserializer(result[0])
-                        label_encoder_shop = deserializer(result[1])
-                        label_encoder_category = deserializer(result[2])
-                        label_encoder_potreb_group = deserializer(result[3])
-                        label_encoder_mnn = deserializer(result[4])
-                        scaler = deserializer(result[5])
-                        catboost_model = deserializer(result[6])
-                        return (label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, catboost_model)
-                    raise ValueError(f"Модели с ID {load_id} не найдены в таблице ML_данные_для_работы_модели")
+        if not rows:
+            raise ValueError(f"Метрики модели ID {load_id} не найдены в таблице Метрики_модели")
+
+        report = {}
+        groups = {scope: [] for scope in self.GROUP_SCOPES.values()}
+        for scope, group_key, metrics in rows:
+            if scope in groups:
+                groups[scope].append({'Группа': group_key, **metrics})
+            elif scope.startswith('histogram'):
+                report[scope] = {int(value): count for value, count in metrics.items()}
+            else:
+                report[scope] = metrics
+
+        for report_key, scope in self.GROUP_SCOPES.items():
+            if groups[scope]:
+                report[report_key] = pd.DataFrame(groups[scope])
+        return report
+
+class ProcessedFilesRegistry:
+    """Учет файлов SFTP, обработанных наблюдателем директории, в таблице Обработанные_файлы"""
+
+    def __init__(self, db_connector):
+        self.db = db_connector
+
+    def load(self, file_paths):
+        """
+        Возвращает состояние файлов.
+
+        Returns:
+            dict: {(путь, размер, mtime): (status, attempts)}
+        """
+        if not file_paths:
+            return {}
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT file_path, file_size, file_mtime, status, attempts
+                        FROM "Обработанные_файлы"
+                        WHERE file_path = ANY(%s)
+                    """, (list(file_paths),))
+                    return {(path, size, mtime): (status, attempts)
+                            for path, size, mtime, status, attempts in cursor.fetchall()}
         except Exception as e:
-            logger.error(f"Ошибка загрузки: {str(e)}", exc_info=True)
+            logger.error(f"Ошибка чтения таблицы Обработанные_файлы: {str(e)}", exc_info=True)
+            raise
+
+    def mark(self, file_path, file_size, file_mtime, status, rows_count=None, error=None):
+        """Записывает результат обработки файла (повторная попытка увеличивает attempts)"""
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO "Обработанные_файлы"
+                            (file_path, file_size, file_mtime, status, rows_count, error)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (file_path, file_size, file_mtime) DO UPDATE SET
+                            status = EXCLUDED.status,
+                            attempts = "Обработанные_файлы".attempts + 1,
+                            rows_count = EXCLUDED.rows_count,
+                            error = EXCLUDED.error,
+                            processed_at = CURRENT_TIMESTAMP
+                    """, (file_path, file_size, file_mtime, status, rows_count, error))
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка записи в таблицу Обработанные_файлы: {str(e)}", exc_info=True)
             raise
 
+
+class SeasonalityStorage:
+    """
+    Сезонность пар Магазин+Товар в таблице Сезонность_товаров: записывается
+    при первичной предобработке и читается при прогнозе вместо вычисления
+    по восстановленным данным.
+    """
+
+    def __init__(self, db_connector):
+        self.db = db_connector
+
+    def save(self, seasonality, replace=True):
+        """
+        Записывает сезонность пар (Preprocessing_data.seasonality_table).
+
+        Args:
+            seasonality: DataFrame со столбцами Магазин, Товар, Сезонность
+            replace: Очистить таблицу перед записью (False - обновить только переданные пары)
+
+        Returns:
+            int: Количество записанных пар
+        """
+        rows = list(zip(seasonality['Магазин'].astype(str), seasonality['Товар'].astype(str),
+                        seasonality['Сезонность'].astype(str)))
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    if replace:
+                        cursor.execute('TRUNCATE "Сезонность_товаров"')
+                    execute_values(cursor, """
+                        INSERT INTO "Сезонность_товаров" ("Магазин", "Товар", "Сезонность")
+                        VALUES %s
+                        ON CONFLICT ("Магазин", "Товар") DO UPDATE SET
+                            "Сезонность" = EXCLUDED."Сезонность",
+                            updated_at = CURRENT_TIMESTAMP
+                    """, rows, page_size=10000)
+                    conn.commit()
+                    logger.info(f"Сезонность сохранена: {len(rows)} пар")
+                    return len(rows)
+        except Exception as e:
+            logger.error(f"Ошибка записи в таблицу Сезонность_товаров: {str(e)}", exc_info=True)
+            raise
+
+    def load(self):
+        """
+        Читает сезонность пар.
+
+        Returns:
+            pd.DataFrame: Магазин, Товар, Сезонность или None, если таблицы нет или она пуста
+        """
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT to_regclass(%s)", ('"Сезонность_товаров"',))
+                    if cursor.fetchone()[0] is None:
+                        return None
+                    cursor.execute('SELECT "Магазин", "Товар", "Сезонность" FROM "Сезонность_товаров"')
+                    rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка чтения таблицы Сезонность_товаров: {str(e)}", exc_info=True)
+            raise
+        if not rows:
+            return None
+        return pd.DataFrame(rows, columns=['Магазин', 'Товар', 'Сезонность'])
+
+
 class DataExtractor:
     def __init__(self, db_connector):
         self.db = db_connector
@@ -1090,9 +1733,70 @@ class DataExtractor:
             logger.error(f"Ошибка при выгрузке из {table_name}: {e}", exc_info=True)
             raise
 
+    def fetch_distinct_values(self, table_name, column):
+        """
+        Уникальные значения столбца таблицы (например, список магазинов для обработки по частям).
+        :return: Список значений в порядке возрастания
+        """
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql.SQL('SELECT DISTINCT {col} FROM {table} WHERE {col} IS NOT NULL ORDER BY {col}').format(
+                        col=sql.Identifier(column), table=sql.Identifier(table_name)))
+                    return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка при выгрузке значений {column} из {table_name}: {e}", exc_info=True)
+            raise
+
     def fetch_origin_data(self, columns=None, where=None, limit=None):
         return self.fetch_table("Исходные_данные_продаж", columns, where, limit)
 
+    def fetch_active_origin_data(self, columns=None, where=None, sales_window_days=365, min_total_sales=6):
+        """
+        Выгрузка Исходные_данные_продаж только для пар Магазин+Товар в ассортименте
+        (отбор пар Preprocessing_data.plan_first_preprocess выполняется в БД): у пары есть
+        ненулевая цена, продажи за последние sales_window_days дней до максимальной
+        даты и сумма продаж больше min_total_sales. Строки остальных пар не передаются.
+        :param columns: Список столбцов (по умолчанию все)
+        :param where: Дополнительное SQL-условие (строка, параметры)
+        :return: DataFrame с данными
+        """
+        table_name = "Исходные_данные_продаж"
+        cols = ', '.join(f'o."{col}"' for col in columns) if columns else 'o.*'
+        rows_filter = f' WHERE {where[0]}' if where else ''
+        query = f"""
+            WITH pairs AS (
+                SELECT "Магазин", "Товар",
+                       max("Дата") AS last_date,
+                       max("Дата") FILTER (WHERE "Продано_шт" > 0) AS last_sale,
+                       sum(GREATEST("Продано_шт", 0)) AS total_sold,
+                       bool_or("Цена" > 0) AS has_price
+                FROM "{table_name}"
+                GROUP BY "Магазин", "Товар"
+            ), bounds AS (
+                SELECT max(last_date) - %s AS cutoff FROM pairs WHERE has_price
+            )
+            SELECT {cols}
+            FROM (SELECT * FROM "{table_name}"{rows_filter}) o
+            JOIN pairs p ON p."Магазин" = o."Магазин" AND p."Товар" = o."Товар"
+            WHERE p.has_price AND p.total_sold > %s
+              AND p.last_sale >= (SELECT cutoff FROM bounds)
+        """
+        # Параметры в порядке появления в запросе: окно, условие where, сумма продаж
+        params = [sales_window_days] + list(where[1] if where else []) + [min_total_sales]
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params)
+                    data = cursor.fetchall()
+                    colnames = [desc[0] for desc in cursor.description]
+            df = pd.DataFrame(data, columns=colnames)
+            logger.info(f"Выгружено {len(df)} строк пар в ассортименте из {table_name}")
+            return df
+        except Exception as e:
+            logger.error(f"Ошибка при выгрузке из {table_name}: {e}", exc_info=True)
+            raise
+
     def fetch_enriched_data(self, columns=None, where=None, limit=None):
         return self.fetch_table("Обогащённые_данные_продаж", columns, where, limit)
 
@@ -0,0 +1,113 @@
+"""
+Модуль масштабирования числовых признаков.
+Масштабирует непрерывную float32-матрицу признаков на месте и хранит
+параметры масштабирования в виде обычных массивов min/scale.
+"""
+import numpy as np
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+def feature_matrix(df, columns):
+    """
+    Собирает числовые признаки в одну непрерывную float32-матрицу.
+
+    Args:
+        df: DataFrame с признаками
+        columns: Список числовых столбцов
+
+    Returns:
+        np.ndarray: Матрица shape (len(df), len(columns)), dtype=float32
+    """
+    matrix = np.empty((len(df), len(columns)), dtype=np.float32)
+    for j, col in enumerate(columns):
+        matrix[:, j] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    return matrix
+
+
+class FeatureScaler:
+    """
+    Min-max масштабирование матрицы признаков: X * scale + min.
+
+    Формулы совпадают с sklearn MinMaxScaler (постоянные столбцы не масштабируются),
+    поэтому сохраненные ранее скалеры конвертируются без переобучения модели.
+    CatBoost нечувствителен к монотонному масштабированию признаков, поэтому при
+    enabled=False масштабирование пропускается полностью.
+    """
+
+    def __init__(self, columns, min_=None, scale=None, enabled=True):
+        """
+        Args:
+            columns: Список числовых столбцов в порядке столбцов матрицы
+            min_: Сдвиг после умножения на scale для каждого столбца
+            scale: Множитель для каждого столбца
+            enabled: False - признаки передаются в модель без масштабирования
+        """
+        self.columns = list(columns)
+        self.enabled = enabled
+        self.min_ = None if min_ is None else np.asarray(min_, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def from_scaler(cls, scaler, columns):
+        """
+        Возвращает FeatureScaler для сохраненного скалера.
+        MinMaxScaler из старых записей конвертируется по min_/scale_.
+        """
+        if isinstance(scaler, cls):
+            return scaler
+        if hasattr(scaler, 'scale_') and hasattr(scaler, 'min_'):
+            logger.debug("MinMaxScaler конвертирован в FeatureScaler")
+            return cls(columns, min_=scaler.min_, scale=scaler.scale_)
+        raise TypeError(f"Неподдерживаемый тип скалера: {type(scaler).__name__}")
+
+    def __getstate__(self):
+        # Сохраняются только списки и массивы - без ссылок на классы sklearn
+        return {'columns': self.columns, 'enabled': self.enabled, 'min': self.min_, 'scale': self.scale}
+
+    def __setstate__(self, state):
+        self.columns = state['columns']
+        self.enabled = state['enabled']
+        self.min_ = state['min']
+        self.scale = state['scale']
+
+    def fit(self, matrix):
+        """Вычисляет min/scale по столбцам матрицы (пропуски игнорируются)"""
+        if not self.enabled:
+            return self
+
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.shape[1] != len(self.columns):
+            raise ValueError(f"Ожидалось {len(self.columns)} столбцов, получено {matrix.shape[1]}")
+
+        data_min = np.nanmin(matrix, axis=0).astype(np.float64)
+        data_range = np.nanmax(matrix, axis=0).astype(np.float64) - data_min
+        data_range[data_range == 0] = 1.0
+
+        scale = 1.0 / data_range
+        self.scale = scale.astype(np.float32)
+        self.min_ = (-data_min * scale).astype(np.float32)
+        return self
+
+    def transform(self, matrix):
+        """
+        Масштабирует float32-матрицу на месте и возвращает ее.
+        Матрица другого типа предварительно приводится к float32.
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if not self.enabled:
+            return matrix
+        if self.scale is None:
+            raise ValueError("FeatureScaler не обучен: вызовите fit")
+        if matrix.shape[1] != len(self.columns):
+            raise ValueError(f"Ожидалось {len(self.columns)} столбцов, получено {matrix.shape[1]}")
+
+        matrix *= self.scale
+        matrix += self.min_
+        return matrix
+
+    def fit_transform(self, matrix):
+        """Обучение и масштабирование матрицы на месте"""
+        return self.fit(matrix).transform(matrix)
@@ -0,0 +1,409 @@
+"""
+Модуль хранилища лаговых признаков.
+Лаги за предыдущий день и скользящие частота и темп продаж за 3, 7 и 21 день
+считаются по предыдущим строкам пары Магазин+Товар. Признаки следующего дня
+каждой пары сохраняются в таблицу Признаки_лагов по ключу (Дата, Магазин, Товар)
+и обновляются после каждого восстановления продаж, поэтому прогноз на
+следующий день читает одну строку на пару вместо пересчета окон по истории.
+Обновление идет от сохраненного состояния окон (кольцевые буферы последних
+21 значения пар), а не от истории.
+"""
+import io
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+from Preprocessing import Preprocessing_data
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+FEATURES_TABLE = "Признаки_лагов"
+STATE_TABLE = "Состояние_окон_признаков"
+
+WINDOWS = (3, 7, 21)
+
+# Лаги за предыдущий день: признак -> исходный столбец
+DAY_LAGS = {
+    'Продано_1д_назад': 'Продано_правка',
+    'Поступило_1д_назад': 'Поступило_правка',
+    'Остаток_1д_назад': 'Остаток_правка',
+    'Заказ_1д_назад': 'Смоделированные_заказы',
+    'ПроданоСеть_1д_назад': 'ПроданоСеть',
+    'ПоступилоСеть_1д_назад': 'ПоступилоСеть',
+    'ОстатокСеть_1д_назад': 'ОстатокСеть',
+    'КоличествоЧековСеть_1д_назад': 'КоличествоЧековСеть',
+}
+
+# Ряды скользящих окон: префикс признака -> исходный столбец
+ROLLING_SERIES = {
+    'Продано': 'Продано_правка',
+    'ПроданоСеть': 'ПроданоСеть',
+}
+
+
+def _rolling_features(prefix):
+    return ([f'{prefix}_частота_{window}д' for window in WINDOWS] +
+            [f'{prefix}_темп_{window}д' for window in WINDOWS])
+
+
+# Признаки в порядке столбцов модели
+LAG_FEATURES = (['Продано_1д_назад', 'Поступило_1д_назад', 'Остаток_1д_назад', 'Заказ_1д_назад'] +
+                _rolling_features('Продано') +
+                ['ПроданоСеть_1д_назад', 'ПоступилоСеть_1д_назад', 'ОстатокСеть_1д_назад',
+                 'КоличествоЧековСеть_1д_назад'] +
+                _rolling_features('ПроданоСеть'))
+
+# Столбцы истории, по которым считаются признаки
+LAG_SOURCES = list(dict.fromkeys(DAY_LAGS.values()))
+SOURCE_COLUMNS = list(dict.fromkeys([*LAG_SOURCES, *ROLLING_SERIES.values()]))
+
+KEY_COLUMNS = ['Дата', 'Магазин', 'Товар']
+
+
+def previous_window_sum(values, position, window):
+    """
+    Сумма значений за предыдущие window строк той же пары (без текущей строки).
+
+    Эквивалентно groupby(...).transform(lambda x: x.rolling(window, min_periods=window).sum().shift(1)),
+    но считается через накопленную сумму по всему массиву за один проход.
+    Строки одной пары должны идти подряд, position - номер строки внутри пары.
+    Окна, содержащие NaN, дают NaN (как rolling с min_periods=window).
+    """
+    is_nan = np.isnan(values)
+    cumsum = np.concatenate(([0.0], np.cumsum(np.where(is_nan, 0.0, values))))
+    nan_count = np.concatenate(([0], np.cumsum(is_nan)))
+
+    result = np.full(len(values), np.nan)
+    rows = np.flatnonzero(position >= window)
+    complete = nan_count[rows] == nan_count[rows - window]
+    rows = rows[complete]
+    result[rows] = cumsum[rows] - cumsum[rows - window]
+    return result
+
+
+def add_lag_features(df):
+    """
+    Добавляет в df (на месте) столбцы LAG_FEATURES. Строки df должны быть
+    отсортированы по Магазин, Товар, Дата без повторов ключа.
+    """
+    grouped = df.groupby(['Магазин', 'Товар'], sort=False)
+    # Номер дня внутри пары: строки пары идут подряд после сортировки
+    position = grouped.cumcount().to_numpy()
+
+    features = {column: grouped[source].shift(1) for column, source in DAY_LAGS.items()}
+    for prefix, source in ROLLING_SERIES.items():
+        values = df[source].to_numpy(dtype=np.float64)
+        sold_flag = (values > 0).astype(np.float64)
+        for window in WINDOWS:
+            features[f'{prefix}_частота_{window}д'] = previous_window_sum(sold_flag, position, window)
+        for window in WINDOWS:
+            features[f'{prefix}_темп_{window}д'] = previous_window_sum(values, position, window) / window
+
+    for column in LAG_FEATURES:
+        df[column] = features[column]
+    return df
+
+
+def normalize_recovery_columns(df):
+    """Имена столбцов восстановленных данных (из БД или после восстановления) как в DataFrame модели"""
+    df = Preprocessing_data().rename_columns(df)
+    # В БД смоделированные заказы лежат в столбце Заказы_правка
+    return df.rename(columns={'Заказы_правка': 'Смоделированные_заказы'})
+
+
+def next_day_features(df):
+    """
+    Признаки следующего дня каждой пары по ее истории (RollingState.from_history).
+    Пары, для которых признаки не определены (короткая история, пропуски), не включаются.
+
+    Args:
+        df: Восстановленные данные (одна или несколько частей истории)
+
+    Returns:
+        pd.DataFrame: KEY_COLUMNS и LAG_FEATURES
+    """
+    return RollingState.from_history(df).features()
+
+
+class RollingState:
+    """
+    Состояние лаговых признаков пар: значения DAY_LAGS последнего дня и кольцевые
+    буферы последних max(WINDOWS) значений рядов ROLLING_SERIES. Строка массивов -
+    код пары (позиция в pairs), head - позиция следующей записи в буфере пары.
+    Добавление дня обновляет массивы векторно за O(пар), признаки следующего дня
+    считаются по буферам без истории.
+    """
+
+    width = max(WINDOWS)
+
+    def __init__(self, pairs, last_date, last_values, buffers, head, count):
+        self.pairs = pairs
+        self.last_date = last_date
+        self.last_values = last_values
+        self.buffers = buffers
+        self.head = head
+        self.count = count
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.MultiIndex.from_arrays([np.empty(0, dtype=str), np.empty(0, dtype=str)],
+                                             names=['Магазин', 'Товар']),
+                   np.empty(0, dtype='datetime64[ns]'),
+                   np.empty((0, len(LAG_SOURCES))),
+                   np.empty((0, len(ROLLING_SERIES), cls.width)),
+                   np.zeros(0, dtype=np.int64),
+                   np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_history(cls, df):
+        state = cls.empty()
+        state.append(df)
+        return state
+
+    def _pair_codes(self, keys):
+        """Коды пар keys; новые пары добавляются в конец массивов с пустыми буферами"""
+        new_pairs = keys.unique()[~keys.unique().isin(self.pairs)]
+        if len(new_pairs):
+            n = len(new_pairs)
+            self.pairs = self.pairs.append(new_pairs)
+            self.last_date = np.concatenate([self.last_date, np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')])
+            self.last_values = np.concatenate([self.last_values, np.full((n, len(LAG_SOURCES)), np.nan)])
+            self.buffers = np.concatenate([self.buffers, np.full((n, len(ROLLING_SERIES), self.width), np.nan)])
+            self.head = np.concatenate([self.head, np.zeros(n, dtype=np.int64)])
+            self.count = np.concatenate([self.count, np.zeros(n, dtype=np.int64)])
+        return self.pairs.get_indexer(keys)
+
+    def append(self, df):
+        """
+        Добавляет строки восстановленных данных: строки пары по возрастанию даты,
+        строки не позже последней даты пары в состоянии пропускаются (повторная
+        обработка того же файла не меняет состояние).
+
+        Returns:
+            int: Количество добавленных строк
+        """
+        if not len(df):
+            return 0
+        df = normalize_recovery_columns(df)
+        df = pd.DataFrame({
+            'Дата': pd.to_datetime(df['Дата']).to_numpy(dtype='datetime64[ns]'),
+            'Магазин': df['Магазин'].astype(str).to_numpy(),
+            'Товар': df['Товар'].astype(str).to_numpy(),
+            **{col: df[col].to_numpy(dtype=np.float64) for col in SOURCE_COLUMNS}
+        })
+        df = (df.sort_values(by=['Магазин', 'Товар', 'Дата'])
+              .drop_duplicates(subset=['Магазин', 'Товар', 'Дата']))
+
+        codes = self._pair_codes(pd.MultiIndex.from_frame(df[['Магазин', 'Товар']]))
+        dates = df['Дата'].to_numpy()
+        last_date = self.last_date[codes]
+        fresh = np.isnat(last_date) | (dates > last_date)
+        df, codes = df[fresh], codes[fresh]
+        # В буферах остаются только последние width строк пары
+        rank_from_end = df.groupby(codes, sort=False).cumcount(ascending=False).to_numpy()
+        keep = rank_from_end < self.width
+        df, codes = df[keep], codes[keep]
+
+        dates = df['Дата'].to_numpy()
+        lag_values = df[LAG_SOURCES].to_numpy()
+        rolling_values = df[list(ROLLING_SERIES.values())].to_numpy()
+        rank = df.groupby(codes, sort=False).cumcount().to_numpy()
+        # За шаг добавляется k-я строка каждой пары: в одном шаге код пары не повторяется
+        for k in range(rank.max() + 1 if len(rank) else 0):
+            step = rank == k
+            pair = codes[step]
+            self.last_values[pair] = lag_values[step]
+            self.buffers[pair, :, self.head[pair]] = rolling_values[step]
+            self.head[pair] = (self.head[pair] + 1) % self.width
+            self.count[pair] = np.minimum(self.count[pair] + 1, self.width)
+            self.last_date[pair] = dates[step]
+        return len(df)
+
+    def _window_sum(self, values, window):
+        """Сумма последних window значений буфера пары (NaN, если значений меньше window)"""
+        positions = (self.head[:, None] - 1 - np.arange(window)) % self.width
+        sums = np.take_along_axis(values, positions, axis=1).sum(axis=1)
+        return np.where(self.count >= window, sums, np.nan)
+
+    def features(self, pairs=None):
+        """
+        Признаки следующего дня (последняя дата пары + 1 день) в формате next_day_features.
+
+        Args:
+            pairs: MultiIndex (Магазин, Товар) пар (None - все пары состояния)
+        """
+        data = {
+            'Дата': self.last_date + np.timedelta64(1, 'D'),
+            'Магазин': self.pairs.get_level_values(0),
+            'Товар': self.pairs.get_level_values(1),
+        }
+        for column, source in DAY_LAGS.items():
+            data[column] = self.last_values[:, LAG_SOURCES.index(source)]
+        for series, prefix in enumerate(ROLLING_SERIES):
+            values = self.buffers[:, series, :]
+            sold_flag = (values > 0).astype(np.float64)
+            for window in WINDOWS:
+                data[f'{prefix}_частота_{window}д'] = self._window_sum(sold_flag, window)
+            for window in WINDOWS:
+                data[f'{prefix}_темп_{window}д'] = self._window_sum(values, window) / window
+
+        frame = pd.DataFrame(data)[KEY_COLUMNS + LAG_FEATURES]
+        if pairs is not None:
+            codes = self.pairs.get_indexer(pairs.unique())
+            frame = frame.iloc[codes[codes >= 0]]
+        return (frame.dropna().sort_values(by=['Магазин', 'Товар'])
+                .reset_index(drop=True))
+
+    def to_bytes(self):
+        """Сериализация в npz (без pickle) для хранения в БД"""
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer,
+                            shops=np.asarray(self.pairs.get_level_values(0), dtype=str),
+                            products=np.asarray(self.pairs.get_level_values(1), dtype=str),
+                            last_date=self.last_date, last_values=self.last_values,
+                            buffers=self.buffers, head=self.head, count=self.count)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            pairs = pd.MultiIndex.from_arrays([arrays['shops'].astype(object), arrays['products'].astype(object)],
+                                              names=['Магазин', 'Товар'])
+            return cls(pairs, arrays['last_date'], arrays['last_values'], arrays['buffers'],
+                       arrays['head'], arrays['count'])
+
+
+class LagFeatureStore:
+    """Признаки следующего дня пар в таблице Признаки_лагов по ключу (Дата, Магазин, Товар)"""
+
+    def __init__(self, db_connector):
+        self.db = db_connector
+
+    def update(self, df_history, df_new=None):
+        """
+        Обновляет состояние окон (RollingState в таблице Состояние_окон_признаков)
+        и записывает признаки следующего дня пар.
+
+        Args:
+            df_history: Восстановленные данные до новых строк. Без df_new состояние
+                строится заново по df_history; с df_new используется только для пар,
+                которых нет в сохраненном состоянии (достаточно последних 21 дня)
+            df_new: Новые восстановленные данные: добавляются к сохраненному состоянию
+                за O(пар) независимо от глубины истории
+
+        Returns:
+            int: Количество записанных строк признаков
+        """
+        if df_new is None:
+            state = RollingState.from_history(df_history)
+            pairs = None
+        else:
+            state = self.load_state() or RollingState.empty()
+            df_new = normalize_recovery_columns(df_new)
+            pairs = pd.MultiIndex.from_arrays([df_new['Магазин'].astype(str), df_new['Товар'].astype(str)])
+            if len(df_history):
+                # История до первой новой даты по новым парам (как в add_lag_values)
+                df_history = normalize_recovery_columns(df_history)
+                keys = pd.MultiIndex.from_arrays([df_history['Магазин'].astype(str),
+                                                  df_history['Товар'].astype(str)])
+                before = pd.to_datetime(df_history['Дата']) < pd.to_datetime(df_new['Дата']).min()
+                unknown = keys.isin(pairs) & ~keys.isin(state.pairs)
+                state.append(df_history[unknown & before.to_numpy()])
+            added = state.append(df_new)
+            logger.info(f"В состояние окон добавлено {added} строк")
+        if not len(state.pairs):
+            return 0
+        self.save_state(state)
+        return self.save(state.features(pairs))
+
+    def load_state(self):
+        """
+        Returns:
+            RollingState или None, если состояние еще не сохранено
+        """
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT to_regclass(%s)", (f'"{STATE_TABLE}"',))
+                    if cursor.fetchone()[0] is None:
+                        return None
+                    cursor.execute(f'SELECT data FROM "{STATE_TABLE}" WHERE state_id = 1')
+                    row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Ошибка чтения таблицы {STATE_TABLE}: {str(e)}", exc_info=True)
+            raise
+        return RollingState.from_bytes(bytes(row[0])) if row else None
+
+    def save_state(self, state):
+        data = state.to_bytes()
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"""
+                        INSERT INTO "{STATE_TABLE}" (state_id, data) VALUES (1, %s)
+                        ON CONFLICT (state_id) DO UPDATE SET data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
+                    """, (psycopg2.Binary(data),))
+                    conn.commit()
+            logger.info(f"Состояние окон сохранено: {len(state.pairs)} пар, {len(data) / 2 ** 20:.1f} МБ")
+        except Exception as e:
+            logger.error(f"Ошибка записи в таблицу {STATE_TABLE}: {str(e)}", exc_info=True)
+            raise
+
+    def save(self, features):
+        """
+        Записывает признаки (next_day_features); строки с тем же ключом заменяются.
+
+        Returns:
+            int: Количество записанных строк
+        """
+        columns = ', '.join(f'"{col}"' for col in KEY_COLUMNS + LAG_FEATURES)
+        updates = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in LAG_FEATURES)
+        rows = list(zip(features['Дата'].dt.date, features['Магазин'].astype(str), features['Товар'].astype(str),
+                        *(features[col].astype(float) for col in LAG_FEATURES)))
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    execute_values(cursor, f"""
+                        INSERT INTO "{FEATURES_TABLE}" ({columns})
+                        VALUES %s
+                        ON CONFLICT ("Дата", "Магазин", "Товар") DO UPDATE SET {updates}
+                    """, rows, page_size=10000)
+                    conn.commit()
+            logger.info(f"Признаки следующего дня сохранены: {len(rows)} пар")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Ошибка записи в таблицу {FEATURES_TABLE}: {str(e)}", exc_info=True)
+            raise
+
+    def load(self, df):
+        """
+        Признаки строк df по ключу (Дата, Магазин, Товар).
+
+        Returns:
+            pd.DataFrame: KEY_COLUMNS и LAG_FEATURES найденных строк или None, если таблицы нет
+        """
+        keys = df[KEY_COLUMNS].drop_duplicates()
+        dates = [value.date() for value in pd.to_datetime(keys['Дата'])]
+        columns = ', '.join(f'f."{col}"' for col in KEY_COLUMNS + LAG_FEATURES)
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT to_regclass(%s)", (f'"{FEATURES_TABLE}"',))
+                    if cursor.fetchone()[0] is None:
+                        return None
+                    cursor.execute(f"""
+                        SELECT {columns}
+                        FROM "{FEATURES_TABLE}" f
+                        JOIN unnest(%s::date[], %s::varchar[], %s::varchar[]) AS k("Дата", "Магазин", "Товар")
+                            ON f."Дата" = k."Дата" AND f."Магазин" = k."Магазин" AND f."Товар" = k."Товар"
+                    """, (dates, keys['Магазин'].astype(str).tolist(), keys['Товар'].astype(str).tolist()))
+                    rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка чтения таблицы {FEATURES_TABLE}: {str(e)}", exc_info=True)
+            raise
+        features = pd.DataFrame(rows, columns=KEY_COLUMNS + LAG_FEATURES)
+        features['Дата'] = pd.to_datetime(features['Дата'])
+        logger.info(f"Из {FEATURES_TABLE} прочитано {len(features)} строк признаков")
+        return features
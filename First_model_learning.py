@@ -2,20 +2,47 @@
 Модуль для обучения модели прогнозирования продаж.
 Использует CatBoost для предсказания продаж на 7 дней вперед.
 """
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_squared_error, mean_absolute_error
+from sklearn.metrics import mean_squared_error
 import catboost as cb
-import optuna
 import logging
-from DB_operations import ModelStorage
+from DB_operations import ModelStorage, MetricsStorage
+from Categorical_codebook import CategoricalCodebook
+from Feature_scaling import FeatureScaler, feature_matrix
+from Inference_engine import build_cat_matrix, build_pool
+from Pool_cache import QuantizedPoolCache
+from Model_metrics import ForecastEvaluator
+from Segmented_models import SegmentedTrainer
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
 class First_learning_model:
+    numerical_columns = ['Цена',
+                         'Температура (°C)', 'Давление (мм рт. ст.)',
+                         'ПроданоСеть', 'ПоступилоСеть', 'ОстатокСеть', 'КоличествоЧековСеть',
+                         'Продано_правка', 'Поступило_правка', "Остаток_правка", "Смоделированные_заказы",
+                         'Продано_1д_назад', 'Поступило_1д_назад', 'Остаток_1д_назад', 'Заказ_1д_назад',
+                         'Продано_частота_3д', 'Продано_частота_7д', 'Продано_частота_21д',
+                         'Продано_темп_3д', 'Продано_темп_7д', 'Продано_темп_21д',
+                         'ПроданоСеть_1д_назад', 'ПоступилоСеть_1д_назад', 'ОстатокСеть_1д_назад', 'КоличествоЧековСеть_1д_назад',
+                         'ПроданоСеть_частота_3д', 'ПроданоСеть_частота_7д', 'ПроданоСеть_частота_21д',
+                         'ПроданоСеть_темп_3д', 'ПроданоСеть_темп_7д', 'ПроданоСеть_темп_21д',
+                         ]
+
+    cat_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН',
+                   'Акция', 'Выходной', 'ДеньНедели', 'Месяц', 'День', 'Год',
+                   'Сезонность', 'Сезонность_точн']
+
+    encod_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН']
+
+    target_column = 'Продажи_7д_вперёд'
+
+    # Дней истории до даты отсечения, необходимых для расчета лагов при дообучении (окна до 21 дня)
+    incremental_history_days = 30
+
     def first_data_type_refactor(self, df):
         df_copy = df.copy()
 
@@ -107,51 +134,46 @@ class First_learning_model:
 
         return df
 
-    def encoding_futures(self, df):
+    def encoding_futures(self, df, scale_features=True):
+        """
+        Кодирует категориальные признаки и обучает FeatureScaler.
+
+        Числовые столбцы DataFrame не изменяются: масштабирование выполняется
+        при сборке float32-матрицы признаков в make_pool.
+        При scale_features=False масштабирование не выполняется.
+        """
         df_encoding = df.copy()
 
-        encod_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН']
+        encod_columns = self.encod_columns
         df_encoding[encod_columns] = df_encoding[encod_columns].astype(str)
 
-        # Кодируем столбец 'Товар' с помощью LabelEncoder только для обучающих данных
-        label_encoder_product = LabelEncoder()
-        df_encoding['Товар'] = label_encoder_product.fit_transform(df_encoding['Товар'])
+        # Кодируем категориальные столбцы словарями категорий (коды int32)
+        label_encoder_product = CategoricalCodebook.fit(df_encoding['Товар'])
+        df_encoding['Товар'] = label_encoder_product.transform(df_encoding['Товар'])
 
-        label_encoder_shop = LabelEncoder()
-        df_encoding['Магазин'] = label_encoder_shop.fit_transform(df_encoding['Магазин'])
+        label_encoder_shop = CategoricalCodebook.fit(df_encoding['Магазин'])
+        df_encoding['Магазин'] = label_encoder_shop.transform(df_encoding['Магазин'])
 
-        label_encoder_category = LabelEncoder()
-        df_encoding['Категория'] = label_encoder_category.fit_transform(df_encoding['Категория'])
+        label_encoder_category = CategoricalCodebook.fit(df_encoding['Категория'])
+        df_encoding['Категория'] = label_encoder_category.transform(df_encoding['Категория'])
 
-        label_encoder_potreb_group = LabelEncoder()
-        df_encoding['ПотребГруппа'] = label_encoder_potreb_group.fit_transform(df_encoding['ПотребГруппа'])
+        label_encoder_potreb_group = CategoricalCodebook.fit(df_encoding['ПотребГруппа'])
+        df_encoding['ПотребГруппа'] = label_encoder_potreb_group.transform(df_encoding['ПотребГруппа'])
 
-        label_encoder_mnn = LabelEncoder()
-        df_encoding['МНН'] = label_encoder_mnn.fit_transform(df_encoding['МНН'])
+        label_encoder_mnn = CategoricalCodebook.fit(df_encoding['МНН'])
+        df_encoding['МНН'] = label_encoder_mnn.transform(df_encoding['МНН'])
 
 
-        numerical_columns = ['Цена',
-                             'Температура (°C)', 'Давление (мм рт. ст.)',
-                             'ПроданоСеть', 'ПоступилоСеть', 'ОстатокСеть', 'КоличествоЧековСеть',
-                             'Продано_правка', 'Поступило_правка', "Остаток_правка", "Смоделированные_заказы",
-                             'Продано_1д_назад', 'Поступило_1д_назад', 'Остаток_1д_назад', 'Заказ_1д_назад',
-                             'Продано_частота_3д', 'Продано_частота_7д', 'Продано_частота_21д',
-                             'Продано_темп_3д', 'Продано_темп_7д', 'Продано_темп_21д',
-                             'ПроданоСеть_1д_назад', 'ПоступилоСеть_1д_назад', 'ОстатокСеть_1д_назад', 'КоличествоЧековСеть_1д_назад',
-                             'ПроданоСеть_частота_3д', 'ПроданоСеть_частота_7д', 'ПроданоСеть_частота_21д',
-                             'ПроданоСеть_темп_3д', 'ПроданоСеть_темп_7д', 'ПроданоСеть_темп_21д',
-                             ]
+        numerical_columns = list(self.numerical_columns)
 
 
-        scaler = MinMaxScaler()
-        df_encoding[numerical_columns] = scaler.fit_transform(df_encoding[numerical_columns])
+        scaler = FeatureScaler(numerical_columns, enabled=scale_features)
+        scaler.fit(feature_matrix(df_encoding, numerical_columns))
 
 
-        cat_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН',
-                        'Акция', 'Выходной', 'ДеньНедели', 'Месяц', 'День', 'Год',
-                        'Сезонность', 'Сезонность_точн']
+        cat_columns = list(self.cat_columns)
 
-        logger.debug('Масштабирование данных выполнено')
+        logger.debug('Параметры масштабирования данных вычислены')
 
         return (df_encoding, numerical_columns, cat_columns, label_encoder_product, 
             label_encoder_shop, label_encoder_category, 
@@ -178,7 +200,7 @@ class First_learning_model:
         logger.info(f"Дата начала обучения: {train_data['Дата'].min()} - конца: {train_data['Дата'].max()}")
         logger.info(f"Дата начала теста: {test_data['Дата'].min()} - конца: {test_data['Дата'].max()}")
 
-        test_preduction = test_data[['Дата', 'Магазин', 'Товар']].copy()
+        test_preduction = test_data[['Дата', 'Магазин', 'Товар', 'Категория']].copy()
         test_preduction['Реальные значения'] = y_test[target_column].values
         test_preduction.head()
 
@@ -191,30 +213,91 @@ class First_learning_model:
         logger.info(f'Размерность y_test: {y_test.shape}, y_train: {y_train.shape}')
         logger.info('Разбиение на выборки закончено')
 
-        return X_train, y_train, X_test, y_test, test_preduction
-
-    def learning_catboost(self, X_train, y_train, X_test, y_test, cat_features):
-
-        model = cb.CatBoostRegressor(
-            iterations=3000,
+        return X_train, y_train, X_test, y_test, test_preduction, date_training
+
+    def pool_matrices(self, X, y, numerical_columns, cat_columns, scaler):
+        """
+        Матрицы для Pool: числовые признаки - одна float32-матрица,
+        масштабированная на месте, категориальные - отдельная матрица.
+
+        Returns:
+            tuple: (num_matrix, cat_matrix, label)
+        """
+        num_matrix = scaler.transform(feature_matrix(X, numerical_columns))
+        cat_matrix = build_cat_matrix(X, cat_columns, len(X))
+        label = None if y is None else np.asarray(y, dtype=np.float64).ravel()
+        return num_matrix, cat_matrix, label
+
+    def make_pool(self, X, y, numerical_columns, cat_columns, scaler, thread_count=-1):
+        """Собирает Pool для CatBoost из матриц pool_matrices"""
+        num_matrix, cat_matrix, label = self.pool_matrices(X, y, numerical_columns, cat_columns, scaler)
+        return build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns, label=label, thread_count=thread_count)
+
+    def make_pools(self, X_train, y_train, X_test, y_test, numerical_columns, cat_columns, scaler, pool_cache=None, thread_count=-1):
+        """
+        Собирает обучающий и тестовый Pool.
+
+        При заданном pool_cache (QuantizedPoolCache) обучающий пул квантуется один раз
+        для версии данных и берется с диска при повторном обучении. Тестовый пул
+        всегда обычный: по нему выполняются ранняя остановка и предсказание.
+
+        Returns:
+            tuple: (train_pool, test_pool)
+        """
+        test_pool = self.make_pool(X_test, y_test, numerical_columns, cat_columns, scaler, thread_count)
+
+        if pool_cache is None:
+            train_pool = self.make_pool(X_train, y_train, numerical_columns, cat_columns, scaler, thread_count)
+        else:
+            train_pool, _ = pool_cache.get(
+                *self.pool_matrices(X_train, y_train, numerical_columns, cat_columns, scaler),
+                numerical_columns, cat_columns
+            )
+        return train_pool, test_pool
+
+    def catboost_params(self, thread_count=-1, used_ram_limit=None, border_count=254):
+        """Общие параметры CatBoost для полного обучения и дообучения"""
+        return dict(
             eval_metric='RMSE',
             loss_function='Huber:delta=0.5',
-            cat_features=cat_features,
             task_type='CPU',
             devices='0',
-            early_stopping_rounds=200,
             verbose=100,
             random_state=42,
+            thread_count=thread_count,
+            used_ram_limit=used_ram_limit,
+            border_count=border_count,
+        )
+
+    def learning_catboost(self, train_pool, test_pool, thread_count=-1, used_ram_limit=None, border_count=254, params=None):
+        """
+        Обучение CatBoost.
+
+        Args:
+            train_pool: Обучающий Pool (обычный или квантованный)
+            test_pool: Тестовый Pool для ранней остановки
+            thread_count: Количество потоков CatBoost (-1 - все доступные ядра)
+            used_ram_limit: Ограничение памяти CatBoost (например, '8gb'), None - без ограничения
+            border_count: Количество границ квантования числовых признаков
+            params: Подобранные гиперпараметры (depth, learning_rate, l2_leaf_reg, loss_function)
+        """
+        model_params = self.catboost_params(thread_count, used_ram_limit, border_count)
+        model_params.update(params or {})
+
+        model = cb.CatBoostRegressor(
+            iterations=3000,
+            early_stopping_rounds=200,
             use_best_model=True,
+            **model_params
         )
 
         model.fit(
-            X_train, y_train,
-            eval_set=(X_test, y_test),
+            train_pool,
+            eval_set=test_pool,
         )
 
         # Предсказание на тестовых данных
-        y_pred = model.predict(X_test)
+        y_pred = model.predict(test_pool)
 
         # model.save_model('catboost_model.cbm')
 
@@ -232,95 +315,51 @@ class First_learning_model:
         return agg_df
 
     def view_results_refactor_values(self, test_preduction, y_pred, y_test):
-        test_preduction_copy = test_preduction.copy()
-
-        test_preduction_copy['Предсказанные значения'] = y_pred
+        """
+        Округляет предсказания и считает метрики точности на тестовой выборке.
 
-        y_true = test_preduction_copy['Реальные значения']
-        y_pred = test_preduction_copy['Предсказанные значения'].clip(lower=0)
-
-        y_pred =  np.round(y_pred).astype(int)
-        y_true =  np.round(y_true).astype(int)
+        Returns:
+            tuple: (test_preduction с предсказанными значениями, отчет ForecastEvaluator)
+        """
+        test_preduction_copy = test_preduction.copy()
 
-        # y_pred = np.floor(y_pred + 0.5).astype(int)
-        # y_true = np.floor(y_true + 0.5).astype(int)
+        y_true = np.round(test_preduction_copy['Реальные значения'].to_numpy(dtype=np.float64)).astype(int)
+        y_pred = np.round(np.clip(np.asarray(y_pred, dtype=np.float64), 0, None)).astype(int)
 
         test_preduction_copy['Реальные значения'] = y_true
         test_preduction_copy['Предсказанные значения'] = y_pred
 
-        rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-        logger.info(f'Root Mean Squared Error: {rmse:.4f}')
-
-        mae = mean_absolute_error(y_true, y_pred)
-        logger.info(f'Mean Absolute Error: {mae:.4f}')
-
-        result_metric_diff = 0
-        result_real_values = 0
-        result_metric_izl = 0
-        for i in range(len(y_true)):
-            result_metric = y_true.iloc[i] - y_pred.iloc[i]
-
-            if result_metric > 0:
-                result_metric_diff += result_metric
-
-            elif result_metric == 0:
-                result_real_values += y_true.iloc[i]
-
-            else:
-                result_metric_izl += result_metric
-
-        result_metric_diff_count = 0
-        result_real_values_count = 0
-        result_metric_izl_count = 0
-        for i in range(len(y_true)):
-            result_metric = y_true.iloc[i] - y_pred.iloc[i]
-
-            if result_metric > 0:
-                result_metric_diff_count += 1
-
-            elif result_metric == 0:
-                result_real_values_count += 1
-
-            else:
-                result_metric_izl_count += 1
-
-        logger.info(f'Дефицит (Реальное значение): {result_metric_diff}')
-        logger.info(f'Излишки (Реальное значение): {np.abs(result_metric_izl)}')
-        logger.info(f'Дефицит (Количество): {result_metric_diff_count}')
-        logger.info(f'Излишки (Количество): {np.abs(result_metric_izl_count)}')
-        logger.info(f'Идеально предсказанных значений (Количество): {result_real_values_count}')
-        logger.info(f'Идеально предсказанных значений (Реальное значение): {result_real_values}')
-        logger.info(f'Сумма реальных продаж за 7 дней: {y_true.sum()}')
-        logger.info(f'Сумма предсказанных продаж за 7 дней: {y_pred.sum()}')
-        # Подсчет количества каждого уникального значения
-        unique_true, counts_true = np.unique(y_true, return_counts=True)
-        unique_pred, counts_pred = np.unique(y_pred, return_counts=True)
-
-        # Формируем DataFrame для реальных значений
-        true_counts_df = pd.DataFrame({
-            'Значение': unique_true,
-            'Количество': counts_true
-        })
-
-        # Формируем DataFrame для предсказанных значений
-        pred_counts_df = pd.DataFrame({
-            'Значение': unique_pred,
-            'Количество': counts_pred
-        })
-
-        # Вывод результатов в виде таблицы
-        logger.debug("Распределение реальных значений:")
-        logger.debug(f"\n{true_counts_df}")
-        logger.debug("Распределение предсказанных значений:")
-        logger.debug(f"\n{pred_counts_df}")
-        
-        test_preduction_cat_1_difference = self.result_sum(test_preduction_copy)
-        total_diff = test_preduction_cat_1_difference['Разница'].abs().sum()
-        logger.info(f'Общая разница между предсказанными и реальными значениями: {total_diff}')
-
-        return test_preduction_copy
-
-    def first_learning_model(self, df, db):
+        evaluator = ForecastEvaluator()
+        categories = test_preduction_copy['Категория'].to_numpy() if 'Категория' in test_preduction_copy else None
+        report = evaluator.evaluate(y_true, y_pred,
+                                    stores=test_preduction_copy['Магазин'].to_numpy(),
+                                    categories=categories,
+                                    pairs=self.pair_ids(test_preduction_copy))
+        evaluator.log_report(report)
+
+        return test_preduction_copy, report
+
+    def pair_ids(self, X):
+        """Идентификатор пары Магазин+Товар по закодированным столбцам"""
+        return X['Магазин'].to_numpy(dtype=np.int64) * (2 ** 32) + X['Товар'].to_numpy(dtype=np.int64)
+
+    def first_learning_model(self, df, db, scale_features=True, thread_count=-1, used_ram_limit=None, border_count=254, pool_cache_dir=None, tuner=None, segmentation=None):
+        """
+        Полное обучение модели на восстановленных данных и сохранение в ModelStorage.
+
+        Args:
+            df: Восстановленные данные
+            db: Коннектор к базе данных
+            scale_features: Масштабировать числовые признаки
+            thread_count: Количество потоков CatBoost
+            used_ram_limit: Ограничение памяти CatBoost (например, '8gb')
+            border_count: Количество границ квантования числовых признаков
+            pool_cache_dir: Директория кэша квантованных пулов, None - без кэша
+            tuner: CatBoostTuner для подбора гиперпараметров перед обучением, None - параметры по умолчанию
+                (модель, обученная подбором на полных данных, сохраняется без повторного обучения)
+            segmentation: SegmentedTrainer - отдельная модель для каждого сегмента, None - одна модель
+                (used_ram_limit в этом случае ограничивает память каждого процесса обучения)
+        """
         df_copy = df.copy()
 
         df_copy = self.first_data_type_refactor(df_copy)
@@ -331,23 +370,206 @@ class First_learning_model:
          label_encoder_product, label_encoder_shop, 
          label_encoder_category, label_encoder_potreb_group, 
          label_encoder_mnn, scaler) = (
-            self.encoding_futures(df_with_lags))
+            self.encoding_futures(df_with_lags, scale_features=scale_features))
 
 
-        X_train, y_train, X_test, y_test, test_preduction = (
+        X_train, y_train, X_test, y_test, test_preduction, date_training = (
             self.train_and_test(df_encoding, numerical_columns, cat_columns))
 
-        model, y_pred = (
-            self.learning_catboost(X_train, y_train, X_test, y_test, cat_columns))
+        pool_cache = None
+        if pool_cache_dir:
+            pool_cache = QuantizedPoolCache(pool_cache_dir, border_count=border_count,
+                                            used_ram_limit=used_ram_limit, thread_count=thread_count)
+
+        params, tuned_model = None, None
+        if tuner is not None:
+            params, tuned_model = tuner.tune(
+                self.pool_matrices(X_train, y_train, numerical_columns, cat_columns, scaler),
+                self.pool_matrices(X_test, y_test, numerical_columns, cat_columns, scaler),
+                self.pair_ids(X_train), self.pair_ids(X_test),
+                numerical_columns, cat_columns, pool_cache=pool_cache
+            )
+
+        if segmentation is not None:
+            model_params = self.catboost_params(thread_count, used_ram_limit, border_count)
+            model_params.update(params or {})
+            codebooks = dict(zip(self.encod_columns, [label_encoder_product, label_encoder_shop, label_encoder_category,
+                                                      label_encoder_potreb_group, label_encoder_mnn]))
+            model, y_pred = segmentation.train(
+                self.pool_matrices(X_train, y_train, numerical_columns, cat_columns, scaler),
+                self.pool_matrices(X_test, y_test, numerical_columns, cat_columns, scaler),
+                numerical_columns, cat_columns, model_params,
+                codebook=codebooks.get(segmentation.segment_column)
+            )
+        else:
+            train_pool, test_pool = self.make_pools(X_train, y_train, X_test, y_test, numerical_columns,
+                                                    cat_columns, scaler, pool_cache, thread_count)
+            if tuned_model is not None:
+                # Подбор уже обучил модель с лучшими параметрами на этих же данных
+                model, y_pred = tuned_model, tuned_model.predict(test_pool)
+            else:
+                model, y_pred = (
+                    self.learning_catboost(train_pool, test_pool, thread_count=thread_count,
+                                           used_ram_limit=used_ram_limit, border_count=border_count, params=params))
 
-        test_prediction = self.view_results_refactor_values(test_preduction, y_pred, y_test)
+        test_prediction, report = self.view_results_refactor_values(test_preduction, y_pred, y_test)
 
         test_prediction['Товар'] = (label_encoder_product
-                                         .inverse_transform(test_prediction['Товар']))
+                                         .decode(test_prediction['Товар'].to_numpy()))
         test_prediction['Магазин'] = (label_encoder_shop
-                                           .inverse_transform(test_prediction['Магазин']))
+                                           .decode(test_prediction['Магазин'].to_numpy()))
+        test_prediction['Категория'] = (label_encoder_category
+                                             .decode(test_prediction['Категория'].to_numpy()))
+        report = self.decode_report(report, label_encoder_shop, label_encoder_category)
+
+        model_storage = ModelStorage(db)
+        load_id = model_storage.save_models(label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, model, comment='first_learning_model',
+                                  train_cutoff=date_training.date())
+        MetricsStorage(db).save_metrics(load_id, report)
+
+        return test_prediction
+
+    def decode_report(self, report, label_encoder_shop, label_encoder_category):
+        """Заменяет коды магазинов и категорий в разбивках отчета на исходные значения"""
+        for key, codebook in (('by_store', label_encoder_shop), ('by_category', label_encoder_category)):
+            if key in report:
+                report[key]['Группа'] = codebook.decode(report[key]['Группа'].to_numpy())
+        return report
+
+    def incremental_history_start(self, db):
+        """
+        Первая дата восстановленных данных, нужная для дообучения последней модели,
+        или None, если дообучение невозможно и нужны все данные.
+        """
+        model_storage = ModelStorage(db)
+        if not model_storage.table_exists():
+            return None
+        try:
+            artifacts = model_storage.open_latest_models()
+        except ValueError:
+            return None
+        if artifacts.train_cutoff is None:
+            return None
+        return pd.Timestamp(artifacts.train_cutoff) - pd.Timedelta(days=self.incremental_history_days)
+
+    def encode_with_codebooks(self, df, codebooks):
+        """Кодирует категориальные столбцы сохраненными словарями категорий"""
+        df_encoding = df.copy()
+        for col, codebook in zip(self.encod_columns, codebooks):
+            df_encoding[col] = codebook.transform(df_encoding[col].astype(str))
+        return df_encoding
+
+    def incremental_learning_model(self, df, db, iterations=300, validation_days=7, max_degradation=0.05,
+                                   scale_features=True, thread_count=-1, used_ram_limit=None, border_count=254, pool_cache_dir=None,
+                                   segmentation=None):
+        """
+        Дообучение последней сохраненной модели (init_model) только на днях после ее даты отсечения.
+
+        Последние validation_days новых дней не участвуют в обучении: на них сравниваются
+        RMSE прежней и дообученной модели. Дообученная модель сохраняется, только если
+        ее RMSE хуже прежней не более чем на max_degradation (доля).
+        Если сохраненной модели или даты отсечения нет либо в новых днях появились
+        значения, которых нет в словарях категорий (новые магазины, товары и т.п.),
+        выполняется полное обучение first_learning_model. Набор моделей сегментов
+        не дообучается: он переобучается полностью с тем же столбцом сегментации.
+
+        Args:
+            df: Восстановленные данные (новые дни и не менее incremental_history_days дней до отсечения)
+            db: Коннектор к базе данных
+            iterations: Количество дополнительных итераций бустинга
+            validation_days: Количество последних новых дней для проверки
+            max_degradation: Допустимое ухудшение RMSE на проверочных днях
+            Остальные параметры передаются в first_learning_model при полном обучении.
+
+        Returns:
+            pd.DataFrame: Предсказания на проверочных днях (или результат полного обучения)
+        """
+        def full_retrain(reason, segmentation=segmentation):
+            logger.warning(f"Дообучение невозможно ({reason}), выполняется полное обучение")
+            return self.first_learning_model(df, db, scale_features=scale_features, thread_count=thread_count,
+                                             used_ram_limit=used_ram_limit, border_count=border_count,
+                                             pool_cache_dir=pool_cache_dir, segmentation=segmentation)
 
         model_storage = ModelStorage(db)
-        model_storage.save_models(label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler, model, comment='first_learning_model')
+        try:
+            artifacts = model_storage.open_latest_models()
+        except ValueError:
+            return full_retrain("нет сохраненной модели")
+
+        if artifacts.train_cutoff is None:
+            return full_retrain(f"для модели ID {artifacts.load_id} не записана дата отсечения")
+
+        if artifacts.segment_column is not None:
+            return full_retrain(f"модель ID {artifacts.load_id} - набор моделей сегментов по {artifacts.segment_column}",
+                                segmentation=segmentation or SegmentedTrainer(segment_column=artifacts.segment_column))
+
+        cutoff = pd.Timestamp(artifacts.train_cutoff)
+        df_with_lags = self.add_lag_values(self.first_data_type_refactor(df.copy()))
+        df_new = df_with_lags[df_with_lags['Дата'] > cutoff]
+
+        result_columns = ['Дата', 'Магазин', 'Товар', 'Реальные значения', 'Предсказанные значения']
+        new_dates = np.sort(df_new['Дата'].unique())
+        if len(new_dates) <= validation_days:
+            logger.info(f"После {cutoff.date()} размеченных дней: {len(new_dates)}, "
+                        f"для дообучения нужно больше {validation_days}")
+            return pd.DataFrame(columns=result_columns)
+
+        # Словари категорий загружаются без модели: при новых значениях модель не нужна
+        codebooks = [CategoricalCodebook.from_encoder(encoder) for encoder in
+                     [artifacts.label_encoder_product, artifacts.label_encoder_shop, artifacts.label_encoder_category,
+                      artifacts.label_encoder_potreb_group, artifacts.label_encoder_mnn]]
+        for col, codebook in zip(self.encod_columns, codebooks):
+            _, known = codebook.encode(df_new[col].astype(str))
+            if not known.all():
+                unseen = df_new.loc[~known, col].astype(str).nunique()
+                return full_retrain(f"в столбце {col} появилось новых значений: {unseen}")
+
+        scaler = FeatureScaler.from_scaler(artifacts.scaler, self.numerical_columns)
+        old_model = artifacts.catboost_model
+
+        validation_start = new_dates[-validation_days]
+        df_train = df_new[df_new['Дата'] < validation_start]
+        df_valid = df_new[df_new['Дата'] >= validation_start]
+
+        logger.info(f"Дообучение модели ID {artifacts.load_id}: {len(df_train)} строк обучения "
+                    f"({df_train['Дата'].min().date()} - {df_train['Дата'].max().date()}), {len(df_valid)} строк проверки")
+
+        df_train_encoding = self.encode_with_codebooks(df_train, codebooks)
+        df_valid_encoding = self.encode_with_codebooks(df_valid, codebooks)
+        train_pool = self.make_pool(df_train_encoding, df_train_encoding[self.target_column],
+                                    self.numerical_columns, self.cat_columns, scaler, thread_count)
+        valid_pool = self.make_pool(df_valid_encoding, None, self.numerical_columns, self.cat_columns, scaler, thread_count)
 
-        return test_prediction
\ No newline at end of file
+        model = cb.CatBoostRegressor(
+            iterations=iterations,
+            **self.catboost_params(thread_count, used_ram_limit, border_count)
+        )
+        model.fit(train_pool, init_model=old_model)
+
+        y_valid = df_valid[self.target_column].to_numpy()
+        old_pred = old_model.predict(valid_pool)
+        new_pred = model.predict(valid_pool)
+        old_rmse = np.sqrt(mean_squared_error(y_valid, old_pred))
+        new_rmse = np.sqrt(mean_squared_error(y_valid, new_pred))
+        logger.info(f"RMSE на проверочных днях: прежняя модель {old_rmse:.4f}, дообученная {new_rmse:.4f}")
+
+        if new_rmse > old_rmse * (1 + max_degradation):
+            logger.warning(f"Дообученная модель хуже прежней более чем на {max_degradation:.0%}, "
+                           f"остается модель ID {artifacts.load_id}")
+            y_pred = old_pred
+        else:
+            load_id = model_storage.save_models(*codebooks, scaler, model, comment='incremental_learning_model',
+                                                train_cutoff=df_train['Дата'].max().date())
+            y_pred = np.round(np.clip(new_pred, 0, None)).astype(int)
+            report = ForecastEvaluator().evaluate(
+                np.round(y_valid).astype(int), y_pred,
+                stores=df_valid['Магазин'].to_numpy(), categories=df_valid['Категория'].to_numpy(),
+                pairs=self.pair_ids(df_valid_encoding)
+            )
+            MetricsStorage(db).save_metrics(load_id, report)
+            y_pred = new_pred
+
+        result = df_valid[['Дата', 'Магазин', 'Товар']].copy()
+        result['Реальные значения'] = y_valid
+        result['Предсказанные значения'] = np.round(np.clip(y_pred, 0, None)).astype(int)
+        return result
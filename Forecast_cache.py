@@ -0,0 +1,292 @@
+"""
+Модуль чтения прогнозов из таблицы Прогноз.
+Прогнозы по ключу (Дата, Магазин) кэшируются в памяти процесса (LRU) и
+сбрасываются при записи в таблицу Прогноз; большие выгрузки читаются
+серверным курсором и отдаются потоком (JSON или CSV) без буферизации.
+"""
+import io
+import csv
+import json
+import base64
+import datetime
+import threading
+from collections import OrderedDict
+from itertools import islice
+from psycopg2 import sql
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+FORECAST_COLUMNS = ('Дата', 'Магазин', 'Товар', 'Прогноз')
+
+
+class ForecastCache:
+    """
+    LRU-кэш прогнозов: (Дата, Магазин) -> [(Товар, Прогноз), ...] по возрастанию Товар.
+
+    Кэш действует в пределах одного процесса. Каждый сброс увеличивает version:
+    данные, прочитанные из БД до сброса, в кэш не записываются (put_many с
+    устаревшей версией игнорируется).
+    """
+
+    def __init__(self, max_entries=20000):
+        """
+        Args:
+            max_entries: Максимальное количество ключей (Дата, Магазин) в кэше
+        """
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries):
+        """Изменяет размер кэша (лишние старые ключи удаляются)"""
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """Возвращает {ключ: строки} для ключей, которые есть в кэше"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                rows = self._entries.get(key)
+                if rows is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = rows
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries, version):
+        """Записывает ключи, прочитанные при версии кэша version"""
+        with self._lock:
+            if version != self.version:
+                logger.debug("Кэш прогнозов сброшен во время чтения, данные не кэшируются")
+                return
+            for key, rows in entries.items():
+                self._entries[key] = rows
+                self._entries.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, keys=None):
+        """
+        Сбрасывает ключи (Дата, Магазин); keys=None - весь кэш.
+
+        Returns:
+            int: Количество удаленных ключей
+        """
+        with self._lock:
+            self.version += 1
+            if keys is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                removed = 0
+                for key in set(keys):
+                    if self._entries.pop(key, None) is not None:
+                        removed += 1
+        if removed:
+            logger.debug(f"Из кэша прогнозов удалено {removed} ключей")
+        return removed
+
+
+# Кэш прогнозов процесса: сбрасывается DataLoader при записи в таблицу Прогноз
+forecast_cache = ForecastCache()
+
+
+def encode_cursor(row):
+    """Курсор страницы - ключ (Дата, Магазин, Товар) последней отданной строки"""
+    key = [row[0].isoformat(), row[1], row[2]]
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор страницы в ключ (Дата, Магазин, Товар)"""
+    try:
+        date, store, product = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.date.fromisoformat(date), store, product
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Некорректный курсор страницы: {cursor}") from e
+
+
+class ForecastReader:
+    """
+    Чтение прогнозов с фильтрами по магазинам, товарам и диапазону дат.
+
+    Если заданы магазины и ограниченный диапазон дат, прогнозы берутся из
+    ForecastCache по ключам (Дата, Магазин), недостающие ключи читаются из БД
+    одним запросом. Иначе строки читаются серверным курсором порциями по
+    fetch_size, не загружая выборку в память целиком.
+    """
+
+    def __init__(self, db_connector, cache=forecast_cache, fetch_size=10000):
+        """
+        Args:
+            db_connector: Коннектор к базе данных
+            cache: ForecastCache
+            fetch_size: Количество строк, получаемых серверным курсором за раз
+        """
+        self.db = db_connector
+        self.cache = cache
+        self.fetch_size = fetch_size
+
+    def cache_keys(self, stores, date_from, date_to):
+        """Ключи кэша для запроса или None, если запрос читается напрямую из БД"""
+        if not stores or date_from is None or date_to is None:
+            return None
+        n_days = (date_to - date_from).days + 1
+        if n_days <= 0:
+            return []
+        stores = sorted(set(stores))
+        if n_days * len(stores) > self.cache.max_entries:
+            return None
+        return [(date_from + datetime.timedelta(days=day), store) for day in range(n_days) for store in stores]
+
+    def _load_keys(self, keys):
+        """Читает из БД прогнозы для ключей (Дата, Магазин)"""
+        entries = {key: [] for key in keys}
+        dates = sorted({date for date, _ in keys})
+        stores = sorted({store for _, store in keys})
+
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT "Дата", "Магазин", "Товар", "Прогноз"
+                    FROM "Прогноз"
+                    WHERE "Дата" = ANY(%s) AND "Магазин" = ANY(%s)
+                """, (dates, stores))
+                for date, store, product, forecast in cursor:
+                    rows = entries.get((date, store))
+                    if rows is not None:
+                        rows.append((product, forecast))
+
+        for rows in entries.values():
+            rows.sort()
+        logger.debug(f"Из таблицы Прогноз загружено ключей (Дата, Магазин): {len(keys)}")
+        return entries
+
+    def _iter_cached(self, keys, products, after):
+        version = self.cache.version
+        entries = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in entries]
+        if missing:
+            loaded = self._load_keys(missing)
+            self.cache.put_many(loaded, version)
+            entries.update(loaded)
+
+        products = set(products) if products else None
+        for date, store in keys:
+            if after is not None and (date, store) < after[:2]:
+                continue
+            for product, forecast in entries[(date, store)]:
+                if products is not None and product not in products:
+                    continue
+                if after is not None and (date, store, product) <= after:
+                    continue
+                yield date, store, product, forecast
+
+    def _iter_database(self, stores, products, date_from, date_to, after):
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append(sql.SQL('"Дата" >= %s'))
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append(sql.SQL('"Дата" <= %s'))
+            params.append(date_to)
+        if stores:
+            conditions.append(sql.SQL('"Магазин" = ANY(%s)'))
+            params.append(list(stores))
+        if products:
+            conditions.append(sql.SQL('"Товар" = ANY(%s)'))
+            params.append(list(products))
+        if after is not None:
+            conditions.append(sql.SQL('("Дата", "Магазин", "Товар") > (%s, %s, %s)'))
+            params.extend(after)
+
+        where = sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions) if conditions else sql.SQL('')
+        query = sql.SQL('SELECT "Дата", "Магазин", "Товар", "Прогноз" FROM "Прогноз"{} '
+                        'ORDER BY "Дата", "Магазин", "Товар"').format(where)
+
+        with self.db.get_connection() as conn:
+            # Серверный курсор: строки передаются порциями по fetch_size
+            with conn.cursor(name='forecast_reader') as cursor:
+                cursor.itersize = self.fetch_size
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+
+    def iter_rows(self, stores=None, products=None, date_from=None, date_to=None, after=None):
+        """
+        Генератор строк (Дата, Магазин, Товар, Прогноз) в порядке ключа.
+
+        Args:
+            stores: Список магазинов (None - все)
+            products: Список товаров (None - все)
+            date_from: Первая дата (включительно)
+            date_to: Последняя дата (включительно)
+            after: Ключ (Дата, Магазин, Товар), после которого начинается выдача
+        """
+        keys = self.cache_keys(stores, date_from, date_to)
+        if keys is None:
+            return self._iter_database(stores, products, date_from, date_to, after)
+        return self._iter_cached(keys, products, after)
+
+    def read_page(self, limit, stores=None, products=None, date_from=None, date_to=None, after=None):
+        """
+        Читает одну страницу прогнозов.
+
+        Returns:
+            tuple: (строки страницы, курсор следующей страницы или None)
+        """
+        rows = list(islice(self.iter_rows(stores, products, date_from, date_to, after), limit + 1))
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+
+def iter_json(rows, next_cursor=None, chunk_rows=1000):
+    """Сериализует строки прогноза в JSON по частям: {"rows": [...], "next_cursor": ...}"""
+    yield '{"rows": ['
+    rows = iter(rows)
+    first = True
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        parts = [json.dumps({'Дата': date.isoformat(), 'Магазин': store, 'Товар': product, 'Прогноз': forecast},
+                            ensure_ascii=False)
+                 for date, store, product, forecast in chunk]
+        yield ('' if first else ', ') + ', '.join(parts)
+        first = False
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+
+def iter_csv(rows, chunk_rows=1000):
+    """Сериализует строки прогноза в CSV по частям (с заголовком)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(FORECAST_COLUMNS)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        writer.writerows((date.isoformat(), store, product, forecast) for date, store, product, forecast in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,268 @@
+"""
+Модуль подбора гиперпараметров CatBoost с помощью Optuna.
+Испытания выполняются параллельными процессами с общим RDB-хранилищем
+(SQLite локально, PostgreSQL в stage/prod) в пределах бюджета времени.
+"""
+import os
+import time
+import uuid
+import multiprocessing
+import numpy as np
+import catboost as cb
+import optuna
+import logging
+from Inference_engine import build_pool
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class OptunaPruningCallback:
+    """
+    Callback CatBoost: передает RMSE на проверочной выборке в испытание Optuna
+    и останавливает обучение, если pruner признал испытание неперспективным.
+    """
+
+    def __init__(self, trial, metric='RMSE', report_every=50):
+        self.trial = trial
+        self.metric = metric
+        self.report_every = report_every
+        self.pruned = False
+
+    def after_iteration(self, info):
+        if info.iteration % self.report_every != 0:
+            return True
+
+        value = info.metrics['validation'][self.metric][-1]
+        self.trial.report(value, step=info.iteration)
+        if self.trial.should_prune():
+            self.pruned = True
+            return False
+        return True
+
+
+class CatBoostTuner:
+    """
+    Подбор depth, learning_rate, l2_leaf_reg и delta функции потерь Huber.
+
+    Поиск идет в два этапа:
+    1. Испытания на подвыборке пар Магазин+Товар (доля subsample) - параллельно
+       в n_jobs процессах, с прерыванием слабых испытаний по ходу обучения.
+    2. Лучшие top_k наборов параметров переобучаются на полных данных,
+       выбирается лучший по RMSE на тестовой выборке.
+    Оба этапа укладываются в бюджет timeout секунд. Лучшая модель полных
+    данных возвращается вместе с параметрами и повторно не обучается.
+    """
+
+    def __init__(self, storage, study_name='catboost_sales', n_trials=50, timeout=3600, n_jobs=2,
+                 subsample=0.2, trial_iterations=1000, top_k=3, search_share=0.8, random_state=42):
+        """
+        Args:
+            storage: URL RDB-хранилища Optuna (sqlite:///optuna.db, postgresql://...)
+            study_name: Префикс названия исследования в хранилище; каждый запуск
+                tune создает новое исследование (run_study_name)
+            n_trials: Максимальное количество испытаний на подвыборке (на все процессы)
+            timeout: Бюджет времени на весь подбор, секунды
+            n_jobs: Количество параллельных процессов
+            subsample: Доля пар Магазин+Товар для испытаний на подвыборке
+            trial_iterations: Максимальное количество итераций в одном испытании
+            top_k: Сколько лучших наборов параметров проверить на полных данных
+            search_share: Доля бюджета времени на испытания на подвыборке
+            random_state: Зерно генератора случайных чисел
+        """
+        if not 0 < subsample <= 1:
+            raise ValueError(f"subsample должен быть в диапазоне (0, 1], получено: {subsample}")
+
+        self.storage = storage
+        self.study_name = study_name
+        self.n_trials = n_trials
+        self.timeout = timeout
+        self.n_jobs = max(1, n_jobs)
+        self.subsample = subsample
+        self.trial_iterations = trial_iterations
+        self.top_k = top_k
+        self.search_share = search_share
+        self.random_state = random_state
+        self.thread_count = max(1, (os.cpu_count() or 1) // self.n_jobs)
+
+    @staticmethod
+    def suggest_params(trial):
+        """Пространство поиска гиперпараметров"""
+        delta = trial.suggest_float('huber_delta', 0.1, 5.0, log=True)
+        return {
+            'depth': trial.suggest_int('depth', 4, 10),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+            'l2_leaf_reg': trial.suggest_float('l2_leaf_reg', 1.0, 30.0, log=True),
+            'loss_function': f'Huber:delta={delta:.4g}',
+        }
+
+    @staticmethod
+    def to_catboost_params(params):
+        """Переводит параметры исследования Optuna в параметры CatBoost"""
+        params = dict(params)
+        delta = params.pop('huber_delta', None)
+        if delta is not None:
+            params['loss_function'] = f'Huber:delta={delta:.4g}'
+        return params
+
+    def subsample_mask(self, pair_ids):
+        """Маска строк случайной доли пар Магазин+Товар"""
+        if self.subsample >= 1:
+            return np.ones(len(pair_ids), dtype=bool)
+
+        pairs = np.unique(pair_ids)
+        rng = np.random.default_rng(self.random_state)
+        n_selected = max(1, int(round(len(pairs) * self.subsample)))
+        selected = rng.choice(pairs, size=n_selected, replace=False)
+        return np.isin(pair_ids, selected)
+
+    def build_pools(self, train_data, test_data, feature_names, pool_cache=None):
+        """
+        Пулы для испытаний: обучающий квантуется один раз и используется во всех
+        испытаниях процесса (при заданном pool_cache - берется из дискового кэша).
+        """
+        numerical_columns, cat_columns = feature_names
+        if pool_cache is not None:
+            train_pool, _ = pool_cache.get(*train_data, numerical_columns, cat_columns)
+        else:
+            num_matrix, cat_matrix, label = train_data
+            train_pool = build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns,
+                                    label=label, thread_count=self.thread_count)
+            train_pool.quantize()
+        num_matrix, cat_matrix, label = test_data
+        test_pool = build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns,
+                               label=label, thread_count=self.thread_count)
+        return train_pool, test_pool
+
+    def fit_and_score(self, params, train_pool, test_pool, callbacks=None):
+        """Обучает модель с параметрами и возвращает (лучший RMSE на тесте, модель)"""
+        model = cb.CatBoostRegressor(
+            iterations=self.trial_iterations,
+            eval_metric='RMSE',
+            early_stopping_rounds=100,
+            use_best_model=True,
+            random_state=self.random_state,
+            thread_count=self.thread_count,
+            allow_writing_files=False,
+            verbose=0,
+            **params
+        )
+        model.fit(train_pool, eval_set=test_pool, callbacks=callbacks)
+        return model.get_best_score()['validation']['RMSE'], model
+
+    def _objective(self, trial, train_pool, test_pool):
+        params = self.suggest_params(trial)
+        pruning = OptunaPruningCallback(trial)
+        score, _ = self.fit_and_score(params, train_pool, test_pool, callbacks=[pruning])
+        if pruning.pruned:
+            raise optuna.TrialPruned()
+        return score
+
+    def run_study_name(self):
+        """
+        Название исследования одного запуска: study_name с меткой времени.
+        Испытания прежних запусков (на других данных) не входят в лимит n_trials
+        MaxTrialsCallback и в выбор лучших параметров.
+        """
+        return f"{self.study_name}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+    def _run_worker(self, worker_id, study_name, train_data, test_data, feature_names, deadline):
+        """Процесс поиска: подключается к исследованию запуска и выполняет испытания до бюджета"""
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        train_pool, test_pool = self.build_pools(train_data, test_data, feature_names)
+        study = optuna.load_study(
+            study_name=study_name,
+            storage=self.storage,
+            sampler=optuna.samplers.TPESampler(seed=self.random_state + worker_id),
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=100),
+        )
+        study.optimize(
+            lambda trial: self._objective(trial, train_pool, test_pool),
+            timeout=max(1.0, deadline - time.time()),
+            callbacks=[optuna.study.MaxTrialsCallback(
+                self.n_trials, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+            )],
+            gc_after_trial=True,
+        )
+
+    def tune(self, train_data, test_data, train_pairs, test_pairs, numerical_columns, cat_columns, pool_cache=None):
+        """
+        Подбор гиперпараметров.
+
+        Args:
+            train_data: (num_matrix, cat_matrix, label) обучающей выборки
+            test_data: (num_matrix, cat_matrix, label) тестовой выборки
+            train_pairs: Идентификатор пары Магазин+Товар для строк обучающей выборки
+            test_pairs: Идентификатор пары Магазин+Товар для строк тестовой выборки
+            numerical_columns: Список числовых признаков
+            cat_columns: Список категориальных признаков
+            pool_cache: QuantizedPoolCache для квантованного пула полных данных
+
+        Returns:
+            tuple: (лучшие параметры CatBoost (depth, learning_rate, l2_leaf_reg, loss_function),
+                модель, обученная с ними на полных данных, или None, если бюджет времени
+                исчерпан до обучения на полных данных)
+        """
+        start = time.time()
+        deadline = start + self.timeout * self.search_share
+        feature_names = (list(numerical_columns), list(cat_columns))
+
+        train_mask = self.subsample_mask(train_pairs)
+        test_mask = np.isin(test_pairs, np.unique(train_pairs[train_mask]))
+        sub_train = tuple(part[train_mask] for part in train_data)
+        sub_test = tuple(part[test_mask] for part in test_data)
+        study_name = self.run_study_name()
+        logger.info(f"Подбор гиперпараметров: подвыборка {train_mask.sum()} из {len(train_mask)} строк, "
+                    f"процессов: {self.n_jobs}, бюджет {self.timeout} с, исследование {study_name}")
+
+        optuna.create_study(study_name=study_name, storage=self.storage, direction='minimize')
+
+        if self.n_jobs == 1:
+            self._run_worker(0, study_name, sub_train, sub_test, feature_names, deadline)
+        else:
+            # spawn, а не fork: подбор запускается из процесса API с активными пулами
+            # потоков и потоками OpenMP CatBoost, а fork многопоточного процесса
+            # может заблокировать дочерний. Подвыборка передается процессам через pickle
+            context = multiprocessing.get_context('spawn')
+            workers = [
+                context.Process(target=self._run_worker, args=(i, study_name, sub_train, sub_test, feature_names, deadline))
+                for i in range(self.n_jobs)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+                if worker.exitcode != 0:
+                    logger.warning(f"Процесс подбора гиперпараметров завершился с кодом {worker.exitcode}")
+
+        study = optuna.load_study(study_name=study_name, storage=self.storage)
+        completed = [t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE]
+        pruned = sum(t.state == optuna.trial.TrialState.PRUNED for t in study.trials)
+        if not completed:
+            raise RuntimeError("Ни одно испытание подбора гиперпараметров не завершено: увеличьте бюджет времени")
+        logger.info(f"Испытаний завершено: {len(completed)}, прервано: {pruned}, "
+                    f"лучший RMSE на подвыборке: {study.best_value:.4f}")
+
+        # Проверка лучших параметров на полных данных в оставшемся бюджете
+        candidates = sorted(completed, key=lambda t: t.value)[:self.top_k]
+        best_params, best_score, best_model = self.to_catboost_params(candidates[0].params), None, None
+        train_pool, test_pool = None, None
+        for trial in candidates:
+            if time.time() >= start + self.timeout:
+                logger.info("Бюджет времени исчерпан, проверка на полных данных остановлена")
+                break
+            if train_pool is None:
+                train_pool, test_pool = self.build_pools(train_data, test_data, feature_names, pool_cache)
+            params = self.to_catboost_params(trial.params)
+            score, model = self.fit_and_score(params, train_pool, test_pool)
+            logger.info(f"Испытание {trial.number}: RMSE на полных данных {score:.4f}, параметры {params}")
+            if best_score is None or score < best_score:
+                best_params, best_score, best_model = params, score, model
+
+        if best_model is None:
+            logger.info(f"Лучшие параметры подвыборки: {best_params}, на полных данных не проверены, "
+                        f"время подбора {time.time() - start:.0f} с")
+        else:
+            logger.info(f"Лучшие параметры: {best_params} (RMSE {best_score:.4f}), "
+                        f"время подбора {time.time() - start:.0f} с")
+        return best_params, best_model
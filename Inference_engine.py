@@ -0,0 +1,156 @@
+"""
+Модуль пакетного инференса модели CatBoost.
+Собирает Pool один раз из предварительно закодированных непрерывных массивов
+и выполняет предсказание пакетами с заданным количеством потоков.
+"""
+import numpy as np
+import catboost as cb
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+def build_cat_matrix(columns, cat_columns, n_rows):
+    """
+    Формирует матрицу категориальных признаков (dtype=object).
+
+    Значения приводятся к строкам так же, как это делает CatBoost при
+    обучении на pandas DataFrame: целые числа - в десятичную запись,
+    булевы значения - в '1'/'0'.
+
+    Args:
+        columns: DataFrame или словарь {столбец: массив значений}
+        cat_columns: Список категориальных признаков
+        n_rows: Количество строк
+    """
+    matrix = np.empty((n_rows, len(cat_columns)), dtype=object)
+    for j, col in enumerate(cat_columns):
+        values = np.asarray(columns[col])
+        if values.dtype == bool:
+            values = values.astype(np.int8)
+        matrix[:, j] = values.astype(str)
+    return matrix
+
+
+def build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns, label=None, thread_count=-1):
+    """
+    Собирает Pool из числовой float32-матрицы и матрицы категориальных значений.
+    Используется и при обучении (с label), и при предсказании.
+
+    Args:
+        num_matrix: Числовые признаки, shape (n, len(numerical_columns))
+        cat_matrix: Категориальные признаки, shape (n, len(cat_columns))
+        numerical_columns: Список числовых признаков
+        cat_columns: Список категориальных признаков
+        label: Целевая переменная (для обучения)
+        thread_count: Количество потоков CatBoost
+
+    Returns:
+        catboost.Pool: Пул данных
+    """
+    num_matrix = np.ascontiguousarray(num_matrix, dtype=np.float32)
+    cat_matrix = np.ascontiguousarray(cat_matrix, dtype=object)
+
+    if num_matrix.shape[0] != cat_matrix.shape[0]:
+        raise ValueError(
+            f"Разное количество строк в числовых ({num_matrix.shape[0]}) "
+            f"и категориальных ({cat_matrix.shape[0]}) признаках"
+        )
+
+    features = cb.FeaturesData(
+        num_feature_data=num_matrix,
+        cat_feature_data=cat_matrix,
+        num_feature_names=list(numerical_columns),
+        cat_feature_names=list(cat_columns)
+    )
+    return cb.Pool(features, label=label, thread_count=thread_count)
+
+
+class InferenceEngine:
+    """
+    Движок пакетного предсказания для обученной модели CatBoost.
+
+    Признаки передаются в модель в том же порядке, что и при обучении:
+    сначала числовые столбцы, затем категориальные.
+    """
+
+    def __init__(self, model, numerical_columns, cat_columns, thread_count=-1, batch_size=100000):
+        """
+        Args:
+            model: Обученная модель CatBoost
+            numerical_columns: Список числовых признаков
+            cat_columns: Список категориальных признаков
+            thread_count: Количество потоков CatBoost (-1 - все доступные ядра)
+            batch_size: Количество строк в одном пакете предсказания
+        """
+        if batch_size <= 0:
+            raise ValueError(f"batch_size должен быть положительным, получено: {batch_size}")
+
+        self.model = model
+        self.numerical_columns = list(numerical_columns)
+        self.cat_columns = list(cat_columns)
+        self.thread_count = thread_count
+        self.batch_size = batch_size
+
+    def cat_matrix(self, columns, n_rows):
+        """
+        Формирует матрицу категориальных признаков модели (см. build_cat_matrix).
+
+        Args:
+            columns: DataFrame или словарь {столбец: массив значений}
+            n_rows: Количество строк
+        """
+        return build_cat_matrix(columns, self.cat_columns, n_rows)
+
+    def build_pool(self, num_matrix, cat_matrix):
+        """
+        Собирает Pool для предсказания (см. build_pool).
+
+        Args:
+            num_matrix: Числовые признаки, shape (n, len(numerical_columns))
+            cat_matrix: Категориальные признаки, shape (n, len(cat_columns))
+
+        Returns:
+            catboost.Pool: Пул для предсказания
+        """
+        return build_pool(num_matrix, cat_matrix, self.numerical_columns, self.cat_columns,
+                          thread_count=self.thread_count)
+
+    def predict(self, pool):
+        """
+        Выполняет предсказание по пулу пакетами по batch_size строк.
+
+        Returns:
+            np.ndarray: Предсказания модели
+        """
+        n_rows = pool.num_row()
+        if n_rows == 0:
+            return np.empty(0, dtype=np.float64)
+
+        if n_rows <= self.batch_size:
+            return self.model.predict(pool, thread_count=self.thread_count)
+
+        predictions = np.empty(n_rows, dtype=np.float64)
+        for start in range(0, n_rows, self.batch_size):
+            stop = min(start + self.batch_size, n_rows)
+            batch = pool.slice(np.arange(start, stop))
+            predictions[start:stop] = self.model.predict(batch, thread_count=self.thread_count)
+            logger.debug(f"Предсказано {stop}/{n_rows} строк")
+
+        return predictions
+
+    def predict_arrays(self, num_matrix, cat_columns):
+        """
+        Предсказание для уже масштабированной числовой матрицы и
+        закодированных категориальных признаков.
+
+        Args:
+            num_matrix: Числовые признаки, shape (n, len(numerical_columns))
+            cat_columns: DataFrame или словарь {столбец: массив значений}
+        """
+        if len(num_matrix) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        pool = self.build_pool(num_matrix, self.cat_matrix(cat_columns, len(num_matrix)))
+        return self.predict(pool)
@@ -0,0 +1,171 @@
+"""
+Модуль форматов входных файлов.
+Формат определяется по сигнатуре (первым байтам) файла, а не по расширению:
+CSV (в том числе сжатый gzip, zstd или zip), Parquet, Feather и Excel.
+Колоночные форматы и сжатый CSV позволяют партнерам передавать выгрузки
+в компактном виде; Excel читается потоково, только значения ячеек.
+"""
+import zipfile
+import importlib
+import importlib.util
+import pandas as pd
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сигнатуры форматов: (первые байты, формат)
+MAGIC_BYTES = [
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'feather'),
+    (b'FEA1', 'feather'),
+    (b'\x1f\x8b', 'csv.gz'),
+    (b'\x28\xb5\x2f\xfd', 'csv.zst'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'xls'),
+    (b'PK\x03\x04', 'zip'),
+]
+
+# Сжатие pandas.read_csv для форматов CSV
+CSV_COMPRESSION = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd', 'csv.zip': 'zip'}
+
+FORMATS = list(CSV_COMPRESSION) + ['parquet', 'feather', 'xlsx', 'xls']
+
+
+def _import_optional(module_name, package, file_format):
+    """Импорт необязательного пакета для чтения формата"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(f"Для чтения формата {file_format} требуется пакет {package}: "
+                          f"pip install {package}") from e
+
+
+def sniff_format(path):
+    """
+    Формат файла по сигнатуре. ZIP архив с книгой Excel - xlsx, иначе CSV в zip;
+    файл без известной сигнатуры читается как CSV.
+
+    Returns:
+        str: Один из FORMATS
+    """
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    for magic, file_format in MAGIC_BYTES:
+        if head.startswith(magic):
+            break
+    else:
+        return 'csv'
+    if file_format == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            return 'xlsx' if 'xl/workbook.xml' in archive.namelist() else 'csv.zip'
+    return file_format
+
+
+def _read_parquet(path, schema):
+    pq = _import_optional('pyarrow.parquet', 'pyarrow', 'parquet')
+    header = pq.read_schema(path).names
+    # Читаются только столбцы схемы
+    columns = schema.usecols(header) if schema is not None else None
+    return pq.read_table(path, columns=columns).to_pandas(), header
+
+
+def _read_feather(path, schema):
+    feather = _import_optional('pyarrow.feather', 'pyarrow', 'feather')
+    table = feather.read_table(path, memory_map=True)
+    header = table.column_names
+    if schema is not None:
+        table = table.select(schema.usecols(header))
+    return table.to_pandas(), header
+
+
+def _read_xlsx_streaming(path, schema):
+    """
+    Потоковое чтение первого листа xlsx через openpyxl в режиме read_only:
+    строки читаются по одной без построения модели книги, формулы - по
+    сохраненным значениям, в память попадают только столбцы схемы.
+
+    Returns:
+        tuple: (DataFrame, столбцы файла)
+    """
+    openpyxl = _import_optional('openpyxl', 'openpyxl', 'xlsx')
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = ['' if value is None else str(value).strip() for value in next(rows, ())]
+        keep = [(i, col) for i, col in enumerate(header)
+                if col and (schema is None or col in schema.columns)]
+        data = {col: [] for _, col in keep}
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            for i, col in keep:
+                data[col].append(row[i] if i < len(row) else None)
+    finally:
+        workbook.close()
+    return pd.DataFrame(data), [col for col in header if col]
+
+
+def _read_excel(path, file_format, schema):
+    """
+    Excel: calamine, если установлен, иначе потоково через openpyxl (xlsx) или xlrd (xls).
+
+    Returns:
+        tuple: (DataFrame, столбцы файла, движок)
+    """
+    if importlib.util.find_spec('python_calamine') is not None:
+        engine = 'calamine'
+    elif file_format == 'xlsx':
+        return (*_read_xlsx_streaming(path, schema), 'openpyxl')
+    else:
+        engine = 'xlrd'
+        _import_optional('xlrd', 'xlrd', file_format)
+    df = pd.read_excel(path, engine=engine)
+    return df, None, engine
+
+
+def read_input(path, schema=None, file_format=None):
+    """
+    Чтение входного файла любого поддерживаемого формата.
+
+    Args:
+        path: Локальный путь к файлу
+        schema: CSVInputSchema для проверки столбцов и типов (None - без проверки,
+            столбец Дата приводится к datetime)
+        file_format: Формат из FORMATS (None - определить по сигнатуре)
+
+    Returns:
+        tuple: (DataFrame, отчет проверки схемы или None). Отчет дополняется
+            ключом format
+
+    Raises:
+        SchemaValidationError: Файл не соответствует schema
+        ImportError: Для формата не установлен необязательный пакет
+    """
+    file_format = file_format or sniff_format(path)
+    if file_format not in FORMATS:
+        raise ValueError(f"Неподдерживаемый формат входного файла: {file_format}")
+    logger.debug(f"{path}: формат {file_format}")
+
+    if file_format in CSV_COMPRESSION:
+        compression = CSV_COMPRESSION[file_format]
+        if compression == 'zstd':
+            _import_optional('zstandard', 'zstandard', file_format)
+        if schema is not None:
+            df, report = schema.read_csv(path, compression=compression)
+            report['format'] = file_format
+            return df, report
+        df = pd.read_csv(path, compression=compression)
+    elif file_format == 'parquet':
+        (df, header), engine = _read_parquet(path, schema), 'pyarrow'
+    elif file_format == 'feather':
+        (df, header), engine = _read_feather(path, schema), 'pyarrow'
+    else:
+        df, header, engine = _read_excel(path, file_format, schema)
+
+    if schema is not None:
+        df, report = schema.validate_frame(df, engine, header)
+        report['format'] = file_format
+        return df, report
+    if 'Дата' in df.columns:
+        df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
+    return df, None
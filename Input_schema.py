@@ -0,0 +1,224 @@
+"""
+Модуль схемы входных файлов (CSV и таблиц, прочитанных Input_formats).
+Схема задает столбцы, типы и формат даты исходных данных, поэтому файл
+читается за один проход без определения типов и разбора дат через dateutil.
+Результат чтения сопровождается отчетом проверки: отсутствующие и лишние
+столбцы, некорректные значения и отброшенные строки.
+"""
+import importlib.util
+import pandas as pd
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Движок pyarrow используется, если пакет установлен
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
+TRUE_VALUES = {'true', '1', 'да', 'yes', 'истина'}
+FALSE_VALUES = {'false', '0', 'нет', 'no', 'ложь', ''}
+
+
+class SchemaValidationError(ValueError):
+    """Файл не соответствует схеме; report - отчет проверки"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+class CSVInputSchema:
+    """
+    Схема входного CSV файла.
+
+    Типы столбцов: date - дата в формате date_format, text - строка,
+    key - код магазина или товара, number - число, flag - логический признак
+    (True/False, 1/0, да/нет). Типы не передаются движку чтения: объявленный
+    dtype=str поэлементно перепроверяет строки и замедляет чтение, поэтому
+    столбцы разбираются движком и проверяются по схеме после чтения (числовые
+    коды остаются числами, как в уже загруженных данных). Столбцы, которых нет
+    в схеме, не читаются.
+    """
+
+    def __init__(self, columns, required, date_column='Дата', date_format='%d.%m.%Y', engine=CSV_ENGINE):
+        """
+        Args:
+            columns: Словарь {столбец: тип}
+            required: Обязательные столбцы
+            date_column: Столбец даты
+            date_format: Формат даты в файле
+            engine: Движок pandas.read_csv (pyarrow или c)
+        """
+        self.columns = dict(columns)
+        self.required = list(required)
+        self.date_column = date_column
+        self.date_format = date_format
+        self.engine = engine
+
+    @staticmethod
+    def read_header(path, sep=',', encoding='utf-8-sig', compression=None):
+        """Заголовок CSV файла (первая строка), в том числе сжатого gzip, zstd или zip"""
+        try:
+            return list(pd.read_csv(path, sep=sep, encoding=encoding, compression=compression, nrows=0).columns)
+        except pd.errors.EmptyDataError:
+            return []
+
+    @staticmethod
+    def _invalid(series, bad):
+        return {'count': int(bad.sum()), 'examples': series[bad].head(5).tolist()}
+
+    def _check_number(self, series, report):
+        if pd.api.types.is_numeric_dtype(series) and series.dtype != bool:
+            return series
+        parsed = pd.to_numeric(series, errors='coerce')
+        bad = parsed.isna() & series.notna()
+        if bad.any():
+            report['invalid'][series.name] = self._invalid(series, bad)
+        return parsed
+
+    def _check_flag(self, series, report):
+        if series.dtype == bool:
+            return series
+        if pd.api.types.is_numeric_dtype(series):
+            return series.fillna(0) != 0
+        values = series.astype(str).str.strip().str.lower()
+        is_true = values.isin(TRUE_VALUES)
+        bad = ~is_true & ~values.isin(FALSE_VALUES) & series.notna()
+        if bad.any():
+            report['invalid'][series.name] = self._invalid(series, bad)
+        return is_true
+
+    def _report(self, header, engine):
+        """Начальный отчет проверки по заголовку файла"""
+        report = {
+            'engine': engine,
+            'rows': 0,
+            'missing_columns': [col for col in self.required if col not in header],
+            'ignored_columns': [col for col in header if col not in self.columns],
+            'absent_optional_columns': [col for col in self.columns if col not in header and col not in self.required],
+            'invalid': {},
+            'dropped_rows': 0
+        }
+        if report['missing_columns']:
+            raise SchemaValidationError(f"Отсутствуют обязательные столбцы: {report['missing_columns']}", report)
+        return report
+
+    def usecols(self, header):
+        """Столбцы заголовка, которые входят в схему"""
+        return [col for col in header if col in self.columns]
+
+    def read_csv(self, path, sep=',', encoding='utf-8-sig', compression=None):
+        """
+        Чтение CSV файла по схеме за один проход.
+
+        Строки с некорректной датой отбрасываются и учитываются в отчете;
+        некорректные числа и признаки отклоняют файл.
+
+        Args:
+            compression: Сжатие файла (gzip, zstd, zip) или None
+
+        Returns:
+            tuple: (DataFrame, отчет проверки)
+
+        Raises:
+            SchemaValidationError: Нет обязательных столбцов, значения не соответствуют
+                типам или в файле не осталось строк
+        """
+        header = self.read_header(path, sep, encoding, compression)
+        report = self._report(header, self.engine)
+        # pyarrow сам пропускает BOM, а перекодирование через utf-8-sig замедляет чтение
+        read_encoding = 'utf-8' if self.engine == 'pyarrow' and encoding == 'utf-8-sig' else encoding
+        try:
+            df = pd.read_csv(path, sep=sep, encoding=read_encoding, compression=compression,
+                             usecols=self.usecols(header), engine=self.engine)
+        except ValueError as e:
+            raise SchemaValidationError(f"Ошибка разбора CSV: {e}", report) from e
+        return self._validate(df, report)
+
+    def validate_frame(self, df, engine, header=None):
+        """
+        Проверка DataFrame, прочитанного из Parquet, Feather или Excel, по схеме.
+        Столбцы вне схемы отбрасываются; даты, уже имеющие тип даты, не разбираются.
+
+        Args:
+            header: Все столбцы файла, если df прочитан только со столбцами схемы
+
+        Returns:
+            tuple: (DataFrame, отчет проверки)
+
+        Raises:
+            SchemaValidationError: Как в read_csv
+        """
+        df = df.rename(columns=str)
+        report = self._report(list(df.columns) if header is None else header, engine)
+        return self._validate(df.drop(columns=report['ignored_columns'], errors='ignore'), report)
+
+    def _validate(self, df, report):
+        """Проверка типов столбцов и разбор даты, общая для всех форматов"""
+        for col in df.columns:
+            if self.columns[col] == 'number':
+                df[col] = self._check_number(df[col], report)
+            elif self.columns[col] == 'flag':
+                df[col] = self._check_flag(df[col], report)
+            elif self.columns[col] == 'text' and df[col].dtype != object:
+                df[col] = df[col].astype(str)
+
+        rejected = list(report['invalid'])
+        if rejected:
+            details = ', '.join(f"{col}: {item['count']} (например {item['examples']})"
+                                for col, item in report['invalid'].items())
+            raise SchemaValidationError(f"Значения не соответствуют типам схемы: {details}", report)
+
+        if self.date_column in df.columns:
+            raw_dates = df[self.date_column]
+            if not pd.api.types.is_datetime64_any_dtype(raw_dates):
+                # Значения datetime (ячейки дат Excel) проходят разбор по формату без изменений
+                df[self.date_column] = pd.to_datetime(raw_dates, format=self.date_format, errors='coerce')
+            bad_dates = df[self.date_column].isna().to_numpy()
+            if bad_dates.any():
+                report['invalid'][self.date_column] = self._invalid(raw_dates, bad_dates)
+                report['dropped_rows'] = int(bad_dates.sum())
+                df = df.loc[~bad_dates].reset_index(drop=True)
+
+        report['rows'] = len(df)
+        if len(df) == 0:
+            raise SchemaValidationError("В файле нет строк с корректной датой", report)
+        return df, report
+
+    @staticmethod
+    def log_report(path, report):
+        """Пишет в лог отклонения файла от схемы"""
+        if report['ignored_columns']:
+            logger.info(f"{path}: столбцы вне схемы не загружаются: {report['ignored_columns']}")
+        if report['absent_optional_columns']:
+            logger.debug(f"{path}: нет необязательных столбцов: {report['absent_optional_columns']}")
+        for col, item in report['invalid'].items():
+            logger.warning(f"{path}: некорректных значений в {col}: {item['count']}, например {item['examples']}")
+        if report['dropped_rows']:
+            logger.warning(f"{path}: отброшено строк с некорректной датой: {report['dropped_rows']}")
+
+
+# Схема исходных данных продаж (таблица Исходные_данные_продаж)
+ORIGIN_SCHEMA = CSVInputSchema(
+    columns={
+        'Дата': 'date',
+        'Магазин': 'key',
+        'Товар': 'key',
+        'Цена': 'number',
+        'Акция': 'flag',
+        'Выходной': 'flag',
+        'Категория': 'text',
+        'ПотребГруппа': 'text',
+        'МНН': 'text',
+        'Продано': 'number',
+        'Остаток': 'number',
+        'Поступило': 'number',
+        'Заказ': 'number',
+        'КоличествоЧеков': 'number',
+        'ПроданоСеть': 'number',
+        'ОстатокСеть': 'number',
+        'ПоступилоСеть': 'number',
+        'КоличествоЧековСеть': 'number',
+    },
+    required=['Дата', 'Магазин', 'Товар']
+)
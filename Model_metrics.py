@@ -0,0 +1,116 @@
+"""
+Модуль оценки точности прогноза.
+Все метрики (RMSE, MAE, дефицит/излишки, разбивки по магазинам и категориям,
+распределения значений) считаются векторно в NumPy.
+"""
+import numpy as np
+import pandas as pd
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class ForecastEvaluator:
+    """
+    Оценка прогноза по реальным и предсказанным значениям.
+
+    Разница считается как реальное - предсказанное: положительная разница -
+    дефицит (недопрогноз), отрицательная - излишки, нулевая - точное попадание.
+    """
+
+    def _group_metrics(self, keys, y_true, y_pred):
+        """Метрики по группам за один проход bincount"""
+        codes, uniques = pd.factorize(np.asarray(keys), sort=True)
+        n_groups = len(uniques)
+        diff = y_true - y_pred
+
+        def group_sum(values):
+            return np.bincount(codes, weights=values, minlength=n_groups)
+
+        count = np.bincount(codes, minlength=n_groups)
+        return pd.DataFrame({
+            'Группа': uniques,
+            'Строк': count,
+            'RMSE': np.sqrt(group_sum(diff * diff) / count),
+            'MAE': group_sum(np.abs(diff)) / count,
+            'Реальные значения': group_sum(y_true),
+            'Предсказанные значения': group_sum(y_pred),
+            'Дефицит': group_sum(np.where(diff > 0, diff, 0)),
+            'Излишки': group_sum(np.where(diff < 0, -diff, 0)),
+        })
+
+    def evaluate(self, y_true, y_pred, stores=None, categories=None, pairs=None):
+        """
+        Считает метрики прогноза.
+
+        Args:
+            y_true: Реальные значения (целые)
+            y_pred: Предсказанные значения (целые)
+            stores: Магазин для каждой строки - для разбивки по магазинам
+            categories: Категория для каждой строки - для разбивки по категориям
+            pairs: Идентификатор пары Магазин+Товар - для суммарной разницы по парам
+
+        Returns:
+            dict: summary (общие метрики), by_store / by_category (DataFrame),
+                histogram_true / histogram_pred ({значение: количество})
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        diff = y_true - y_pred
+
+        deficit = diff > 0
+        surplus = diff < 0
+        exact = diff == 0
+
+        summary = {
+            'rows': int(len(diff)),
+            'rmse': float(np.sqrt(np.mean(diff.astype(np.float64) ** 2))) if len(diff) else 0.0,
+            'mae': float(np.mean(np.abs(diff))) if len(diff) else 0.0,
+            'deficit_sum': int(diff[deficit].sum()),
+            'surplus_sum': int(-diff[surplus].sum()),
+            'deficit_count': int(deficit.sum()),
+            'surplus_count': int(surplus.sum()),
+            'exact_count': int(exact.sum()),
+            'exact_sum': int(y_true[exact].sum()),
+            'true_sum': int(y_true.sum()),
+            'pred_sum': int(y_pred.sum()),
+        }
+
+        if pairs is not None:
+            pair_codes, pair_uniques = pd.factorize(np.asarray(pairs))
+            pair_diff = np.bincount(pair_codes, weights=diff, minlength=len(pair_uniques))
+            summary['pair_abs_diff_sum'] = int(np.abs(pair_diff).sum())
+
+        report = {'summary': summary}
+        if stores is not None:
+            report['by_store'] = self._group_metrics(stores, y_true, y_pred)
+        if categories is not None:
+            report['by_category'] = self._group_metrics(categories, y_true, y_pred)
+
+        for name, values in (('histogram_true', y_true), ('histogram_pred', y_pred)):
+            unique, counts = np.unique(values, return_counts=True)
+            report[name] = dict(zip(unique.tolist(), counts.tolist()))
+
+        return report
+
+    def log_report(self, report):
+        """Выводит метрики в лог в формате прежнего отчета обучения"""
+        summary = report['summary']
+        logger.info(f"Root Mean Squared Error: {summary['rmse']:.4f}")
+        logger.info(f"Mean Absolute Error: {summary['mae']:.4f}")
+        logger.info(f"Дефицит (Реальное значение): {summary['deficit_sum']}")
+        logger.info(f"Излишки (Реальное значение): {summary['surplus_sum']}")
+        logger.info(f"Дефицит (Количество): {summary['deficit_count']}")
+        logger.info(f"Излишки (Количество): {summary['surplus_count']}")
+        logger.info(f"Идеально предсказанных значений (Количество): {summary['exact_count']}")
+        logger.info(f"Идеально предсказанных значений (Реальное значение): {summary['exact_sum']}")
+        logger.info(f"Сумма реальных продаж за 7 дней: {summary['true_sum']}")
+        logger.info(f"Сумма предсказанных продаж за 7 дней: {summary['pred_sum']}")
+        if 'pair_abs_diff_sum' in summary:
+            logger.info(f"Общая разница между предсказанными и реальными значениями: {summary['pair_abs_diff_sum']}")
+
+        logger.debug("Распределение реальных значений:")
+        logger.debug(f"\n{pd.Series(report['histogram_true'], name='Количество')}")
+        logger.debug("Распределение предсказанных значений:")
+        logger.debug(f"\n{pd.Series(report['histogram_pred'], name='Количество')}")
@@ -5,23 +5,47 @@
 import catboost as cb
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 import logging
 from DB_operations import ModelStorage
-from Preprocessing import Preprocessing_data
+from Feature_store import LAG_FEATURES, KEY_COLUMNS, add_lag_features, normalize_recovery_columns
+from Inference_engine import InferenceEngine
+from Segmented_models import SegmentedModel
+from Categorical_codebook import CategoricalCodebook
+from Feature_scaling import FeatureScaler, feature_matrix
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 
 class Use_model_predict:
-    def add_lag_values(self, df_first, df_next):
-        df_first_copy = df_first.copy()
-        df_next_copy = df_next.copy()
+    numerical_columns = ['Цена',
+                         'Температура (°C)', 'Давление (мм рт. ст.)',
+                         'ПроданоСеть', 'ПоступилоСеть', 'ОстатокСеть', 'КоличествоЧековСеть',
+                         'Продано_правка', 'Поступило_правка', "Остаток_правка", "Смоделированные_заказы",
+                         'Продано_1д_назад', 'Поступило_1д_назад', 'Остаток_1д_назад', 'Заказ_1д_назад',
+                         'Продано_частота_3д', 'Продано_частота_7д', 'Продано_частота_21д',
+                         'Продано_темп_3д', 'Продано_темп_7д', 'Продано_темп_21д',
+                         'ПроданоСеть_1д_назад', 'ПоступилоСеть_1д_назад', 'ОстатокСеть_1д_назад', 'КоличествоЧековСеть_1д_назад',
+                         'ПроданоСеть_частота_3д', 'ПроданоСеть_частота_7д', 'ПроданоСеть_частота_21д',
+                         'ПроданоСеть_темп_3д', 'ПроданоСеть_темп_7д', 'ПроданоСеть_темп_21д',
+                         ]
+
+    cat_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН',
+                   'Акция', 'Выходной', 'ДеньНедели', 'Месяц', 'День', 'Год',
+                   'Сезонность', 'Сезонность_точн']
+
+    encod_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН']
+
+    # Столбцы исходных данных, не используемые моделью
+    drop_columns = ['Продано', 'Поступило', 'Остаток', 'КоличествоЧеков', 'Заказ',
+                    'Пуассон_распр', 'Медианный_лаг_в_днях']
 
-        processor = Preprocessing_data()
-        df_first_copy = processor.rename_columns(df_first_copy)
-        df_next_copy = processor.rename_columns(df_next_copy)
+    def add_lag_values(self, df_first, df_next):
+        # normalize_recovery_columns возвращает новый DataFrame, поэтому исходные не изменяются.
+        # В истории из БД смоделированные заказы лежат в столбце Заказы_правка,
+        # без переименования лаг заказа для первого нового дня получается пустым
+        df_first_copy = normalize_recovery_columns(df_first)
+        df_next_copy = normalize_recovery_columns(df_next)
 
 
         df_first_copy['Дата'] = pd.to_datetime(df_first_copy['Дата'])
@@ -36,46 +60,15 @@ class Use_model_predict:
         df = df.sort_values(by=['Магазин', 'Товар', 'Дата'])
         df = df.drop_duplicates(subset=['Магазин', 'Товар', 'Дата'])
 
-        # Лаги (значения за предыдущие периоды)
-        df['Продано_1д_назад'] = df.groupby(['Магазин', 'Товар'])['Продано_правка'].shift(1)
-        df['Поступило_1д_назад'] = df.groupby(['Магазин', 'Товар'])['Поступило_правка'].shift(1)
-        df['Остаток_1д_назад'] = df.groupby(['Магазин', 'Товар'])['Остаток_правка'].shift(1)
-        df['Заказ_1д_назад'] = df.groupby(['Магазин', 'Товар'])['Смоделированные_заказы'].shift(1)
-
-        df['Продано_частота'] = df.groupby(['Магазин', 'Товар'])['Продано_правка'].transform(lambda x: (x > 0).astype(int).shift(1))
-        df['Продано_частота_3д'] = df.groupby(['Магазин', 'Товар'])['Продано_частота'].transform(lambda x: x.rolling(window=3, min_periods=3).sum())
-        df['Продано_частота_7д'] = df.groupby(['Магазин', 'Товар'])['Продано_частота'].transform(lambda x: x.rolling(window=7, min_periods=7).sum())
-        df['Продано_частота_21д'] = df.groupby(['Магазин', 'Товар'])['Продано_частота'].transform(lambda x: x.rolling(window=21, min_periods=21).sum())
-
-        df['Продано_темп_3д'] = df.groupby(['Магазин', 'Товар'])['Продано_правка'].transform(lambda x: x.rolling(window=3, min_periods=3).mean().shift(1))
-        df['Продано_темп_7д'] = df.groupby(['Магазин', 'Товар'])['Продано_правка'].transform(lambda x: x.rolling(window=7, min_periods=7).mean().shift(1))
-        df['Продано_темп_21д'] = df.groupby(['Магазин', 'Товар'])['Продано_правка'].transform(lambda x: x.rolling(window=21, min_periods=21).mean().shift(1))
-
-
-        # Лаги (значения за предыдущие периоды)
-        df['ПроданоСеть_1д_назад'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть'].shift(1)
-        df['ПоступилоСеть_1д_назад'] = df.groupby(['Магазин', 'Товар'])['ПоступилоСеть'].shift(1)
-        df['ОстатокСеть_1д_назад'] = df.groupby(['Магазин', 'Товар'])['ОстатокСеть'].shift(1)
-        df['КоличествоЧековСеть_1д_назад'] = df.groupby(['Магазин', 'Товар'])['КоличествоЧековСеть'].shift(1)
+        # Лаги и скользящие окна по предыдущим строкам пары
+        df = add_lag_features(df)
 
-        df['ПроданоСеть_частота'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть'].transform(lambda x: (x > 0).astype(int).shift(1))
-        df['ПроданоСеть_частота_3д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть_частота'].transform(lambda x: x.rolling(window=3, min_periods=3).sum())
-        df['ПроданоСеть_частота_7д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть_частота'].transform(lambda x: x.rolling(window=7, min_periods=7).sum())
-        df['ПроданоСеть_частота_21д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть_частота'].transform(lambda x: x.rolling(window=21, min_periods=21).sum())
-
-        df['ПроданоСеть_темп_3д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть'].transform(lambda x: x.rolling(window=3, min_periods=3).mean().shift(1))
-        df['ПроданоСеть_темп_7д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть'].transform(lambda x: x.rolling(window=7, min_periods=7).mean().shift(1))
-        df['ПроданоСеть_темп_21д'] = df.groupby(['Магазин', 'Товар'])['ПроданоСеть'].transform(lambda x: x.rolling(window=21, min_periods=21).mean().shift(1))
-        
-
-        df = df.drop(['Продано_частота', 'ПроданоСеть_частота',
-                      'Продано', 'Поступило', 'Остаток', 'КоличествоЧеков', 'Заказ',
-                      'Пуассон_распр', 'Медианный_лаг_в_днях'], axis=1)
+        df = df.drop(self.drop_columns, axis=1)
 
         df_first_date_max = df_next_copy['Дата'].min()
         df = df[df['Дата'] >= df_first_date_max]
 
-        df = df.drop(columns=['Заказы_правка'], axis=1)
+        df = df.drop(columns=['Заказы_правка'], axis=1, errors='ignore')
         df = df.dropna()
         
         logger.debug(f"Форма датафрейма после добавления лагов: {df.shape}")
@@ -86,109 +79,127 @@ class Use_model_predict:
  
         return df
 
-    def encoding_futures(self, df, label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler):
-        df_encoding = df.copy()
-
-        encod_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН']
-        df_encoding[encod_columns] = df_encoding[encod_columns].astype(str)
-
-        for col, encoder in zip(encod_columns, [label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn]):
-            known = set(encoder.classes_)
-            before = len(df_encoding)
-            df_encoding = df_encoding[df_encoding[col].isin(known)]
-            after = len(df_encoding)
-            if before != after:
-                logger.warning(f"Удалено {before - after} строк с неизвестными значениями в {col}")
-
-        # Кодируем столбец 'Товар' с помощью LabelEncoder только для обучающих данных
-        df_encoding['Товар'] = label_encoder_product.transform(df_encoding['Товар'])
-   
-        df_encoding['Магазин'] = label_encoder_shop.transform(df_encoding['Магазин'])
-   
-        df_encoding['Категория'] = label_encoder_category.transform(df_encoding['Категория'])
-     
-        df_encoding['ПотребГруппа'] = label_encoder_potreb_group.transform(df_encoding['ПотребГруппа'])
- 
-        df_encoding['МНН'] = label_encoder_mnn.transform(df_encoding['МНН'])
-
-        numerical_columns = ['Цена',
-                             'Температура (°C)', 'Давление (мм рт. ст.)',
-                             'ПроданоСеть', 'ПоступилоСеть', 'ОстатокСеть', 'КоличествоЧековСеть',
-                             'Продано_правка', 'Поступило_правка', "Остаток_правка", "Смоделированные_заказы",
-                             'Продано_1д_назад', 'Поступило_1д_назад', 'Остаток_1д_назад', 'Заказ_1д_назад',
-                             'Продано_частота_3д', 'Продано_частота_7д', 'Продано_частота_21д',
-                             'Продано_темп_3д', 'Продано_темп_7д', 'Продано_темп_21д',
-                             'ПроданоСеть_1д_назад', 'ПоступилоСеть_1д_назад', 'ОстатокСеть_1д_назад', 'КоличествоЧековСеть_1д_назад',
-                             'ПроданоСеть_частота_3д', 'ПроданоСеть_частота_7д', 'ПроданоСеть_частота_21д',
-                             'ПроданоСеть_темп_3д', 'ПроданоСеть_темп_7д', 'ПроданоСеть_темп_21д',
-                             ]
-
-
-        df_encoding[numerical_columns] = scaler.transform(df_encoding[numerical_columns])
-
-
-        cat_columns = ['Товар', 'Магазин', 'Категория', 'ПотребГруппа', 'МНН',
-                       'Акция', 'Выходной', 'ДеньНедели', 'Месяц', 'День', 'Год',
-                       'Сезонность', 'Сезонность_точн']
-
+    def add_stored_lag_values(self, df_first, df_next, lag_features):
+        """
+        Лаговые признаки новых строк без пересчета окон по истории: для пар с одной
+        новой строкой, признаки которой есть в таблице Признаки_лагов, они берутся
+        из таблицы, остальные пары считаются add_lag_values по своей истории.
+        Результат совпадает с add_lag_values(df_first, df_next).
+
+        Args:
+            df_first: Восстановленные данные за последние 30 дней
+            df_next: Восстановленные новые данные
+            lag_features: Сохраненные признаки строк df_next (LagFeatureStore.load)
+        """
+        df = normalize_recovery_columns(df_next)
+        df['Дата'] = pd.to_datetime(df['Дата'])
+        df = (df.sort_values(by=['Магазин', 'Товар', 'Дата'])
+              .drop_duplicates(subset=['Магазин', 'Товар', 'Дата']))
+
+        keys = pd.MultiIndex.from_arrays([df['Дата'], df['Магазин'].astype(str), df['Товар'].astype(str)],
+                                         names=KEY_COLUMNS)
+        stored = lag_features.set_index(KEY_COLUMNS)
+        stored = stored[~stored.index.duplicated()]
+        # Строки пар с несколькими новыми днями зависят от предыдущих новых строк
+        single = ~df.duplicated(subset=['Магазин', 'Товар'], keep=False).to_numpy()
+        found = keys.isin(stored.index) & single
+        logger.info(f"Сохраненные лаговые признаки найдены для {found.sum()} из {len(found)} строк")
+
+        df_stored = df[found].copy()
+        values = stored.reindex(keys[found])
+        for column in LAG_FEATURES:
+            df_stored[column] = values[column].to_numpy()
+        df_stored = df_stored.drop(self.drop_columns, axis=1)
+        df_stored = df_stored.drop(columns=['Заказы_правка'], axis=1, errors='ignore')
+        df_stored = df_stored.dropna()
+        if found.all():
+            return df_stored
+
+        # Остальные пары: история до первой новой даты только по этим парам
+        df_rest = df[~found]
+        history = normalize_recovery_columns(df_first)
+        history_dates = pd.to_datetime(history['Дата'])
+        history_pairs = pd.MultiIndex.from_arrays([history['Магазин'].astype(str), history['Товар'].astype(str)])
+        rest_pairs = pd.MultiIndex.from_arrays([df_rest['Магазин'].astype(str), df_rest['Товар'].astype(str)])
+        history = history[(history_dates < df['Дата'].min()).to_numpy() & history_pairs.isin(rest_pairs)]
+        df_computed = self.add_lag_values(history, df_rest)
+
+        return pd.concat([df_stored, df_computed]).sort_values(by=['Магазин', 'Товар', 'Дата'])
+
+    def prepare_inference_data(self, df, label_encoder_product, label_encoder_shop, label_encoder_category, label_encoder_potreb_group, label_encoder_mnn, scaler):
+        """
+        Готовит признаки для InferenceEngine без промежуточных копий DataFrame.
+
+        Категории кодируются словарями CategoricalCodebook, строки с неизвестными
+        значениями отбрасываются одной маской. Числовые признаки собираются в
+        непрерывную float32-матрицу и масштабируются FeatureScaler на месте
+        (MinMaxScaler старых записей конвертируется).
+
+        Returns:
+            tuple: (num_matrix, cat_values, result_preduction), где
+                cat_values - словарь {столбец: массив значений},
+                result_preduction - DataFrame с исходными Дата/Магазин/Товар
+        """
+        codebooks = [CategoricalCodebook.from_encoder(encoder) for encoder in
+                     [label_encoder_product, label_encoder_shop, label_encoder_category,
+                      label_encoder_potreb_group, label_encoder_mnn]]
+
+        str_values = {}
+        codes = {}
+        mask = np.ones(len(df), dtype=bool)
+        for col, codebook in zip(self.encod_columns, codebooks):
+            values = df[col].astype(str).to_numpy()
+            codes[col], known = codebook.encode(values)
+            unknown_count = int((mask & ~known).sum())
+            if unknown_count:
+                logger.warning(f"Удалено {unknown_count} строк с неизвестными значениями в {col}")
+            mask &= known
+            str_values[col] = values
+
+        df_known = df if mask.all() else df.loc[mask]
+
+        cat_values = {}
+        for col in self.encod_columns:
+            cat_values[col] = codes[col][mask]
+        for col in self.cat_columns:
+            if col not in cat_values:
+                cat_values[col] = df_known[col].to_numpy()
+
+        # Масштабирование на месте в непрерывной float32-матрице
+        scaler = FeatureScaler.from_scaler(scaler, self.numerical_columns)
+        num_matrix = scaler.transform(feature_matrix(df_known, self.numerical_columns))
         logger.debug('Масштабирование данных выполнено')
 
-        return (df_encoding, numerical_columns, cat_columns)
-
-    def set_training_df(self, df_next, numerical_columns, cat_columns):
-        df_next_copy = df_next.copy()
-        df_predict = df_next_copy[numerical_columns + cat_columns]
-        df_predict_to_result = df_next_copy[['Дата'] + numerical_columns + cat_columns]
-
-        df_predict = df_predict.dropna()
-
-        result_preduction = df_predict_to_result[['Дата', 'Магазин', 'Товар']].copy()
-
-        return df_predict, result_preduction
-
-
-    def model_predict(self, df_next, cat_columns, catboost_model):
-
-        df_test = df_next.copy()
-
-        # Создаем пустую модель
-        # loaded_model = catboost_model(cat_features=cat_columns)
-
-        # Загружаем параметры
-        # loaded_model.load_model('catboost_model.cbm')
-
-        y_pred = catboost_model.predict(df_test)
-
-
-        return y_pred
-
-
-    def view_results_refactor_values(self, test_preduction, y_pred, label_encoder_product, label_encoder_shop):
-        test_preduction_copy = test_preduction.copy()
-
-        test_preduction_copy['Предсказанные значения'] = y_pred
-
-        y_predict = test_preduction_copy['Предсказанные значения'].clip(lower=0)
-        y_predict = np.round(y_predict).astype(int)
-
-        test_preduction_copy['Предсказанные значения'] = y_predict
-
-        test_preduction_copy['Товар'] = (label_encoder_product
-                                         .inverse_transform(test_preduction_copy['Товар']))
-        test_preduction_copy['Магазин'] = (label_encoder_shop
-                                           .inverse_transform(test_preduction_copy['Магазин']))
-
-        return test_preduction_copy
-
-    def use_model_predict(self, df_first, df_next, df_season_sales, db):
-        df_next_copy = df_next.copy()
-        df_first_copy = df_first.copy()
-        df_season_sales_copy = df_season_sales.copy()
-
-        
-
+        # Магазин и Товар берутся в исходном виде - обратное преобразование не требуется
+        result_preduction = pd.DataFrame({
+            'Дата': df_known['Дата'],
+            'Магазин': str_values['Магазин'][mask],
+            'Товар': str_values['Товар'][mask],
+        }, index=df_known.index)
+
+        return num_matrix, cat_values, result_preduction
+
+    def use_model_predict(self, df_first, df_next, df_season_sales, db, thread_count=-1, batch_size=100000,
+                          lag_features=None):
+        """
+        Прогноз на новых данных с помощью последней сохраненной модели.
+
+        Args:
+            df_first: Исходные данные за последние 30 дней
+            df_next: Восстановленные новые данные
+            df_season_sales: Восстановленные данные за последние 30 дней
+            db: Коннектор к базе данных
+            thread_count: Количество потоков CatBoost при предсказании
+            batch_size: Размер пакета предсказания
+            lag_features: Сохраненные лаговые признаки строк df_next (LagFeatureStore.load);
+                None - признаки пересчитываются по df_season_sales
+
+        Для набора моделей сегментов (SegmentedModel) строки направляются в модель
+        своего сегмента, сегменты предсказываются параллельно; строки со значениями
+        вне сегментов получают модель SegmentedModel.OTHER.
+        """
         load_models = ModelStorage(db)
-        artifacts = load_models.load_latest_models(compressed=False)
+        artifacts = load_models.load_latest_models()
         label_encoder_product = artifacts[0]
         label_encoder_shop = artifacts[1]
         label_encoder_category = artifacts[2]
@@ -197,28 +208,34 @@ class Use_model_predict:
         scaler = artifacts[5]
         catboost_model = artifacts[6]
 
-        df_with_lags = self.add_lag_values(df_season_sales_copy, df_next_copy)
-        
-
-        (df_encoding, numerical_columns, cat_columns) = (
-            self.encoding_futures(
-                df_with_lags,
-                label_encoder_product,
-                label_encoder_shop,
-                label_encoder_category,
-                label_encoder_potreb_group,
-                label_encoder_mnn,
-                scaler
-            )
+        if lag_features is not None:
+            df_with_lags = self.add_stored_lag_values(df_season_sales, df_next, lag_features)
+        else:
+            df_with_lags = self.add_lag_values(df_season_sales, df_next)
+
+        num_matrix, cat_values, result_predict = self.prepare_inference_data(
+            df_with_lags,
+            label_encoder_product,
+            label_encoder_shop,
+            label_encoder_category,
+            label_encoder_potreb_group,
+            label_encoder_mnn,
+            scaler
         )
 
-        df_predict, result_preduction = self.set_training_df(df_encoding, numerical_columns, cat_columns)
-        
-
-        y_pred = self.model_predict(df_predict, cat_columns, catboost_model)
+        if isinstance(catboost_model, SegmentedModel):
+            y_pred = catboost_model.predict_arrays(
+                num_matrix, cat_values, self.numerical_columns, self.cat_columns,
+                thread_count=thread_count, batch_size=batch_size
+            )
+        else:
+            engine = InferenceEngine(
+                catboost_model, self.numerical_columns, self.cat_columns,
+                thread_count=thread_count, batch_size=batch_size
+            )
+            y_pred = engine.predict_arrays(num_matrix, cat_values)
 
-        result_predict = self.view_results_refactor_values(
-            result_preduction, y_pred, label_encoder_product, label_encoder_shop
-        )
+        result_predict['Предсказанные значения'] = np.round(np.clip(y_pred, 0, None)).astype(int)
+        logger.info(f"Прогноз выполнен для {len(result_predict)} строк")
 
         return result_predict
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Модуль кэширования квантованных пулов CatBoost.
+Квантует обучающий Pool один раз для версии данных, сохраняет его на диск
+и переиспользует при повторном обучении и подборе гиперпараметров.
+"""
+import os
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+import catboost as cb
+import logging
+from Inference_engine import build_pool
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class QuantizedPoolCache:
+    """
+    Дисковый кэш квантованных пулов.
+
+    Версия данных - хэш содержимого матриц признаков, целевой переменной,
+    названий признаков и параметров квантования: при тех же данных пул
+    загружается с диска без повторного квантования.
+    """
+
+    # Версия формата ключа: увеличивается при изменении способа хэширования
+    KEY_VERSION = 1
+
+    def __init__(self, cache_dir, border_count=254, used_ram_limit=None, thread_count=-1, keep_last=4):
+        """
+        Args:
+            cache_dir: Директория кэша
+            border_count: Количество границ квантования числовых признаков
+            used_ram_limit: Ограничение памяти CatBoost при квантовании (например, '8gb')
+            thread_count: Количество потоков CatBoost
+            keep_last: Сколько последних версий данных хранить на диске
+        """
+        self.cache_dir = cache_dir
+        self.border_count = border_count
+        self.used_ram_limit = used_ram_limit
+        self.thread_count = thread_count
+        self.keep_last = keep_last
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def data_version(self, num_matrix, cat_matrix, label, numerical_columns, cat_columns):
+        """Вычисляет версию данных (хэш) для набора матриц"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{self.KEY_VERSION}|{self.border_count}|".encode('utf-8'))
+        digest.update('|'.join(list(numerical_columns) + list(cat_columns)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(num_matrix, dtype=np.float32).tobytes())
+        for j in range(cat_matrix.shape[1]):
+            digest.update(pd.util.hash_array(np.asarray(cat_matrix[:, j], dtype=object)).tobytes())
+        if label is not None:
+            digest.update(np.ascontiguousarray(label, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, version):
+        return os.path.join(self.cache_dir, f"{version}.qpool")
+
+    def get(self, num_matrix, cat_matrix, label, numerical_columns, cat_columns):
+        """
+        Возвращает квантованный обучающий Pool, при наличии - из кэша.
+
+        Квантуется только обучающий пул: eval_set и данные для предсказания
+        передаются в CatBoost обычным Pool.
+
+        Args:
+            num_matrix: Числовые признаки (float32)
+            cat_matrix: Категориальные признаки (dtype=object)
+            label: Целевая переменная
+            numerical_columns: Список числовых признаков
+            cat_columns: Список категориальных признаков
+
+        Returns:
+            tuple: (pool, version)
+        """
+        version = self.data_version(num_matrix, cat_matrix, label, numerical_columns, cat_columns)
+        pool_path = self._path(version)
+
+        if os.path.exists(pool_path):
+            logger.info(f"Квантованный пул {version} загружен из кэша")
+            os.utime(pool_path)
+            return cb.Pool(f"quantized://{pool_path}"), version
+
+        pool = build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns,
+                          label=label, thread_count=self.thread_count)
+        pool.quantize(border_count=self.border_count, used_ram_limit=self.used_ram_limit)
+
+        # Запись во временный файл и переименование - чтобы параллельные
+        # процессы не прочитали недописанный пул
+        tmp_path = f"{pool_path}.{os.getpid()}.tmp"
+        pool.save(tmp_path)
+        os.replace(tmp_path, pool_path)
+
+        logger.info(f"Пул квантован и сохранен в кэш: {version} ({pool.num_row()} строк)")
+        self._cleanup()
+        return pool, version
+
+    def _cleanup(self):
+        """Удаляет пулы старых версий данных, оставляя keep_last последних"""
+        pools = sorted(glob.glob(os.path.join(self.cache_dir, '*.qpool')), key=os.path.getmtime, reverse=True)
+        for pool_path in pools[self.keep_last:]:
+            try:
+                os.remove(pool_path)
+                logger.debug(f"Удален устаревший квантованный пул {os.path.basename(pool_path)}")
+            except FileNotFoundError:
+                pass
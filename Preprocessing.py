@@ -12,6 +12,33 @@ import logging
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+SEASON_MONTHS = {
+    'Зима': (12, 1, 2),
+    'Весна': (3, 4, 5),
+    'Лето': (6, 7, 8),
+    'Осень': (9, 10, 11),
+}
+SEASONS = list(SEASON_MONTHS)
+
+# Сезон и его номер в SEASONS по номеру месяца (индекс - месяц)
+_MONTH_SEASON = np.empty(13, dtype=object)
+_MONTH_SEASON_CODE = np.zeros(13, dtype=np.int64)
+for _code, (_season, _months) in enumerate(SEASON_MONTHS.items()):
+    _MONTH_SEASON[list(_months)] = _season
+    _MONTH_SEASON_CODE[list(_months)] = _code
+
+# Столбцы Исходные_данные_продаж, достаточные для первого прохода (pair_statistics)
+STATISTICS_COLUMNS = ['Дата', 'Магазин', 'Товар', 'Цена', 'Продано_шт']
+
+_STATISTICS_AGG = {
+    'Первая_дата': 'min',
+    'Последняя_дата': 'max',
+    'Последняя_продажа': 'max',
+    'Цена_есть': 'any',
+    'Продано': 'sum',
+    **{season: 'sum' for season in SEASONS}
+}
+
 
 class Preprocessing_data:
     def rename_columns(self, df):
@@ -79,114 +106,80 @@ class Preprocessing_data:
 
         return df_copy
 
-    def clining_data(self, df):
-        logger.info(f"Количество строк до фильтрации: {df.shape[0]}")
-        # 1. Находим максимальную дату в датафрейме и вычисляем порог (365 дней назад)
-        max_date = df['Дата'].max()
-        cutoff_date = max_date - pd.Timedelta(days=365)
-
-        # 2. Фильтруем данные за последние 365 дней и оставляем только записи, где были продажи (Продано > 0)
-        recent_sales = df[(df['Дата'] >= cutoff_date) & (df['Продано'] > 0)]
-
-        # 3. Получаем уникальные пары "Магазин + Товар", у которых были продажи в этот период
-        active_pairs = recent_sales[['Магазин', 'Товар']].drop_duplicates()
-
-        # 4. Фильтруем исходный датафрейм, оставляя только эти пары
-        filtered_df = df.merge(active_pairs, on=['Магазин', 'Товар'], how='inner')
-
-        # 5. Перезаписываем исходный df и проверяем количество строк
-        df = filtered_df.copy()
-
-
-        # Сгруппировали и посчитали сумму продаж по магазину и товару
-        test_for_0_zero = df.groupby(['Магазин', 'Товар'])['Продано'].sum().reset_index()
-
-        # Отбираем группы, где сумма продаж больше 6
-        good_groups = test_for_0_zero[test_for_0_zero['Продано'] > 6]
-
-        # Фильтруем исходный df, оставляя только строки из этих групп
-        test_0 = df.merge(good_groups[['Магазин', 'Товар']], on=['Магазин', 'Товар'], how='inner')
-
-        df = test_0.copy()
-        logger.info(f"Количество строк после фильтрации: {df.shape[0]}")
-        logger.info('Удалены товары вышедшие из ассортимента')
-
-        return df
-
-    # Определение сезонности
-    def define_the_season(self, df):
-
-    # Проверяем наличие необходимых столбцов
-        required_cols = ['Дата', 'Магазин', 'Товар', 'Продано']
-        for col in required_cols:
-            if col not in df.columns:
-                raise ValueError(f"Отсутствует обязательный столбец: {col}")
-
-    # Определяем сезон
-        def get_season(month):
-            if month in [12, 1, 2]:
-                return 'Зима'
-            elif month in [3, 4, 5]:
-                return 'Весна'
-            elif month in [6, 7, 8]:
-                return 'Лето'
-            else:
-                return 'Осень'
-
-        df['Сезон'] = df['Месяц'].apply(get_season)
-
-        # Создаем сводку по сезонам
-        season_summary = (
-            df.groupby(['Магазин', 'Товар', 'Сезон'])['Продано']
-            .sum()
-            .unstack(fill_value=0)
-            .reset_index()  # Важно: преобразуем индексы в столбцы
-        )
-
-        # Рассчитываем доли продаж по сезонам
-        season_cols = ['Зима', 'Весна', 'Лето', 'Осень']
-
-        # 1. Суммируем продажи по сезонам (с проверкой на нулевые значения)
-        season_summary['Всего'] = season_summary[season_cols].sum(axis=1)
-
-        # 2. Вычисляем доли продаж для каждого сезона
-        season_dolya_cols = []
-        for season in season_cols:
-            col_name = f'{season}_доля'
-            season_summary[col_name] = season_summary[season] / season_summary['Всего']
-            season_dolya_cols.append(col_name)
-
-        # 3. Определяем максимальную долю и соответствующий сезон
-        season_summary['Макс_доля'] = season_summary[season_dolya_cols].max(axis=1)
-        season_summary['Сезонность'] = season_summary[season_dolya_cols].idxmax(axis=1)
+    @staticmethod
+    def pair_codes(df):
+        """
+        Номера групп пар Магазин+Товар в порядке появления; строки с пустым
+        магазином или товаром не входят ни в одну пару (код -1).
 
-        # 4. Форматируем названия сезонов и определяем несезонные товары
-        season_summary['Сезонность'] = (
-            season_summary['Сезонность']
-            .str.replace('_доля', '')
-            .where(season_summary['Макс_доля'] >= 0.51, 'Несезонный')
-        )
+        Returns:
+            tuple: (np.ndarray int64 кодов строк, количество пар)
+        """
+        codes = df.groupby(['Магазин', 'Товар'], sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        return codes, int(codes.max()) + 1 if len(codes) else 0
 
-        # Объединяем с исходными данными
-        df = df.merge(
-            season_summary[['Магазин', 'Товар', 'Сезонность']],
-            on=['Магазин', 'Товар'],
-            how='left'
-        )
+    @staticmethod
+    def season_sums(months, sold, codes, n_pairs):
+        """
+        Продажи пар по сезонам за один проход: np.bincount по коду пары и
+        номеру сезона месяца строки; строки с кодом -1 не учитываются.
 
-        # Удаляем временные столбцы
-        df = df.drop(['Сезон'], axis=1, errors='ignore')
+        Returns:
+            np.ndarray: Матрица (n_pairs, len(SEASONS)) в порядке SEASONS
+        """
+        valid = codes >= 0
+        seasons = _MONTH_SEASON_CODE[np.asarray(months, dtype=np.int64)[valid]]
+        sold = np.nan_to_num(np.asarray(sold, dtype=np.float64)[valid])
+        sums = np.bincount(codes[valid] * len(SEASONS) + seasons, weights=sold,
+                           minlength=n_pairs * len(SEASONS))
+        return sums.reshape(n_pairs, len(SEASONS))
+
+    @staticmethod
+    def season_of_month(months):
+        """Сезон (Зима, Весна, Лето, Осень) для каждого номера месяца"""
+        return pd.Series(_MONTH_SEASON[np.asarray(months, dtype=np.int64)], index=getattr(months, 'index', None))
+
+    @staticmethod
+    def seasonality_from_sums(season_summary):
+        """
+        Сезонность пар по суммам продаж за сезоны (столбцы SEASONS): сезон с долей
+        продаж не меньше 51%, иначе Несезонный.
 
-        # Количество сезонных товаров
-        seasonal_count = (season_summary['Сезонность'] != 'Несезонный').sum()
+        Returns:
+            pd.Series: Сезонность с индексом season_summary
+        """
+        return pd.Series(Preprocessing_data.seasonality_of_sums(season_summary[SEASONS].to_numpy()),
+                         index=season_summary.index)
+
+    @staticmethod
+    def seasonality_of_sums(sums):
+        """seasonality_from_sums для матрицы сумм (пары, SEASONS); возвращает np.ndarray"""
+        sums = np.asarray(sums, dtype=np.float64).reshape(-1, len(SEASONS))
+        total = sums.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            max_share = sums.max(axis=1) / total
+        # При равных долях выбирается первый сезон в порядке SEASONS
+        season = np.asarray(SEASONS, dtype=object)[sums.argmax(axis=1)]
+        return np.where(max_share >= 0.51, season, 'Несезонный').astype(object)
+
+    @staticmethod
+    def seasonality_table(df):
+        """
+        Сезонность пар для таблицы Сезонность_товаров: по результату первичной
+        предобработки (столбец Сезонность) или по Series plan_first_preprocess.
 
-        # Количество несезонных товаров
-        nonseasonal_count = (season_summary['Сезонность'] == 'Несезонный').sum()
-        logger.info(f"Количество сезонных товаров: {seasonal_count}")
-        logger.info(f"Количество несезонных товаров: {nonseasonal_count}")
-        logger.info('Сезонные товары определены')
+        Returns:
+            pd.DataFrame: Столбцы Магазин, Товар, Сезонность
+        """
+        if isinstance(df, pd.Series):
+            df = df.rename('Сезонность').reset_index()
+        return (df[['Магазин', 'Товар', 'Сезонность']]
+                .drop_duplicates(subset=['Магазин', 'Товар'])
+                .reset_index(drop=True))
 
-        return df
+    def exact_season(self, df):
+        """Векторный аналог check_season: 1, если месяц строки входит в сезон товара"""
+        return (self.season_of_month(df['Месяц']).to_numpy() == df['Сезонность'].to_numpy()).astype(np.int64)
 
     # Уточнение сезонных товаров по датам
     def check_season(self, row):
@@ -251,14 +244,25 @@ class Preprocessing_data:
         # Создаем копию DataFrame чтобы не изменять оригинал
         df = df.copy()
 
+        # Преобразуем даты в нужный формат
+        df['Дата'] = pd.to_datetime(df['Дата']) #, format='%d.%m.%Y'
+        daily_weather = self.fetch_daily_weather(df['Дата'].min(), df['Дата'].max())
+        return self._apply_weather(df, daily_weather)
+
+    def fetch_daily_weather(self, start, end):
+        """
+        Погода в Томске за период: средние температура и давление за 17:00-19:00.
+
+        Returns:
+            pd.DataFrame: Индекс - дата, столбцы 'Температура (°C)' и 'Давление (мм рт. ст.)',
+                или None, если данные не получены
+        """
         # Координаты Томска
         latitude, longitude = 56.4977, 84.9744
 
         try:
-            # Преобразуем даты в нужный формат
-            df['Дата'] = pd.to_datetime(df['Дата']) #, format='%d.%m.%Y'
-            start_date = df['Дата'].min().strftime('%Y-%m-%d')
-            end_date = df['Дата'].max().strftime('%Y-%m-%d')
+            start_date = pd.Timestamp(start).strftime('%Y-%m-%d')
+            end_date = pd.Timestamp(end).strftime('%Y-%m-%d')
 
             # URL для запроса данных
             url = f'https://archive-api.open-meteo.com/v1/archive?latitude={latitude}&longitude={longitude}&start_date={start_date}&end_date={end_date}&hourly=temperature_2m,pressure_msl'
@@ -270,7 +274,7 @@ class Preprocessing_data:
 
             if 'hourly' not in data:
                 logger.warning("В ответе API отсутствуют hourly данные")
-                return df
+                return None
 
             # Часовой пояс Томска
             tomsk_tz = pytz.timezone('Asia/Novosibirsk')
@@ -302,16 +306,8 @@ class Preprocessing_data:
             # Преобразуем дату в datetime64[ns] для слияния
             daily_weather['date'] = pd.to_datetime(daily_weather['date'])
 
-            # Объединяем с исходным DataFrame
-            df = df.merge(
-                daily_weather[['date', 'temperature', 'pressure_mmhg']],
-                left_on=pd.to_datetime(df['Дата']).dt.date,
-                right_on=daily_weather['date'].dt.date,
-                how='left'
-            ).drop('date', axis=1)  # Удаляем временную колонку
-
             # Переименовываем колонки
-            df = df.rename(columns={
+            return daily_weather.set_index('date')[['temperature', 'pressure_mmhg']].rename(columns={
                 'temperature': 'Температура (°C)',
                 'pressure_mmhg': 'Давление (мм рт. ст.)'
             })
@@ -321,6 +317,14 @@ class Preprocessing_data:
             logger.warning("Возможные причины: нет подключения к интернету, API недоступен, превышен лимит запросов")
         except Exception as e:
             logger.error(f"Произошла ошибка при получении погодных данных: {e}", exc_info=True)
+        return None
+
+    def _apply_weather(self, df, daily_weather):
+        """Добавляет в df (на месте) погоду по дате строки из fetch_daily_weather"""
+        if daily_weather is not None:
+            days = df['Дата'].dt.normalize()
+            for col in daily_weather.columns:
+                df[col] = days.map(daily_weather[col])
 
         # Заполняем NaN значения для столбцов погоды, если они отсутствуют
         if 'Температура (°C)' not in df.columns:
@@ -340,55 +344,185 @@ class Preprocessing_data:
         return df
 
 
-    def first_preprocess_data(self, df):
-        start_time = time.time()
-
-        df_copy = df.copy()
-
-        df_copy = self.rename_columns(df_copy)
-
-        df_copy['Цена'] = ((df_copy.groupby(['Магазин', 'Товар'])['Цена']
-                            .transform(self.fill_zero_prices)))
-        df_copy = df_copy.dropna(subset=['Цена'])
-        logger.info('Нулевые значения цены восстановлены')
+    def pair_statistics(self, df):
+        """
+        Первый проход предобработки по частям: статистика пар Магазин+Товар,
+        по которой отбираются пары и определяется сезонность
+        (plan_first_preprocess). Нужны только столбцы STATISTICS_COLUMNS;
+        статистики частей истории объединяются pd.concat.
+
+        Пары кодируются номерами групп (pair_codes), суммы считаются
+        np.bincount (продажи по сезонам - season_sums), даты - np.minimum.at
+        и np.maximum.at по кодам; строки с пустым магазином или товаром не
+        учитываются.
+
+        Returns:
+            pd.DataFrame: Индекс (Магазин, Товар); Первая_дата, Последняя_дата,
+                Последняя_продажа, Цена_есть, Продано и продажи по сезонам SEASONS
+        """
+        dates = pd.to_datetime(df['Дата'])
+        sold = df['Продано' if 'Продано' in df.columns else 'Продано_шт'].clip(lower=0)
+        codes, n_pairs = self.pair_codes(df)
+        valid = codes >= 0
+        pair = codes[valid]
+
+        # Даты как int64: NaT - минимальное значение, поэтому в максимуме не
+        # участвует; для минимума NaT заменяется максимальным значением
+        day = dates.to_numpy().view(np.int64)[valid]
+        nat, never = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+        first_date = np.full(n_pairs, never)
+        np.minimum.at(first_date, pair, np.where(day == nat, never, day))
+        first_date[first_date == never] = nat
+        last_date = np.full(n_pairs, nat)
+        np.maximum.at(last_date, pair, day)
+        sold_values = sold.to_numpy(dtype=np.float64)[valid]
+        last_sale = np.full(n_pairs, nat)
+        np.maximum.at(last_sale, pair[sold_values > 0], day[sold_values > 0])
+
+        has_price = df['Цена'].astype(float).replace(0, np.nan).notna().to_numpy()[valid]
+        sold_dtype = sold.dtype if sold.dtype.kind in 'iu' else np.float64
+        season_sums = self.season_sums(dates.dt.month.to_numpy()[valid], sold_values,
+                                       pair, n_pairs).astype(sold_dtype)
+
+        pair_ids, first_rows = np.unique(codes, return_index=True)
+        statistics = pd.DataFrame({
+            'Первая_дата': first_date.view(dates.dtype),
+            'Последняя_дата': last_date.view(dates.dtype),
+            'Последняя_продажа': last_sale.view(dates.dtype),
+            'Цена_есть': np.bincount(pair, weights=has_price, minlength=n_pairs) > 0,
+            'Продано': season_sums.sum(axis=1),
+            **{season: season_sums[:, number] for number, season in enumerate(SEASONS)}
+        }, index=pd.MultiIndex.from_frame(df[['Магазин', 'Товар']].iloc[first_rows[pair_ids >= 0]]))
+        return statistics.sort_index()
+
+    def plan_first_preprocess(self, statistics):
+        """
+        Отбор пар по статистике всей истории и погода за ее период - общие
+        данные для first_preprocess_chunk.
 
-        df_non_negative_values = self.non_negative_values(df_copy)
+        Args:
+            statistics: pair_statistics или список статистик частей истории
 
-        df_parse_dates = self.parse_dates(df_non_negative_values)
+        Returns:
+            dict: seasonality - Сезонность отобранных пар (индекс Магазин, Товар),
+                weather - fetch_daily_weather за период отобранных пар
+        """
+        if isinstance(statistics, list):
+            statistics = pd.concat(statistics)
+        if not statistics.index.is_unique:
+            # Пара встречается в нескольких частях (история разбита не по магазинам)
+            statistics = statistics.groupby(level=['Магазин', 'Товар']).agg(_STATISTICS_AGG)
+
+        # Пары без ненулевой цены удаляются при восстановлении цены
+        statistics = statistics[statistics['Цена_есть']]
+        logger.info(f"Количество пар до фильтрации: {len(statistics)}")
+
+        # Пары с продажами за последние 365 дней и суммой продаж больше 6
+        cutoff_date = statistics['Последняя_дата'].max() - pd.Timedelta(days=365)
+        selected = statistics[(statistics['Последняя_продажа'] >= cutoff_date) & (statistics['Продано'] > 6)]
+        logger.info(f"Количество пар после фильтрации: {len(selected)}")
+        logger.info('Удалены товары вышедшие из ассортимента')
 
-        df_cleaning = self.clining_data(df_parse_dates)
+        seasonality = self.seasonality_from_sums(selected)
+        logger.info(f"Количество сезонных товаров: {(seasonality != 'Несезонный').sum()}")
+        logger.info(f"Количество несезонных товаров: {(seasonality == 'Несезонный').sum()}")
 
-        df_define = self.define_the_season(df_cleaning)
+        weather = None
+        if len(selected):
+            weather = self.fetch_daily_weather(selected['Первая_дата'].min(), selected['Последняя_дата'].max())
+        return {'seasonality': seasonality, 'weather': weather}
 
-        df_define['Сезонность_точн'] = df_define.apply(self.check_season, axis=1)
-        logger.debug('Добавлена "Точная сезонность" в булевом формате для каждого дня')
+    def first_preprocess_chunk(self, df, plan):
+        """
+        Предобработка части истории, содержащей все строки своих пар
+        (например, группы магазинов), по общему plan из plan_first_preprocess.
+        Результат совпадает со строками этих пар в first_preprocess_data всей истории.
+        """
+        df = self.rename_columns(df)
+        seasonality = plan['seasonality']
+
+        # Пары части кодируются номерами групп: каждая пара ищется в плане один
+        # раз, строки отбираются одной булевой маской по кодам, сезонность
+        # переносится на строки по тем же кодам (строки без пары - код -1)
+        codes, _ = self.pair_codes(df)
+        pair_ids, first_rows = np.unique(codes, return_index=True)
+        first_rows = first_rows[pair_ids >= 0]
+        pairs = pd.MultiIndex.from_frame(df[['Магазин', 'Товар']].iloc[first_rows])
+        positions = np.append(seasonality.index.get_indexer(pairs), -1)[codes]
+        selected = positions >= 0
+        df = df.loc[selected].reset_index(drop=True)
+        season = seasonality.to_numpy()[positions[selected]]
+
+        # Нулевые цены заполняются ближайшей ненулевой ценой пары (как fill_zero_prices)
+        pair_keys = [df['Магазин'], df['Товар']]
+        prices = df['Цена'].astype(float).replace(0, np.nan)
+        df['Цена'] = prices.groupby(pair_keys).bfill().groupby(pair_keys).ffill()
+
+        df = self.non_negative_values(df)
+        df = self.parse_dates(df)
+        df['Сезонность'] = season
+        df['Сезонность_точн'] = self.exact_season(df)
+        df = self._apply_weather(df, plan['weather'])
+        df = self.data_type_refactor(df)
+        return df.sort_values(by=['Дата', 'Магазин', 'Товар'])
+
+    @staticmethod
+    def store_groups(stores, chunk_stores):
+        """Разбиение магазинов на группы по chunk_stores (None или 0 - одна группа)"""
+        stores = sorted(pd.unique(pd.Series(stores).dropna()), key=str)
+        if not chunk_stores:
+            return [stores]
+        return [stores[i:i + chunk_stores] for i in range(0, len(stores), chunk_stores)]
+
+    def first_preprocess_data(self, df, chunk_stores=None):
+        """
+        Первичная предобработка истории продаж: восстановление цен, отбор пар,
+        сезонность, погода и приведение типов.
 
-        df_temp = self.add_weather_data(df_define)
-        if 'key_0' in df_temp.columns:
-            df_temp = df_temp.drop('key_0', axis=1)
+        Пары отбираются по статистике всей истории (pair_statistics), затем
+        история обрабатывается по группам из chunk_stores магазинов: промежуточные
+        копии создаются для одной группы, а не для всей истории.
 
-        df_result_cleaning = self.data_type_refactor(df_temp)
+        Args:
+            df: Исходные данные продаж
+            chunk_stores: Количество магазинов в группе (None - вся история одной группой)
+        """
+        start_time = time.time()
 
+        plan = self.plan_first_preprocess(self.pair_statistics(df))
+        groups = self.store_groups(df['Магазин'], chunk_stores)
+        if len(groups) == 1:
+            df_result_cleaning = self.first_preprocess_chunk(df, plan)
+        else:
+            parts = [self.first_preprocess_chunk(df[df['Магазин'].isin(stores)], plan) for stores in groups]
+            df_result_cleaning = pd.concat(parts, ignore_index=True).sort_values(by=['Дата', 'Магазин', 'Товар'])
+        logger.info('Нулевые значения цены восстановлены')
         logger.info('Датасет очищен')
 
         end_time = time.time()
         execution_time = end_time - start_time
         logger.info(f"Время выполнения предобработки: {execution_time // 60:.0f} минут {execution_time % 60:.0f} секунд")
 
-        logger.debug(f"Статистика пропущенных значений:\n{df_temp.isna().sum()}")
-        logger.debug(f"Информация о датасете:\n{df_temp.info()}")
-
-        df_result_cleaning = df_result_cleaning.sort_values(by=['Дата', 'Магазин', 'Товар'])
+        logger.debug(f"Статистика пропущенных значений:\n{df_result_cleaning.isna().sum()}")
 
         return df_result_cleaning
 
 
-    def next_preprocess_data(self, df_first, df_next, df_season_sales):
+    def next_preprocess_data(self, df_first, df_next, df_season_sales, seasonality=None):
+        """
+        Предобработка новых данных для прогноза.
+
+        Args:
+            df_first: Исходные данные за последние 30 дней
+            df_next: Новые исходные данные
+            df_season_sales: Восстановленные данные за последние 30 дней
+            seasonality: Таблица Сезонность_товаров (Магазин, Товар, Сезонность);
+                None - сезонность берется из df_season_sales
+        """
         start_time = time.time()
 
         df_next_copy = df_next.copy()
         df_first_copy = df_first.copy()
-        df_season_sales_copy = df_season_sales.copy()
 
         df_next_copy = self.rename_columns(df_next_copy)
         df_first_copy = self.rename_columns(df_first_copy)
@@ -402,12 +536,12 @@ class Preprocessing_data:
 
         df_parse_dates = self.parse_dates(df_non_negative_values)
 
-        logger.debug(f"Информация о данных сезонности:\n{df_season_sales_copy.info()}")
-
-        # Сезонность + фильтрация
-        df_first_season = (df_season_sales_copy[['Магазин', 'Товар', 'Сезонность']]
-                           .drop_duplicates(subset=['Магазин', 'Товар'])
-                           .reset_index(drop=True))
+        # Сезонность + фильтрация: сохраненная при первичной предобработке
+        # или по восстановленным данным за последние 30 дней
+        if seasonality is None:
+            seasonality = df_season_sales
+            logger.info('Сезонность определена по восстановленным данным')
+        df_first_season = self.seasonality_table(seasonality)
 
 
         # Получаем уникальные пары из обоих датафреймов
@@ -437,7 +571,7 @@ class Preprocessing_data:
         )
         logger.info('Добавлена сезонность + отфильтрованы данные (как в исходном датасете)')
 
-        df_next_with_season['Сезонность_точн'] = df_next_with_season.apply(self.check_season, axis=1)
+        df_next_with_season['Сезонность_точн'] = self.exact_season(df_next_with_season)
         logger.debug('Добавлена "Точная сезонность" в булевом формате для каждого дня')
 
         df_temp = self.add_weather_data(df_next_with_season)
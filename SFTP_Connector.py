@@ -6,9 +6,14 @@ import pandas as pd
 import paramiko
 import io
 import os
+import gzip
+import uuid
+import posixpath
 import tempfile
 from typing import List, Optional, Dict, Any
 import logging
+from Input_schema import ORIGIN_SCHEMA, SchemaValidationError
+from Input_formats import read_input
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -224,6 +229,9 @@ class SFTPConnector:
                 self.transport.connect(username=self.username, password=self.password)
                 logger.info("Аутентификация по паролю успешна")
             
+            # Keepalive: сессия не закрывается сервером, пока идет прогноз перед выгрузкой
+            self.transport.set_keepalive(30)
+            
             # Создаем SFTP клиент
             self.sftp = paramiko.SFTPClient.from_transport(self.transport)
             logger.info(f"Успешно подключились к SFTP серверу {self.host}:{self.port}")
@@ -335,56 +343,61 @@ class SFTPConnector:
             logger.error(f"Ошибка при загрузке файла {remote_path}: {e}")
             return None
     
-    def download_csv_as_dataframe(self, remote_path: str, force_csv: bool = False) -> Optional[pd.DataFrame]:
+    def open_channel(self) -> paramiko.SFTPClient:
         """
-        Загрузка файла с SFTP сервера как DataFrame
+        Открытие дополнительного SFTP канала в уже установленном транспорте
+        (для параллельной загрузки файлов без повторной аутентификации)
+        
+        Returns:
+            paramiko.SFTPClient: Новый SFTP клиент; закрывается вызывающим кодом
+        """
+        if not self.transport or not self.transport.is_active():
+            raise ConnectionError("Нет подключения к SFTP серверу")
+        return paramiko.SFTPClient.from_transport(self.transport)
+    
+    def download_csv_as_dataframe(self, remote_path: str, force_csv: bool = False,
+                                  sftp: paramiko.SFTPClient = None, schema=None) -> Optional[pd.DataFrame]:
+        """
+        Загрузка файла с SFTP сервера как DataFrame.
+        Поддерживаются CSV (в том числе gzip, zstd, zip), Parquet, Feather и Excel
         
         Args:
             remote_path: Путь к файлу на сервере
-            force_csv: Принудительно конвертировать в CSV формат
+            force_csv: Читать как несжатый CSV без определения формата по сигнатуре
+            sftp: SFTP канал из open_channel (по умолчанию основной канал подключения)
+            schema: CSVInputSchema для проверки столбцов и типов
+                (отчет проверки сохраняется в df.attrs['input_report'])
             
         Returns:
             Optional[pd.DataFrame]: DataFrame с данными или None при ошибке
+            
+        Raises:
+            SchemaValidationError: Файл не соответствует schema
         """
         try:
-            if not self.sftp:
+            sftp = sftp or self.sftp
+            if not sftp:
                 logger.error("Нет подключения к SFTP серверу")
                 return None
             
-            # Определяем расширение файла
-            file_extension = remote_path.lower().split('.')[-1] if '.' in remote_path else 'csv'
-            
-            # Создаем временный файл с соответствующим расширением
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as temp_file:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.input') as temp_file:
                 local_path = temp_file.name
             
             # Загружаем файл
-            self.sftp.get(remote_path, local_path)
+            sftp.get(remote_path, local_path)
             
-            # Читаем файл в зависимости от расширения
+            # Формат определяется по сигнатуре файла, force_csv отключает определение
             try:
-                if file_extension in ['csv', 'txt']:
-                    try:
-                        df = pd.read_csv(local_path, parse_dates=["Дата"])
-                    except:
-                        # Если не удалось с parse_dates, пробуем без него
-                        df = pd.read_csv(local_path)
-                        # Пробуем конвертировать столбец Дата в datetime
-                        if 'Дата' in df.columns:
-                            df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
-                elif file_extension in ['xlsx', 'xls']:
-                    df = pd.read_excel(local_path)
-                    # Пробуем конвертировать столбец Дата в datetime
-                    if 'Дата' in df.columns:
-                        df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
-                else:
-                    # Пробуем как CSV по умолчанию
-                    df = pd.read_csv(local_path)
-                    if 'Дата' in df.columns:
-                        df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
-                        
+                df, report = read_input(local_path, schema=schema, file_format='csv' if force_csv else None)
+                if report is not None:
+                    schema.log_report(remote_path, report)
+                    df.attrs['input_report'] = report
+            except SchemaValidationError as schema_error:
+                schema.log_report(remote_path, schema_error.report)
+                raise
             except Exception as read_error:
                 logger.error(f"Ошибка при чтении файла {remote_path}: {read_error}")
+                os.unlink(local_path)
                 return None
             
             # Удаляем временный файл
@@ -393,6 +406,10 @@ class SFTPConnector:
             logger.info(f"Файл {remote_path} загружен как DataFrame: {df.shape}")
             return df
             
+        except SchemaValidationError as e:
+            logger.error(f"Файл {remote_path} не соответствует схеме: {e}")
+            os.unlink(local_path)
+            raise
         except Exception as e:
             logger.error(f"Ошибка при загрузке файла {remote_path}: {e}")
             # Удаляем временный файл в случае ошибки
@@ -438,35 +455,90 @@ class SFTPConnector:
         Returns:
             bool: True если загрузка успешна, False иначе
         """
+        return self.upload_dataframe(df, remote_path, file_format='csv')
+    
+    @staticmethod
+    def _write_parquet(df: pd.DataFrame, remote_file, chunk_rows: int):
         try:
-            if not self.sftp:
-                logger.error("Нет подключения к SFTP серверу")
-                return False
-            
-            # Создаем временный файл
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
-                local_path = temp_file.name
-            
-            # Сохраняем DataFrame в CSV
-            df.to_csv(local_path, index=False)
-            
-            # Загружаем на сервер
-            self.sftp.put(local_path, remote_path)
-            
-            # Удаляем временный файл
-            os.unlink(local_path)
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Для выгрузки в Parquet требуется пакет pyarrow: pip install pyarrow")
+        
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(remote_file, schema) as writer:
+            for start in range(0, len(df), chunk_rows):
+                chunk = df.iloc[start:start + chunk_rows]
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    
+    def _replace_file(self, sftp: paramiko.SFTPClient, source: str, target: str):
+        """Атомарная замена target файлом source (posix-rename, иначе удаление и rename)"""
+        try:
+            sftp.posix_rename(source, target)
+        except IOError:
+            # Сервер без расширения posix-rename@openssh.com: rename не перезаписывает файл
+            try:
+                sftp.remove(target)
+            except IOError:
+                pass
+            sftp.rename(source, target)
+    
+    def upload_dataframe(self, df: pd.DataFrame, remote_path: str, file_format: str = 'csv',
+                         chunk_rows: int = 100000, sftp: paramiko.SFTPClient = None) -> bool:
+        """
+        Потоковая выгрузка DataFrame на SFTP сервер без временных локальных файлов
+        
+        Данные пишутся частями по chunk_rows строк прямо в удаленный файл
+        <директория>/.<имя>.<uuid>.part с конвейерной отправкой (pipelining), затем
+        файл переименовывается в remote_path: читатели не видят частично записанный файл.
+        
+        Args:
+            df: DataFrame для загрузки
+            remote_path: Путь к файлу на сервере
+            file_format: csv, csv.gz или parquet (требуется pyarrow)
+            chunk_rows: Количество строк в одной записываемой части
+            sftp: SFTP канал из open_channel (по умолчанию основной канал подключения)
             
-            logger.info(f"DataFrame загружен как CSV на сервер: {remote_path}")
+        Returns:
+            bool: True если загрузка успешна, False иначе
+        """
+        if file_format not in ('csv', 'csv.gz', 'parquet'):
+            raise ValueError(f"Неизвестный формат выгрузки: {file_format}. Допустимые: csv, csv.gz, parquet")
+        
+        sftp = sftp or self.sftp
+        if not sftp:
+            logger.error("Нет подключения к SFTP серверу")
+            return False
+        
+        directory, name = posixpath.split(remote_path)
+        temp_path = posixpath.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+        try:
+            with sftp.open(temp_path, 'wb', bufsize=1024 * 1024) as remote_file:
+                # Запись без ожидания подтверждения каждого пакета, ответы проверяются при закрытии
+                remote_file.set_pipelined(True)
+                
+                if file_format == 'parquet':
+                    self._write_parquet(df, remote_file, chunk_rows)
+                else:
+                    stream = gzip.GzipFile(fileobj=remote_file, mode='wb') if file_format == 'csv.gz' else remote_file
+                    try:
+                        for start in range(0, max(len(df), 1), chunk_rows):
+                            chunk = df.iloc[start:start + chunk_rows]
+                            stream.write(chunk.to_csv(index=False, header=start == 0).encode('utf-8'))
+                    finally:
+                        if stream is not remote_file:
+                            stream.close()
+            
+            self._replace_file(sftp, temp_path, remote_path)
+            logger.info(f"DataFrame ({len(df)} строк) выгружен на сервер в формате {file_format}: {remote_path}")
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка при загрузке DataFrame на сервер: {e}")
-            # Удаляем временный файл в случае ошибки
-            if 'local_path' in locals():
-                try:
-                    os.unlink(local_path)
-                except:
-                    pass
+            logger.error(f"Ошибка при выгрузке DataFrame на сервер: {e}")
+            try:
+                sftp.remove(temp_path)
+            except Exception:
+                pass
             return False
     
     def get_file_info(self, remote_path: str) -> Optional[Dict[str, Any]]:
@@ -562,6 +634,31 @@ class SFTPDataLoader:
         if self.sftp_connector:
             self.sftp_connector.disconnect()
     
+    @staticmethod
+    def missing_columns(df: pd.DataFrame) -> List[str]:
+        """
+        Проверка наличия обязательных столбцов исходных данных
+        
+        Args:
+            df: DataFrame, загруженный из файла
+            
+        Returns:
+            List[str]: Отсутствующие обязательные столбцы (пустой список, если все есть)
+        """
+        # Проверяем наличие необходимых столбцов (более гибкая проверка)
+        required_columns = ['Дата', 'Магазин', 'Товар']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        
+        # Проверяем столбцы с продажами (может быть разное название)
+        sales_columns = [col for col in df.columns if 'прода' in col.lower() or 'sale' in col.lower()]
+        if not sales_columns:
+            logger.warning("Не найдены столбцы с продажами. Доступные столбцы: " + str(list(df.columns)))
+        
+        if missing_columns:
+            logger.error(f"В файле отсутствуют обязательные столбцы: {missing_columns}")
+            logger.error(f"Доступные столбцы: {list(df.columns)}")
+        return missing_columns
+    
     def load_new_data_from_sftp(self, remote_file_path: str) -> Optional[pd.DataFrame]:
         """
         Загрузка новых данных с SFTP сервера
@@ -582,25 +679,14 @@ class SFTPDataLoader:
                 logger.error(f"Файл {remote_file_path} не найден на SFTP сервере")
                 return None
             
-            # Загружаем файл как DataFrame
-            df = self.sftp_connector.download_csv_as_dataframe(remote_file_path, force_csv=True)
+            # Загружаем файл как DataFrame по схеме исходных данных
+            df = self.sftp_connector.download_csv_as_dataframe(remote_file_path, schema=ORIGIN_SCHEMA)
             
             if df is not None:
                 logger.info(f"Успешно загружены данные с SFTP: {df.shape}")
                 logger.info(f"Доступные столбцы: {list(df.columns)}")
                 
-                # Проверяем наличие необходимых столбцов (более гибкая проверка)
-                required_columns = ['Дата', 'Магазин', 'Товар']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                # Проверяем столбцы с продажами (может быть разное название)
-                sales_columns = [col for col in df.columns if 'прода' in col.lower() or 'sale' in col.lower()]
-                if not sales_columns:
-                    logger.warning("Не найдены столбцы с продажами. Доступные столбцы: " + str(list(df.columns)))
-                
-                if missing_columns:
-                    logger.error(f"В файле отсутствуют обязательные столбцы: {missing_columns}")
-                    logger.error(f"Доступные столбцы: {list(df.columns)}")
+                if self.missing_columns(df):
                     return None
                 
                 return df
@@ -612,23 +698,28 @@ class SFTPDataLoader:
             logger.error(f"Ошибка при загрузке данных с SFTP: {e}")
             return None
     
-    def upload_predictions_to_sftp(self, predictions_df: pd.DataFrame, remote_file_path: str) -> bool:
+    def upload_predictions_to_sftp(self, predictions_df: pd.DataFrame, remote_file_path: str,
+                                   file_format: str = 'csv') -> bool:
         """
         Загрузка результатов предсказания на SFTP сервер
         
         Args:
             predictions_df: DataFrame с предсказаниями
             remote_file_path: Путь к файлу на сервере
+            file_format: csv, csv.gz или parquet
             
         Returns:
             bool: True если загрузка успешна
         """
         try:
-            if not self.sftp_connector:
+            # Сессия, открытая для загрузки данных, используется повторно; переподключение - если она закрыта
+            transport = self.sftp_connector.transport if self.sftp_connector else None
+            if transport is None or not transport.is_active():
+                self.disconnect()
                 if not self.connect():
                     return False
             
-            return self.sftp_connector.upload_dataframe_as_csv(predictions_df, remote_file_path)
+            return self.sftp_connector.upload_dataframe(predictions_df, remote_file_path, file_format=file_format)
             
         except Exception as e:
             logger.error(f"Ошибка при загрузке предсказаний на SFTP: {e}")
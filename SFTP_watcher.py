@@ -0,0 +1,199 @@
+"""
+Модуль наблюдения за директорией SFTP сервера.
+Фоновая задача периодически получает список файлов, отбирает новые
+(по пути, размеру и времени изменения) и передает их в конвейер прогноза
+с ограничением количества одновременно обрабатываемых файлов.
+"""
+import time
+import asyncio
+import fnmatch
+import posixpath
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+async def _run_in_thread(func, *args, **kwargs):
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class SFTPWatcher:
+    """
+    Наблюдатель директории SFTP.
+
+    Файл обрабатывается, когда загрузка на сервер завершена: время изменения
+    старше settle_seconds или размер и mtime не менялись между двумя опросами.
+    Обработка идет в фоновых задачах, опрос директории при этом продолжается,
+    новые файлы ждут свободного места в пределах max_concurrent. Результат обработки
+    записывается в registry (ProcessedFilesRegistry); успешно обработанные
+    файлы и файлы, исчерпавшие max_attempts, повторно не обрабатываются.
+
+    Все внешние зависимости передаются в конструктор, поэтому наблюдатель
+    проверяется с заглушками SFTP и БД.
+    """
+
+    def __init__(self, sftp_loader_factory, registry, process_file, directory='/', pattern='*.csv',
+                 interval=30, settle_seconds=30, max_concurrent=1, max_attempts=3, run_blocking=None):
+        """
+        Args:
+            sftp_loader_factory: Функция без аргументов, возвращающая SFTPDataLoader
+            registry: Учет обработанных файлов (load, mark)
+            process_file: Корутина process_file(remote_path) -> количество строк прогноза
+            directory: Директория на SFTP сервере
+            pattern: Шаблон имен файлов
+            interval: Интервал опроса в секундах
+            settle_seconds: Время без изменений, после которого файл считается загруженным
+            max_concurrent: Количество файлов, обрабатываемых одновременно
+            max_attempts: Количество попыток обработки файла с ошибкой
+            run_blocking: Корутина для выполнения блокирующих вызовов SFTP и БД
+                (по умолчанию asyncio.to_thread)
+        """
+        self.sftp_loader_factory = sftp_loader_factory
+        self.registry = registry
+        self.process_file = process_file
+        self.directory = directory.rstrip('/') or '/'
+        self.pattern = pattern
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_attempts = max_attempts
+        self.run_blocking = run_blocking or _run_in_thread
+
+        self.last_poll = None
+        self.processed = 0
+        self.failed = 0
+        self._seen = {}
+        self._in_progress = set()
+        self._semaphore = None
+        self._jobs = set()
+        self._task = None
+
+    def _list_files(self):
+        """Список (путь, размер, mtime) подходящих файлов директории"""
+        sftp_loader = self.sftp_loader_factory()
+        if not sftp_loader.connect():
+            raise ConnectionError("Не удалось подключиться к SFTP серверу")
+        try:
+            connector = sftp_loader.sftp_connector
+            files = []
+            for name in sorted(connector.list_files(self.directory)):
+                if not fnmatch.fnmatchcase(name, self.pattern):
+                    continue
+                path = posixpath.join(self.directory, name)
+                info = connector.get_file_info(path)
+                if info is None or info['permissions'] & 0o040000:
+                    continue
+                files.append((path, int(info['size']), int(info['modified_time'])))
+            return files
+        finally:
+            sftp_loader.disconnect()
+
+    async def _process(self, key):
+        path, size, mtime = key
+        async with self._semaphore:
+            start = time.perf_counter()
+            logger.info(f"Обработка нового файла {path}")
+            try:
+                rows = await self.process_file(path)
+                await self.run_blocking(self.registry.mark, path, size, mtime, 'done', rows_count=rows)
+                self.processed += 1
+                logger.info(f"Файл {path} обработан за {time.perf_counter() - start:.1f} с, "
+                            f"строк прогноза: {rows}")
+            except Exception as e:
+                logger.error(f"Ошибка обработки файла {path}: {e}", exc_info=True)
+                self.failed += 1
+                try:
+                    await self.run_blocking(self.registry.mark, path, size, mtime, 'failed', error=str(e))
+                except Exception as mark_error:
+                    logger.error(f"Не удалось записать статус файла {path}: {mark_error}")
+            finally:
+                self._in_progress.discard(key)
+
+    async def poll_once(self):
+        """
+        Один опрос директории: запускает обработку новых завершенных файлов
+        в фоновых задачах (дождаться их можно через drain).
+
+        Returns:
+            List[tuple]: Файлы (путь, размер, mtime), переданные в обработку
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        files = await self.run_blocking(self._list_files)
+        self.last_poll = time.time()
+        state = await self.run_blocking(self.registry.load, [path for path, _, _ in files])
+
+        # Файл считается загруженным, если он давно не менялся или не изменился с прошлого опроса
+        previous, self._seen = self._seen, {path: (size, mtime) for path, size, mtime in files}
+        settled_before = self.last_poll - self.settle_seconds
+        ready = []
+        for key in files:
+            path, size, mtime = key
+            status, attempts = state.get(key, (None, 0))
+            if status == 'done' or attempts >= self.max_attempts or key in self._in_progress:
+                continue
+            if mtime > settled_before and previous.get(path) != (size, mtime):
+                logger.debug(f"Файл {path} еще загружается или появился впервые, проверка на следующем опросе")
+                continue
+            ready.append(key)
+
+        if ready:
+            logger.info(f"Новых файлов в {self.directory}: {len(ready)}")
+        for key in ready:
+            self._in_progress.add(key)
+            job = asyncio.get_running_loop().create_task(self._process(key))
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+        return ready
+
+    async def drain(self):
+        """Ожидает завершения обработки уже найденных файлов"""
+        while self._jobs:
+            await asyncio.gather(*list(self._jobs), return_exceptions=True)
+
+    async def run(self):
+        """Цикл опроса до отмены задачи"""
+        logger.info(f"Наблюдение за {posixpath.join(self.directory, self.pattern)} "
+                    f"каждые {self.interval} с")
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка опроса SFTP директории {self.directory}: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запускает фоновую задачу в текущем event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Останавливает опрос; обработка файлов, находящихся в работе, отменяется"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for job in list(self._jobs):
+            job.cancel()
+        await asyncio.gather(*list(self._jobs), return_exceptions=True)
+
+    def status(self):
+        """Состояние наблюдателя для эндпоинта /main/watcher"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "directory": self.directory,
+            "pattern": self.pattern,
+            "interval": self.interval,
+            "last_poll": self.last_poll,
+            "in_progress": sorted(path for path, _, _ in self._in_progress),
+            "processed": self.processed,
+            "failed": self.failed
+        }
@@ -2,20 +2,82 @@
 Модуль для восстановления продаж и моделирования инвентаря.
 Включает функции для проверки распределений, восстановления продаж и моделирования поставок.
 """
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import PoissonRegressor
 from collections import deque
+from scipy import sparse
 import lightgbm as lgb
 import numpy as np
 import pandas as pd
 import time
 import logging
+from Preprocessing import Preprocessing_data
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Признаки моделей восстановления продаж
+RECOVERY_CATEGORICAL_FEATURES = ['Акция', 'Выходной', 'ДеньНедели', 'День', 'Месяц', 'Год', 'Сезонность_точн']
+RECOVERY_NUMERICAL_FEATURES = ['Цена', 'КоличествоЧеков', 'Температура (°C)', 'Давление (мм рт. ст.)']
+# Категориальные признаки, которые приводятся к строкам
+RECOVERY_STRING_FEATURES = ['Акция', 'Выходной', 'ДеньНедели', 'День', 'Месяц', 'Год']
+
+# Доля ненулевых значений, начиная с которой ColumnTransformer возвращает плотную матрицу
+SPARSE_THRESHOLD = 0.3
+
+
+class RecoveryDesignMatrix:
+    """
+    Матрица признаков моделей восстановления продаж, построенная один раз для
+    всего DataFrame: one-hot категориальных признаков в CSR со словарем
+    значений всех строк (значения отсортированы, как в OneHotEncoder) и
+    числовые признаки.
+
+    Для пары берутся срезы строк: из one-hot остаются столбцы значений,
+    встречающихся в обучающих строках пары, числовые признаки стандартизуются
+    по обучающим строкам. Результат совпадает с ColumnTransformer из
+    OneHotEncoder(handle_unknown='ignore') и StandardScaler, обученным на паре.
+    """
+
+    def __init__(self, data, categorical=RECOVERY_CATEGORICAL_FEATURES, numerical=RECOVERY_NUMERICAL_FEATURES):
+        n_rows = len(data)
+        blocks = []
+        for column in categorical:
+            codes, categories = pd.factorize(data[column], sort=True)
+            known = codes >= 0
+            blocks.append(sparse.csr_matrix(
+                (np.ones(known.sum()), (np.flatnonzero(known), codes[known])),
+                shape=(n_rows, len(categories))
+            ))
+        self.categorical = sparse.hstack(blocks, format='csr')
+        self.numerical = data[numerical].to_numpy(dtype=np.float64)
+
+    def pair_matrices(self, train_rows, predict_rows):
+        """
+        Матрицы признаков пары для обучения и прогноза.
+
+        Args:
+            train_rows: Позиции обучающих строк
+            predict_rows: Позиции строк прогноза
+
+        Returns:
+            tuple: (X_train, X_predict) - CSR или np.ndarray при плотности от SPARSE_THRESHOLD
+        """
+        train_categorical = self.categorical[train_rows]
+        columns = np.unique(train_categorical.indices)
+        scaler = StandardScaler().fit(self.numerical[train_rows])
+
+        n_numerical = self.numerical.shape[1]
+        density = ((train_categorical.nnz + len(train_rows) * n_numerical)
+                   / max(len(train_rows) * (len(columns) + n_numerical), 1))
+
+        def build(categorical, rows):
+            matrix = sparse.hstack([categorical[:, columns],
+                                    sparse.csr_matrix(scaler.transform(self.numerical[rows]))], format='csr')
+            return matrix if density < SPARSE_THRESHOLD else matrix.toarray()
+
+        return build(train_categorical, train_rows), build(self.categorical[predict_rows], predict_rows)
+
 
 class Recovery_sales:
     def first_data_type_refactor(self, df):
@@ -79,25 +141,60 @@ class Recovery_sales:
         # Основной критерий
         return abs(mean - var) / mean <= tolerance
 
-    def use_poison_check(self, df):
-        df_copy = df.copy()
-
-        poisson_flags = {}
-
-        for (shop, product), group in df_copy.groupby(['Магазин', 'Товар'])['Продано']:
-            poisson_flags[(shop, product)] = (self.is_poisson_simple(group))
-
-        # Преобразуем словарь в DataFrame для объединения
-        poisson_df = pd.DataFrame(
-            [(shop, product, is_poisson) for (shop, product),
-            is_poisson in poisson_flags.items()],
-            columns=['Магазин', 'Товар', 'Пуассон_распр']
-        )
-
-        # Объединяем обратно с основным DataFrame по Магазин + Товар
-        df = df_copy.merge(poisson_df, on=['Магазин', 'Товар'], how='left')
-        poisson_count = df[df['Пуассон_распр'] == 1][['Товар', 'Магазин']].drop_duplicates().shape[0]
-        non_poisson_count = df[df['Пуассон_распр'] == 0][['Товар', 'Магазин']].drop_duplicates().shape[0]
+    def poisson_flags(self, codes, n_pairs, sold, tolerance=0.20, zero_threshold=0.95):
+        """
+        Векторный is_poisson_simple для всех пар сразу: количество, сумма, сумма
+        квадратов и число нулей по кодам пар за один проход np.bincount.
+        Пропуски продаж не учитываются в среднем и дисперсии, но входят в
+        знаменатель доли нулей (как np.mean(group == 0)).
+
+        Критерий |mean - var| / mean <= tolerance проверяется в виде
+        |n*S - (n*Q - S^2)| <= tolerance*n*S: для целых продаж обе части точные,
+        поэтому пары на границе допуска не зависят от порядка суммирования.
+
+        Args:
+            codes: Коды пар строк (Preprocessing_data.pair_codes, -1 - вне пар)
+            n_pairs: Количество пар
+            sold: Продажи строк
+
+        Returns:
+            np.ndarray: Флаг распределения Пуассона для каждой пары
+        """
+        valid = codes >= 0
+        codes, sold = codes[valid], np.asarray(sold, dtype=np.float64)[valid]
+        known = ~np.isnan(sold)
+        values = np.where(known, sold, 0.0)
+
+        rows = np.bincount(codes, minlength=n_pairs)
+        n = np.bincount(codes, weights=known, minlength=n_pairs)
+        total = np.bincount(codes, weights=values, minlength=n_pairs)
+        squares = np.bincount(codes, weights=values ** 2, minlength=n_pairs)
+        zeros = np.bincount(codes, weights=sold == 0, minlength=n_pairs)
+
+        # Случай почти нулевых продаж (λ≈0)
+        near_zero = zeros / np.maximum(rows, 1) >= zero_threshold
+        # Основной критерий (при нулевом среднем не выполняется)
+        deviation = np.abs(n * total - (n * squares - total ** 2))
+        return near_zero | ((total > 0) & (deviation <= tolerance * n * total))
+
+    def use_poison_check(self, df, tolerance=0.20, zero_threshold=0.95):
+        """
+        Флаг распределения Пуассона пар Магазин+Товар (столбец Пуассон_распр) по
+        критериям is_poisson_simple; флаги пар переносятся на строки по кодам пар.
+        """
+        df = df.reset_index(drop=True)
+
+        codes, n_pairs = Preprocessing_data.pair_codes(df)
+        flags = self.poisson_flags(codes, n_pairs, df['Продано'].to_numpy(dtype=np.float64),
+                                   tolerance=tolerance, zero_threshold=zero_threshold)
+        if (codes >= 0).all():
+            df['Пуассон_распр'] = flags[codes]
+        else:
+            # Строки с пустым магазином или товаром остаются без флага
+            df['Пуассон_распр'] = np.append(flags.astype(object), np.nan)[codes]
+
+        poisson_count = int(flags.sum())
+        non_poisson_count = n_pairs - poisson_count
         logger.info(f"Связок товар+магазин с Пуассоновским распределением: {poisson_count}")
         logger.info(f"Связок товар+магазин не с Пуассоновским распределением: {non_poisson_count}")
         logger.info('Проверка распределений закончена')
@@ -105,67 +202,84 @@ class Recovery_sales:
         return df
 
 
-    def enhance_poison_sales(self, data):
+    def recover_pairs(self, data, fit_predict):
         """
-        Обрабатывает данные, заменяя нулевые продажи (при нулевом остатке и отсутствии поступлений)
-        на смоделированные значения. Временные признаки обрабатываются как категориальные.
+        Заменяет нулевые продажи (при нулевом остатке и отсутствии поступлений)
+        на значения fit_predict, обученной отдельно для каждой пары Магазин+Товар
+        на остальных строках пары. Матрица признаков строится один раз для всего
+        DataFrame (RecoveryDesignMatrix), строки пар берутся по кодам пар.
+        Временные признаки обрабатываются как категориальные (строки).
+
+        Args:
+            data: Данные пар
+            fit_predict: Функция (X_train, y_train, X_predict) -> значения продаж
+
+        Returns:
+            pd.DataFrame: Данные со столбцом Продано_правка
         """
         data = data.copy()
-
         data['Продано_правка'] = data['Продано']
-        combos = data[['Магазин', 'Товар']].drop_duplicates()
-        data['Акция'] = data['Акция'].astype(str)
-        data['Выходной'] = data['Выходной'].astype(str)
-        data['ДеньНедели'] = data['ДеньНедели'].astype(str)
-        data['День'] = data['День'].astype(str)
-        data['Месяц'] = data['Месяц'].astype(str)
-        data['Год'] = data['Год'].astype(str)
-
-        # Все категориальные признаки (включая временные)
-        features_categorical = ['Акция', 'Выходной',
-                                'ДеньНедели', 'День', 'Месяц', 'Год', 'Сезонность_точн']
-
-        #    # Числовые признаки
-        features_numerical = ['Цена', 'КоличествоЧеков', 'Температура (°C)', 'Давление (мм рт. ст.)']
-
-        for _, (shop, product) in combos.iterrows():
-            mask = (data['Магазин'] == shop) & (data['Товар'] == product)
-            subset = data[mask].copy()
-
-            condition_modify = (subset['Продано'] == 0) & (subset['Остаток'] == 0) & (subset['Поступило'] == 0)
-            condition_keep = ~condition_modify
-
-            nonzero_sales = subset[condition_keep].copy()
-            zero_sales = subset[condition_modify].copy()
-
-            if len(zero_sales) == 0:
+        for column in RECOVERY_STRING_FEATURES:
+            data[column] = data[column].astype(str)
+
+        design = RecoveryDesignMatrix(data)
+        codes, n_pairs = Preprocessing_data.pair_codes(data)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(n_pairs + 1))
+
+        condition_modify = ((data['Продано'] == 0) & (data['Остаток'] == 0) & (data['Поступило'] == 0)).to_numpy()
+        sold = data['Продано'].clip(lower=0).to_numpy()
+        corrected = data['Продано_правка'].to_numpy().copy()
+        shops, products = data['Магазин'].to_numpy(), data['Товар'].to_numpy()
+
+        for pair in range(n_pairs):
+            rows = order[bounds[pair]:bounds[pair + 1]]
+            modify_rows = rows[condition_modify[rows]]
+            if len(modify_rows) == 0:
                 continue
+            keep_rows = rows[~condition_modify[rows]]
 
             try:
-                preprocessor = ColumnTransformer(
-                    transformers=[
-                        ('cat', OneHotEncoder(handle_unknown='ignore'), features_categorical),
-                        ('num', StandardScaler(), features_numerical)
-                    ]
-                )
-
-                model = Pipeline([
-                    ('preprocessor', preprocessor),
-                    ('regressor', PoissonRegressor(alpha=0.5, max_iter=2000))
-                ])
-
-                model.fit(nonzero_sales[features_categorical + features_numerical],
-                          nonzero_sales['Продано'].clip(lower=0))
-
-                predicted = model.predict(zero_sales[features_categorical + features_numerical])
-                simulated_sales = np.random.poisson(np.maximum(predicted, 0))
-
-                data.loc[zero_sales.index, 'Продано_правка'] = simulated_sales
-
+                X_train, X_predict = design.pair_matrices(keep_rows, modify_rows)
+                corrected[modify_rows] = fit_predict(X_train, sold[keep_rows], X_predict)
             except Exception as e:
-                logger.error(f"Ошибка для магазина {shop}, товара {product}: {str(e)}")
+                logger.error(f"Ошибка для магазина {shops[rows[0]]}, товара {products[rows[0]]}: {str(e)}")
                 continue
 
+        data['Продано_правка'] = corrected
+        return data
+
+    @staticmethod
+    def fit_predict_poisson(X_train, y_train, X_predict):
+        """PoissonRegressor и случайные продажи из распределения Пуассона с прогнозным средним"""
+        model = PoissonRegressor(alpha=0.5, max_iter=2000)
+        model.fit(X_train, y_train)
+        predicted = model.predict(X_predict)
+        return np.random.poisson(np.maximum(predicted, 0))
+
+    @staticmethod
+    def fit_predict_lightgbm(X_train, y_train, X_predict):
+        """LightGBM с пуассоновской функцией потерь, прогноз округляется до целых"""
+        # LightGBM параметры
+        lgb_params = {
+            'objective': 'poisson',  # Для счетных данных
+            'metric': 'poisson',
+            'num_leaves': 31,
+            'learning_rate': 0.05,
+            'n_estimators': 100,
+            'verbose': -1
+        }
+        model = lgb.LGBMRegressor(**lgb_params)
+        model.fit(X_train, y_train)
+        predicted = model.predict(X_predict)
+        return np.round(np.maximum(predicted, 0)).astype(int)
+
+    def enhance_poison_sales(self, data):
+        """
+        Обрабатывает данные, заменяя нулевые продажи (при нулевом остатке и отсутствии поступлений)
+        на смоделированные значения. Временные признаки обрабатываются как категориальные.
+        """
+        data = self.recover_pairs(data, self.fit_predict_poisson)
         logger.info('Продажи товаров с пуассоновским распределением восстановлены')
 
         return data
@@ -174,73 +288,7 @@ class Recovery_sales:
         """
         Обрабатывает данные, заменяя нулевые продажи на смоделированные значения с помощью LightGBM.
         """
-        data = data.copy()
-        data['Продано_правка'] = data['Продано']
-        combos = data[['Магазин', 'Товар']].drop_duplicates()
-
-        # Преобразование категориальных признаков
-        data['Акция'] = data['Акция'].astype(str)
-        data['Выходной'] = data['Выходной'].astype(str)
-        data['ДеньНедели'] = data['ДеньНедели'].astype(str)
-        data['День'] = data['День'].astype(str)
-        data['Месяц'] = data['Месяц'].astype(str)
-        data['Год'] = data['Год'].astype(str)
-
-        # Признаки
-        features_categorical = ['Акция', 'Выходной', 'ДеньНедели', 'День', 'Месяц', 'Год', 'Сезонность_точн']
-        features_numerical = ['Цена', 'КоличествоЧеков', 'Температура (°C)', 'Давление (мм рт. ст.)']
-
-        for _, (shop, product) in combos.iterrows():
-            mask = (data['Магазин'] == shop) & (data['Товар'] == product)
-            subset = data[mask].copy()
-
-            condition_modify = (subset['Продано'] == 0) & (subset['Остаток'] == 0) & (subset['Поступило'] == 0)
-            condition_keep = ~condition_modify
-
-            nonzero_sales = subset[condition_keep].copy()
-            zero_sales = subset[condition_modify].copy()
-
-            if len(zero_sales) == 0:
-                continue
-
-            try:
-                # LightGBM параметры
-                lgb_params = {
-                    'objective': 'poisson',  # Для счетных данных
-                    'metric': 'poisson',
-                    'num_leaves': 31,
-                    'learning_rate': 0.05,
-                    'n_estimators': 100,
-                    'verbose': -1
-                }
-
-                # Препроцессинг
-                preprocessor = ColumnTransformer(
-                    transformers=[
-                        ('cat', OneHotEncoder(handle_unknown='ignore'), features_categorical),
-                        ('num', StandardScaler(), features_numerical)
-                    ]
-                )
-
-                # Пайплайн с LightGBM
-                model = Pipeline([
-                    ('preprocessor', preprocessor),
-                    ('regressor', lgb.LGBMRegressor(**lgb_params))
-                ])
-
-                # Обучение на ненулевых данных
-                model.fit(
-                    nonzero_sales[features_categorical + features_numerical],
-                    nonzero_sales['Продано'].clip(lower=0)
-                )
-
-                # Предсказание и генерация целых чисел
-                predicted = model.predict(zero_sales[features_categorical + features_numerical])
-                data.loc[zero_sales.index, 'Продано_правка'] = np.round(np.maximum(predicted, 0)).astype(int)
-
-            except Exception as e:
-                logger.error(f"Ошибка для магазина {shop}, товара {product}: {str(e)}")
-                continue
+        data = self.recover_pairs(data, self.fit_predict_lightgbm)
 
         logger.info('Продажи восстановлены с помощью LightGBM')
         logger.info('Восстановление продаж закончено')
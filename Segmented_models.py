@@ -0,0 +1,275 @@
+"""
+Модуль сегментированных моделей.
+Данные делятся на сегменты по значению категориального признака (Категория,
+кластер магазинов и т.п.), для каждого сегмента обучается отдельная модель
+CatBoost в пуле процессов; при прогнозе строки направляются в модель своего сегмента.
+"""
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import catboost as cb
+import logging
+from Inference_engine import InferenceEngine, build_cat_matrix, build_pool
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+def _train_segment(segment, train_data, test_data, numerical_columns, cat_columns, model_params):
+    """
+    Обучение модели одного сегмента (выполняется в процессе пула).
+    В процесс передаются только строки сегмента.
+    """
+    num_matrix, cat_matrix, label = train_data
+    train_pool = build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns,
+                            label=label, thread_count=model_params['thread_count'])
+
+    eval_set = None
+    if test_data is not None:
+        num_matrix, cat_matrix, label = test_data
+        eval_set = build_pool(num_matrix, cat_matrix, numerical_columns, cat_columns,
+                              label=label, thread_count=model_params['thread_count'])
+
+    model = cb.CatBoostRegressor(
+        use_best_model=eval_set is not None,
+        **model_params
+    )
+    model.fit(train_pool, eval_set=eval_set)
+    return segment, model
+
+
+class SegmentedModel:
+    """
+    Набор моделей CatBoost по сегментам.
+
+    segments сопоставляет значение столбца сегментации (в том виде, в котором оно
+    передается в CatBoost) с названием сегмента, models - название сегмента с моделью.
+    Строки со значениями вне segments (новые категории, магазины) направляются
+    в модель OTHER (объединение малых сегментов), а если малых сегментов нет -
+    в модель самого большого сегмента.
+    """
+
+    OTHER = 'Прочие'
+
+    def __init__(self, segment_column, segments, models):
+        """
+        Args:
+            segment_column: Категориальный признак, по которому выбирается сегмент
+            segments: Словарь {значение признака: название сегмента}
+            models: Словарь {название сегмента: модель CatBoost}
+        """
+        self.segment_column = segment_column
+        self.segments = dict(segments)
+        self.models = dict(models)
+
+    def segment_of(self, values):
+        """Названия сегментов для значений признака; значения без сегмента получают OTHER"""
+        values = np.asarray(values).astype(str)
+        unique, inverse = np.unique(values, return_inverse=True)
+        names = np.array([self.segments.get(value, self.OTHER) for value in unique], dtype=object)
+        return names[inverse]
+
+    def fallback_segment(self):
+        """
+        Сегмент модели для строк, у сегмента которых нет модели: OTHER, а для
+        наборов без модели OTHER - первый (самый большой) обученный сегмент.
+        """
+        if self.OTHER in self.models:
+            return self.OTHER
+        return next(iter(self.models))
+
+    def predict_arrays(self, num_matrix, cat_values, numerical_columns, cat_columns,
+                       thread_count=-1, batch_size=100000, n_jobs=None):
+        """
+        Предсказание с маршрутизацией строк по сегментам.
+        Сегменты обрабатываются параллельно в потоках (CatBoost освобождает GIL).
+
+        Args:
+            num_matrix: Масштабированные числовые признаки
+            cat_values: DataFrame или словарь {столбец: массив значений} категориальных признаков
+            numerical_columns: Список числовых признаков
+            cat_columns: Список категориальных признаков
+            thread_count: Общее количество потоков CatBoost
+            batch_size: Размер пакета предсказания внутри сегмента
+            n_jobs: Количество сегментов, обрабатываемых одновременно (None - все модели)
+
+        Returns:
+            np.ndarray: Предсказания для всех строк
+        """
+        if not self.models:
+            raise ValueError("В наборе нет ни одной модели сегмента")
+
+        n_rows = len(num_matrix)
+        predictions = np.full(n_rows, np.nan, dtype=np.float64)
+        if n_rows == 0:
+            return predictions
+
+        cat_matrix = build_cat_matrix(cat_values, cat_columns, n_rows)
+        segment_names = self.segment_of(cat_matrix[:, list(cat_columns).index(self.segment_column)])
+
+        # Строки сегментов без модели получают модель fallback_segment
+        without_model = ~np.isin(segment_names, list(self.models))
+        if without_model.any():
+            fallback = self.fallback_segment()
+            segment_names[without_model] = fallback
+            logger.info(f"Строк со значениями {self.segment_column} вне сегментов: "
+                        f"{int(without_model.sum())}, они направлены в модель сегмента {fallback}")
+
+        routed = []
+        for name, model in self.models.items():
+            rows = np.flatnonzero(segment_names == name)
+            if len(rows):
+                routed.append((name, model, rows))
+
+        n_jobs = min(n_jobs or len(routed), len(routed))
+        cpu_count = os.cpu_count() or 1
+        segment_threads = max(1, (cpu_count if thread_count == -1 else thread_count) // n_jobs)
+
+        def score(item):
+            name, model, rows = item
+            engine = InferenceEngine(model, numerical_columns, cat_columns,
+                                     thread_count=segment_threads, batch_size=batch_size)
+            pool = engine.build_pool(num_matrix[rows], cat_matrix[rows])
+            return rows, engine.predict(pool)
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for rows, segment_pred in executor.map(score, routed):
+                predictions[rows] = segment_pred
+
+        logger.debug(f"Предсказание по {len(routed)} сегментам выполнено")
+        return predictions
+
+
+class SegmentedTrainer:
+    """
+    Обучение отдельной модели для каждого сегмента в пуле процессов.
+
+    Сегменты с числом обучающих строк меньше min_segment_rows объединяются
+    в сегмент SegmentedModel.OTHER. Модели обучаются начиная с самых больших
+    сегментов, каждый процесс получает только строки своего сегмента и
+    ограничение памяти CatBoost used_ram_limit.
+    """
+
+    def __init__(self, segment_column='Категория', segment_map=None, segment_map_file=None,
+                 min_segment_rows=10000, n_jobs=2, iterations=3000, early_stopping_rounds=200):
+        """
+        Args:
+            segment_column: Категориальный признак для разбиения на сегменты
+            segment_map: Словарь {исходное значение признака: сегмент}, например
+                магазин -> кластер магазинов; None - сегмент на каждое значение
+            segment_map_file: JSON-файл со словарем segment_map
+            min_segment_rows: Минимальное количество обучающих строк отдельного сегмента
+            n_jobs: Количество параллельных процессов обучения
+            iterations: Максимальное количество итераций модели сегмента
+            early_stopping_rounds: Ранняя остановка по тестовой выборке сегмента
+        """
+        if segment_map is None and segment_map_file:
+            with open(segment_map_file, encoding='utf-8') as f:
+                segment_map = json.load(f)
+
+        self.segment_column = segment_column
+        self.segment_map = None if segment_map is None else {str(k): str(v) for k, v in segment_map.items()}
+        self.min_segment_rows = min_segment_rows
+        self.n_jobs = max(1, n_jobs)
+        self.iterations = iterations
+        self.early_stopping_rounds = early_stopping_rounds
+
+    def build_segments(self, keys, codebook=None):
+        """
+        Сопоставляет значения признака в обучающей выборке с сегментами.
+
+        Args:
+            keys: Значения признака в том виде, в котором они передаются в CatBoost
+            codebook: CategoricalCodebook признака, если он закодирован
+
+        Returns:
+            dict: {значение признака: название сегмента}
+        """
+        values, counts = np.unique(np.asarray(keys).astype(str), return_counts=True)
+        source = values if codebook is None else codebook.decode(values.astype(np.int64), missing='')
+        source = np.asarray(source).astype(str)
+
+        if self.segment_map is None:
+            names = source
+        else:
+            names = np.array([self.segment_map.get(value, SegmentedModel.OTHER) for value in source], dtype=object)
+
+        # Малые сегменты объединяются в OTHER
+        segment_rows = {}
+        for name, count in zip(names, counts):
+            segment_rows[name] = segment_rows.get(name, 0) + count
+        small = {name for name, rows in segment_rows.items() if rows < self.min_segment_rows}
+        if small:
+            logger.info(f"Сегментов с числом строк меньше {self.min_segment_rows}: {len(small)}, "
+                        f"они объединены в сегмент {SegmentedModel.OTHER}")
+
+        return {value: (SegmentedModel.OTHER if name in small else str(name)) for value, name in zip(values, names)}
+
+    def train(self, train_data, test_data, numerical_columns, cat_columns, model_params, codebook=None):
+        """
+        Обучение моделей сегментов.
+
+        Args:
+            train_data: (num_matrix, cat_matrix, label) обучающей выборки
+            test_data: (num_matrix, cat_matrix, label) тестовой выборки
+            numerical_columns: Список числовых признаков
+            cat_columns: Список категориальных признаков
+            model_params: Параметры CatBoost (First_learning_model.catboost_params и подобранные)
+            codebook: CategoricalCodebook столбца сегментации, если он закодирован
+
+        Returns:
+            tuple: (SegmentedModel, предсказания на тестовой выборке)
+        """
+        numerical_columns, cat_columns = list(numerical_columns), list(cat_columns)
+        if self.segment_column not in cat_columns:
+            raise ValueError(f"Столбец сегментации {self.segment_column} не является категориальным признаком")
+        key_index = cat_columns.index(self.segment_column)
+
+        segments = self.build_segments(train_data[1][:, key_index], codebook)
+        model = SegmentedModel(self.segment_column, segments, {})
+        train_names = model.segment_of(train_data[1][:, key_index])
+        test_names = model.segment_of(test_data[1][:, key_index])
+
+        # Ограничение памяти и потоки CatBoost - на каждый процесс
+        params = dict(model_params)
+        cpu_count = os.cpu_count() or 1
+        thread_count = params.get('thread_count', -1)
+        params['thread_count'] = max(1, (cpu_count if thread_count == -1 else thread_count) // self.n_jobs)
+        params['verbose'] = 0
+        params.setdefault('allow_writing_files', False)
+        params.setdefault('iterations', self.iterations)
+        params.setdefault('early_stopping_rounds', self.early_stopping_rounds)
+
+        names, sizes = np.unique(train_names.astype(str), return_counts=True)
+        order = names[np.argsort(-sizes)]
+
+        tasks = []
+        for name in order:
+            train_rows = train_names == name
+            test_rows = test_names == name
+            segment_test = tuple(part[test_rows] for part in test_data) if test_rows.any() else None
+            tasks.append((name, tuple(part[train_rows] for part in train_data), segment_test,
+                          numerical_columns, cat_columns, params))
+        logger.info(f"Обучение {len(tasks)} моделей сегментов по {self.segment_column} "
+                    f"в {self.n_jobs} процессах")
+
+        if self.n_jobs == 1:
+            results = [_train_segment(*task) for task in tasks]
+        else:
+            # spawn, а не fork: обучение запускается из процесса API с активными пулами
+            # потоков и потоками OpenMP CatBoost, fork которого может заблокировать дочерний
+            with ProcessPoolExecutor(max_workers=self.n_jobs,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = [executor.submit(_train_segment, *task) for task in tasks]
+                results = [future.result() for future in futures]
+
+        for name, segment_model in results:
+            model.models[name] = segment_model
+            logger.info(f"Сегмент {name}: {int((train_names == name).sum())} строк обучения, "
+                        f"итераций {segment_model.tree_count_}")
+
+        y_pred = model.predict_arrays(test_data[0], {col: test_data[1][:, j] for j, col in enumerate(cat_columns)},
+                                      numerical_columns, cat_columns, thread_count=thread_count)
+        return model, y_pred
@@ -0,0 +1,69 @@
+"""
+Модуль пулов выполнения блокирующих операций для асинхронных эндпоинтов.
+I/O-операции (SFTP, PostgreSQL) и вычисления (pandas, CatBoost) выполняются
+в отдельных пулах потоков заданного размера, поэтому длительное обучение или
+прогноз не занимают event loop и общий пул Starlette, а проверка здоровья
+и листинг файлов отвечают без задержек.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+class BlockingExecutors:
+    """
+    Пулы потоков для блокирующих этапов обработки запросов.
+
+    io - сетевые и дисковые операции (SFTP, запросы к БД): потоки в основном
+    ждут, поэтому пул может быть большим. cpu - предобработка, восстановление
+    продаж, обучение и прогноз: pandas, NumPy и CatBoost освобождают GIL на
+    тяжелых операциях, а небольшой размер пула ставит лишние задачи в очередь
+    вместо конкуренции за ядра.
+    """
+
+    def __init__(self, io_workers=8, cpu_workers=1):
+        """
+        Args:
+            io_workers: Количество потоков для I/O-операций
+            cpu_workers: Количество одновременно выполняемых вычислительных этапов
+        """
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='io')
+        self.cpu = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='cpu')
+
+    @staticmethod
+    async def _run(executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    async def run_io(self, func, *args, **kwargs):
+        """Выполняет блокирующую I/O-функцию в пуле io"""
+        return await self._run(self.io, func, *args, **kwargs)
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """Выполняет вычислительную функцию в пуле cpu"""
+        return await self._run(self.cpu, func, *args, **kwargs)
+
+    async def iterate_io(self, iterator):
+        """
+        Асинхронный итератор по блокирующему итератору: каждый элемент
+        получается в пуле io (для потоковых ответов, читающих из БД).
+        """
+        iterator = iter(iterator)
+        done = object()
+        while True:
+            item = await self.run_io(next, iterator, done)
+            if item is done:
+                break
+            yield item
+
+    def shutdown(self, wait=True):
+        """Останавливает пулы (при остановке приложения)"""
+        logger.info("Остановка пулов выполнения блокирующих операций")
+        self.io.shutdown(wait=wait, cancel_futures=True)
+        self.cpu.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,76 @@
+"""
+Бенчмарк кодирования категориальных признаков.
+
+Сравнивает прежний путь (set(classes_) + isin + LabelEncoder.transform,
+inverse_transform) с CategoricalCodebook (хэш-индекс, один проход
+с маской неизвестных значений, декодирование по массиву).
+
+Запуск:
+    python -m benchmarks.bench_codebook --rows 1000000 --classes 20000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from Categorical_codebook import CategoricalCodebook
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--classes', type=int, default=20000)
+    parser.add_argument('--unknown-share', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    classes = np.array([f'Товар_{i}' for i in range(args.classes)], dtype=object)
+    values = classes[rng.integers(0, args.classes, args.rows)]
+    unknown = rng.random(args.rows) < args.unknown_share
+    values[unknown] = 'Новый_товар'
+    series = pd.Series(values)
+
+    encoder = LabelEncoder().fit(classes)
+    codebook = CategoricalCodebook.fit(classes)
+
+    def legacy_encode():
+        known = series[series.isin(set(encoder.classes_))]
+        return encoder.transform(known)
+
+    def codebook_encode():
+        codes, known = codebook.encode(series)
+        return codes[known]
+
+    legacy_codes = legacy_encode()
+    codebook_codes = codebook_encode()
+
+    legacy_time = best_of(legacy_encode, args.repeat)
+    codebook_time = best_of(codebook_encode, args.repeat)
+
+    legacy_decode = best_of(lambda: encoder.inverse_transform(legacy_codes), args.repeat)
+    codebook_decode = best_of(lambda: codebook.decode(codebook_codes), args.repeat)
+
+    same = (np.array_equal(legacy_codes, codebook_codes)
+            and np.array_equal(encoder.inverse_transform(legacy_codes), codebook.decode(codebook_codes)))
+
+    print(f"Строк: {args.rows}, категорий: {args.classes}, неизвестных: {int(unknown.sum())}")
+    print(f"Кодирование: LabelEncoder {legacy_time * 1000:.1f} мс, CategoricalCodebook {codebook_time * 1000:.1f} мс, "
+          f"ускорение {legacy_time / codebook_time:.1f}x")
+    print(f"Декодирование: LabelEncoder {legacy_decode * 1000:.1f} мс, CategoricalCodebook {codebook_decode * 1000:.1f} мс, "
+          f"ускорение {legacy_decode / codebook_decode:.1f}x")
+    print(f"Результаты совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
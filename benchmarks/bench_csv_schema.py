@@ -0,0 +1,102 @@
+"""
+Бенчмарк чтения CSV файла исходных данных.
+
+Сравнивает прежнее чтение из download_csv_as_dataframe (определение типов,
+parse_dates и при ошибке повторный разбор с errors='coerce') с чтением по
+ORIGIN_SCHEMA (объявленные строковые столбцы и формат даты, один проход).
+Файл отсортирован по дате, как ежедневные выгрузки: первая дата 01.01.2023
+неоднозначна, и прежнее чтение угадывает формат %m.%d.%Y.
+
+Запуск:
+    python -m benchmarks.bench_csv_schema --rows 1000000
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from Input_schema import ORIGIN_SCHEMA
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def legacy_read(path):
+    """Прежнее чтение CSV из SFTPConnector.download_csv_as_dataframe"""
+    try:
+        df = pd.read_csv(path, parse_dates=["Дата"])
+    except Exception:
+        df = pd.read_csv(path)
+    if df['Дата'].dtype == object:
+        # parse_dates не разобрал формат - второй полный разбор столбца
+        df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
+    return df
+
+
+def make_file(path, rows, rng):
+    """Создает CSV файл исходных данных, возвращает истинные даты строк"""
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 365, rows)), unit='D')
+    df = pd.DataFrame({
+        'Дата': dates.strftime('%d.%m.%Y'),
+        'Магазин': rng.integers(1, 60, rows).astype(str),
+        'Товар': np.char.add('0', rng.integers(1000, 99999, rows).astype(str)),
+        'Цена': rng.uniform(10, 5000, rows).round(2),
+        'Акция': rng.integers(0, 2, rows).astype(bool),
+        'Выходной': rng.integers(0, 2, rows).astype(bool),
+        'Категория': rng.choice(['Лекарства', 'Косметика', 'БАДы', 'Гигиена'], rows),
+        'ПотребГруппа': rng.choice(['А', 'Б', 'В'], rows),
+        'МНН': rng.choice(['Ибупрофен', 'Парацетамол', 'Нет'], rows),
+        'Продано': rng.poisson(2, rows),
+        'Остаток': rng.poisson(10, rows),
+        'Поступило': rng.poisson(1, rows),
+        'Заказ': rng.poisson(1, rows),
+        'КоличествоЧеков': rng.poisson(2, rows),
+        'ПроданоСеть': rng.poisson(50, rows),
+        'ОстатокСеть': rng.poisson(300, rows),
+        'ПоступилоСеть': rng.poisson(20, rows),
+        'КоличествоЧековСеть': rng.poisson(40, rows),
+    })
+    df.to_csv(path, index=False)
+    return pd.Series(dates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'origin.csv')
+        true_dates = make_file(path, args.rows, rng)
+        size_mb = os.path.getsize(path) / 2 ** 20
+
+        legacy = legacy_read(path)
+        schema_df, report = ORIGIN_SCHEMA.read_csv(path)
+        legacy_correct = int((legacy['Дата'] == true_dates).sum())
+        schema_correct = int((schema_df['Дата'] == true_dates).sum())
+        same_values = bool(np.allclose(legacy['Продано'], schema_df['Продано']))
+
+        legacy_time = best_of(lambda: legacy_read(path), args.repeat)
+        schema_time = best_of(lambda: ORIGIN_SCHEMA.read_csv(path), args.repeat)
+
+    print(f"Строк: {args.rows}, размер файла {size_mb:.0f} МБ, движок схемы: {report['engine']}")
+    print(f"Чтение: прежнее {legacy_time * 1000:.0f} мс, по схеме {schema_time * 1000:.0f} мс, "
+          f"ускорение {legacy_time / schema_time:.1f}x")
+    print(f"Верных дат: прежнее чтение {legacy_correct}/{args.rows} (NaT: {int(legacy['Дата'].isna().sum())}), "
+          f"по схеме {schema_correct}/{args.rows}")
+    print(f"Продажи совпадают: {same_values}, код товара по схеме {schema_df['Товар'].iloc[0]} "
+          f"(прежнее чтение: {legacy['Товар'].iloc[0]})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Бенчмарк времени импорта API (холодный старт).
+
+Каждый замер - отдельный процесс python: импорт main с ленивой конфигурацией
+и отложенным импортом модулей обучения и прогноза сравнивается с прежним
+стартом, когда при импорте загружались и catboost, lightgbm, sklearn,
+optuna, sqlalchemy. Переменные БД не задаются: импорт main их не требует.
+
+Запуск:
+    python -m benchmarks.bench_import --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые прежде импортировались вместе с main
+EAGER_MODULES = ['Sales_recovery', 'First_model_learning', 'Hyperparameter_tuning',
+                 'Segmented_models', 'Next_model_predict', 'sqlalchemy']
+
+HEAVY_PACKAGES = ['catboost', 'lightgbm', 'sklearn', 'optuna', 'sqlalchemy']
+
+
+def run_import(code, env):
+    """Время выполнения кода в новом процессе и вывод процесса"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    env = {key: value for key, value in os.environ.items() if not key.startswith('DB_')}
+    check = f"import sys; print([name for name in {HEAVY_PACKAGES!r} if name in sys.modules])"
+    cases = [
+        ('python без импортов', 'pass'),
+        ('import main (сейчас)', f"import main; {check}"),
+        ('import main + прежние модули', f"import main, {', '.join(EAGER_MODULES)}; {check}"),
+    ]
+
+    print(f"Лучшее из {args.repeat} запусков:")
+    for name, code in cases:
+        timings = []
+        for _ in range(args.repeat):
+            seconds, loaded = run_import(code, env)
+            timings.append(seconds)
+        suffix = f", загружены: {loaded}" if loaded else ''
+        print(f"{name:30s} {min(timings) * 1000:7.0f} мс{suffix}")
+
+
+if __name__ == '__main__':
+    main()
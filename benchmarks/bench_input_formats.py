@@ -0,0 +1,80 @@
+"""
+Бенчмарк форматов входных файлов.
+
+Один и тот же файл исходных данных сохраняется в каждом доступном формате
+(CSV, CSV gzip/zstd/zip, Parquet, Feather, xlsx) и читается через
+Input_formats.read_input по ORIGIN_SCHEMA: размер файла, время чтения.
+Форматы, для которых не установлен пакет, пропускаются.
+
+Запуск:
+    python -m benchmarks.bench_input_formats --rows 1000000
+"""
+import os
+import argparse
+import tempfile
+import importlib.util
+import numpy as np
+import pandas as pd
+
+from Input_formats import read_input
+from Input_schema import ORIGIN_SCHEMA
+from benchmarks.bench_csv_schema import best_of, make_file
+
+
+def available(package):
+    return importlib.util.find_spec(package) is not None
+
+
+def writers():
+    """Форматы: (формат, расширение, функция записи DataFrame или None, если нет пакета)"""
+    return [
+        ('csv.gz', 'csv.gz', lambda df, path: df.to_csv(path, index=False, compression='gzip')),
+        ('csv.zip', 'zip', lambda df, path: df.to_csv(
+            path, index=False, compression={'method': 'zip', 'archive_name': 'origin.csv'})),
+        ('csv.zst', 'csv.zst', (lambda df, path: df.to_csv(path, index=False, compression='zstd'))
+            if available('zstandard') else None),
+        ('parquet', 'parquet', (lambda df, path: df.to_parquet(path, index=False))
+            if available('pyarrow') else None),
+        ('feather', 'feather', (lambda df, path: df.to_feather(path))
+            if available('pyarrow') else None),
+        ('xlsx', 'xlsx', (lambda df, path: df.to_excel(path, index=False, engine='openpyxl'))
+            if available('openpyxl') else None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'origin.csv')
+        make_file(csv_path, args.rows, rng)
+        paths = [('csv', csv_path)]
+        # CSV форматы сохраняют текст исходного файла, колоночные и Excel - типизированные столбцы
+        text_frame = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        typed_frame, _ = ORIGIN_SCHEMA.read_csv(csv_path)
+        for file_format, extension, write in writers():
+            if write is None:
+                print(f"{file_format}: пропущен, не установлен пакет")
+                continue
+            path = os.path.join(tmp, f'origin.{extension}')
+            write(text_frame if file_format.startswith('csv') else typed_frame, path)
+            paths.append((file_format, path))
+
+        for file_format, path in paths:
+            df, report = read_input(path, ORIGIN_SCHEMA)
+            assert report['format'] == file_format and len(df) == args.rows
+            seconds = best_of(lambda: read_input(path, ORIGIN_SCHEMA), args.repeat)
+            results.append((file_format, os.path.getsize(path) / 2 ** 20, seconds))
+
+    print(f"Строк: {args.rows}")
+    for file_format, size_mb, seconds in results:
+        print(f"{file_format:8s} {size_mb:8.1f} МБ {seconds * 1000:8.0f} мс")
+
+
+if __name__ == '__main__':
+    main()
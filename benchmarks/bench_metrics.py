@@ -0,0 +1,113 @@
+"""
+Бенчмарк расчета метрик точности прогноза.
+
+Сравнивает прежний путь (два цикла по строкам с iloc, groupby по парам
+Магазин+Товар) с ForecastEvaluator (векторные маски и bincount).
+
+Запуск:
+    python -m benchmarks.bench_metrics --rows 200000 --pairs 20000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from Model_metrics import ForecastEvaluator
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def legacy_metrics(df):
+    """Прежний расчет метрик из view_results_refactor_values"""
+    y_true = df['Реальные значения']
+    y_pred = df['Предсказанные значения']
+
+    result_metric_diff = 0
+    result_real_values = 0
+    result_metric_izl = 0
+    for i in range(len(y_true)):
+        result_metric = y_true.iloc[i] - y_pred.iloc[i]
+        if result_metric > 0:
+            result_metric_diff += result_metric
+        elif result_metric == 0:
+            result_real_values += y_true.iloc[i]
+        else:
+            result_metric_izl += result_metric
+
+    result_metric_diff_count = 0
+    result_real_values_count = 0
+    result_metric_izl_count = 0
+    for i in range(len(y_true)):
+        result_metric = y_true.iloc[i] - y_pred.iloc[i]
+        if result_metric > 0:
+            result_metric_diff_count += 1
+        elif result_metric == 0:
+            result_real_values_count += 1
+        else:
+            result_metric_izl_count += 1
+
+    agg_df = df.groupby(['Магазин', 'Товар']).agg({
+        'Реальные значения': 'sum',
+        'Предсказанные значения': 'sum'
+    }).reset_index()
+    total_diff = (agg_df['Реальные значения'] - agg_df['Предсказанные значения']).abs().sum()
+
+    return {
+        'deficit_sum': int(result_metric_diff),
+        'surplus_sum': int(abs(result_metric_izl)),
+        'deficit_count': result_metric_diff_count,
+        'surplus_count': result_metric_izl_count,
+        'exact_count': result_real_values_count,
+        'exact_sum': int(result_real_values),
+        'pair_abs_diff_sum': int(total_diff),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--pairs', type=int, default=20000)
+    parser.add_argument('--stores', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    pair = rng.integers(0, args.pairs, args.rows)
+    df = pd.DataFrame({
+        'Магазин': pair % args.stores,
+        'Товар': pair // args.stores,
+        'Категория': pair % 7,
+        'Реальные значения': rng.poisson(3, args.rows),
+        'Предсказанные значения': rng.poisson(3, args.rows),
+    })
+
+    evaluator = ForecastEvaluator()
+    pair_ids = df['Магазин'].to_numpy(dtype=np.int64) * (2 ** 32) + df['Товар'].to_numpy(dtype=np.int64)
+
+    def vectorized():
+        return evaluator.evaluate(df['Реальные значения'].to_numpy(), df['Предсказанные значения'].to_numpy(),
+                                  stores=df['Магазин'].to_numpy(), categories=df['Категория'].to_numpy(),
+                                  pairs=pair_ids)
+
+    legacy = legacy_metrics(df)
+    summary = vectorized()['summary']
+    same = all(summary[key] == value for key, value in legacy.items())
+
+    legacy_time = best_of(lambda: legacy_metrics(df), 1)
+    vectorized_time = best_of(vectorized, args.repeat)
+
+    print(f"Строк: {args.rows}, пар Магазин+Товар: {args.pairs}")
+    print(f"Метрики: циклы {legacy_time * 1000:.1f} мс, ForecastEvaluator {vectorized_time * 1000:.1f} мс "
+          f"(с разбивками по магазинам и категориям), ускорение {legacy_time / vectorized_time:.1f}x")
+    print(f"Результаты совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Бенчмарк форматов хранения модели CatBoost в ModelStorage.
+
+Сравнивает pickle (столбец catboost_model) и нативный формат CatBoost
+(столбец catboost_model_cbm): размер, время загрузки и задержку
+предсказания на одну строку.
+
+Запуск:
+    python -m benchmarks.bench_model_format --iterations 1000
+"""
+import argparse
+import pickle
+import time
+import numpy as np
+
+from DB_operations import ModelStorage
+from Next_model_predict import Use_model_predict
+from Inference_engine import InferenceEngine
+from benchmarks.bench_predict import legacy_encoding, train_small_model
+from benchmarks.synthetic_data import make_recovery_frame, to_dataframe_names
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=10)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--days', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    df_all = make_recovery_frame(args.shops, args.products, args.days + 1)
+    last_date = df_all['Дата'].max()
+    df_history = df_all[df_all['Дата'] < last_date]
+    df_next = to_dataframe_names(df_all[df_all['Дата'] == last_date])
+    model, encoders = train_small_model(df_history, args.iterations)
+
+    storage = ModelStorage(None)
+    pickled = pickle.dumps(model)
+    native = storage._serialize_native(model)
+
+    pickle_load = best_of(lambda: pickle.loads(pickled), args.repeat)
+    native_load = best_of(lambda: storage._deserialize_native(native), args.repeat)
+
+    predictor = Use_model_predict()
+    df_with_lags = predictor.add_lag_values(df_history, df_next).iloc[:1]
+    features = predictor.numerical_columns + predictor.cat_columns
+    df_encoding = legacy_encoding(df_with_lags, encoders)
+    row = df_encoding[features]
+
+    pickled_model = pickle.loads(pickled)
+    native_model = storage._deserialize_native(native)
+    num_matrix, cat_values, _ = predictor.prepare_inference_data(df_with_lags, *encoders)
+    engine = InferenceEngine(native_model, predictor.numerical_columns, predictor.cat_columns, thread_count=1)
+
+    pickle_row = best_of(lambda: pickled_model.predict(row), args.repeat)
+    native_row = best_of(lambda: engine.predict_arrays(num_matrix, cat_values), args.repeat)
+
+    same = np.allclose(pickled_model.predict(row), engine.predict_arrays(num_matrix, cat_values))
+
+    print(f"Размер: pickle {len(pickled) / 1024:.0f} КБ, cbm {len(native) / 1024:.0f} КБ")
+    print(f"Загрузка: pickle {pickle_load * 1000:.2f} мс, cbm {native_load * 1000:.2f} мс")
+    print(f"Предсказание одной строки: pickle + DataFrame {pickle_row * 1000:.2f} мс, "
+          f"cbm + InferenceEngine {native_row * 1000:.2f} мс")
+    print(f"Предсказания совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Бенчмарк прогноза на один день по всем парам Магазин+Товар.
+
+Сравнивает прежний путь (лаги через groupby().transform(lambda ...),
+encoding_futures -> set_training_df -> model_predict по pandas DataFrame ->
+декодирование Магазин/Товар) с текущим Use_model_predict (векторные окна,
+InferenceEngine: Pool из непрерывных массивов, пакетное предсказание).
+Прежний путь закреплен в бенчмарке (legacy_*) и в Use_model_predict не входит.
+
+Запуск:
+    python -m benchmarks.bench_predict --shops 50 --products 400
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import catboost as cb
+
+from First_model_learning import First_learning_model
+from Next_model_predict import Use_model_predict
+from Inference_engine import InferenceEngine
+from Preprocessing import Preprocessing_data
+from Categorical_codebook import CategoricalCodebook
+from Feature_scaling import FeatureScaler, feature_matrix
+from benchmarks.synthetic_data import make_recovery_frame, to_dataframe_names
+
+
+def train_small_model(df_history, iterations, scale_features=True):
+    """Обучает небольшую модель тем же пайплайном признаков, что и First_learning_model."""
+    learner = First_learning_model()
+    df = learner.first_data_type_refactor(df_history)
+    df = learner.add_lag_values(df)
+    (df_encoding, numerical_columns, cat_columns, *encoders) = learner.encoding_futures(df, scale_features=scale_features)
+    model = cb.CatBoostRegressor(
+        iterations=iterations,
+        loss_function='Huber:delta=0.5',
+        verbose=0,
+        random_state=42,
+        allow_writing_files=False,
+    )
+    train_pool = learner.make_pool(df_encoding, df_encoding['Продажи_7д_вперёд'], numerical_columns, cat_columns, encoders[-1])
+    model.fit(train_pool)
+    return model, encoders
+
+
+def legacy_add_lag_values(df_first, df_next):
+    """Прежняя реализация Use_model_predict.add_lag_values (с копиями и lambda-окнами)."""
+    df_first_copy = df_first.copy().rename(columns={'Заказы_правка': 'Смоделированные_заказы'})
+    df_next_copy = df_next.copy()
+    processor = Preprocessing_data()
+    df_first_copy = processor.rename_columns(df_first_copy)
+    df_next_copy = processor.rename_columns(df_next_copy)
+    df_first_copy['Дата'] = pd.to_datetime(df_first_copy['Дата'])
+    df_next_copy['Дата'] = pd.to_datetime(df_next_copy['Дата'])
+    first_date = df_next_copy['Дата'].min()
+    df_first_copy = df_first_copy[df_first_copy['Дата'] < first_date]
+
+    df = pd.concat([df_first_copy, df_next_copy], ignore_index=True)
+    df = df.sort_values(by=['Магазин', 'Товар', 'Дата'])
+    df = df.drop_duplicates(subset=['Магазин', 'Товар', 'Дата'])
+
+    lags = {'Продано_правка': 'Продано', 'Поступило_правка': 'Поступило', 'Остаток_правка': 'Остаток',
+            'Смоделированные_заказы': 'Заказ', 'ПроданоСеть': 'ПроданоСеть', 'ПоступилоСеть': 'ПоступилоСеть',
+            'ОстатокСеть': 'ОстатокСеть', 'КоличествоЧековСеть': 'КоличествоЧековСеть'}
+    for column, name in lags.items():
+        df[f'{name}_1д_назад'] = df.groupby(['Магазин', 'Товар'])[column].shift(1)
+
+    for column, name in (('Продано_правка', 'Продано'), ('ПроданоСеть', 'ПроданоСеть')):
+        df[f'{name}_частота'] = df.groupby(['Магазин', 'Товар'])[column].transform(lambda x: (x > 0).astype(int).shift(1))
+        for window in (3, 7, 21):
+            df[f'{name}_частота_{window}д'] = df.groupby(['Магазин', 'Товар'])[f'{name}_частота'].transform(
+                lambda x: x.rolling(window=window, min_periods=window).sum())
+        for window in (3, 7, 21):
+            df[f'{name}_темп_{window}д'] = df.groupby(['Магазин', 'Товар'])[column].transform(
+                lambda x: x.rolling(window=window, min_periods=window).mean().shift(1))
+
+    df = df.drop(['Продано_частота', 'ПроданоСеть_частота', 'Продано', 'Поступило', 'Остаток',
+                  'КоличествоЧеков', 'Заказ', 'Пуассон_распр', 'Медианный_лаг_в_днях'], axis=1)
+    df = df[df['Дата'] >= first_date]
+    return df.drop(columns=['Заказы_правка'], errors='ignore').dropna()
+
+
+def legacy_encoding(df, encoders):
+    """Прежний Use_model_predict.encoding_futures: кодирование и масштабирование в копии DataFrame"""
+    *label_encoders, scaler = encoders
+    df_encoding = df.copy()
+    encod_columns = Use_model_predict.encod_columns
+    df_encoding[encod_columns] = df_encoding[encod_columns].astype(str)
+
+    codes = {}
+    mask = np.ones(len(df_encoding), dtype=bool)
+    for col, encoder in zip(encod_columns, label_encoders):
+        codes[col], known = CategoricalCodebook.from_encoder(encoder).encode(df_encoding[col])
+        mask &= known
+    df_encoding = df_encoding[mask]
+    for col in encod_columns:
+        df_encoding[col] = codes[col][mask]
+
+    numerical_columns = list(Use_model_predict.numerical_columns)
+    scaler = FeatureScaler.from_scaler(scaler, numerical_columns)
+    df_encoding[numerical_columns] = scaler.transform(feature_matrix(df_encoding, numerical_columns))
+    return df_encoding
+
+
+def legacy_predict(df_with_lags, encoders, model):
+    """
+    Прежний путь прогноза Use_model_predict: encoding_futures -> set_training_df ->
+    model_predict по DataFrame -> view_results_refactor_values.
+    """
+    label_encoder_product, label_encoder_shop = encoders[0], encoders[1]
+    df_encoding = legacy_encoding(df_with_lags, encoders)
+    columns = Use_model_predict.numerical_columns + Use_model_predict.cat_columns
+
+    df_predict = df_encoding[columns].dropna()
+    result_preduction = df_encoding[['Дата', 'Магазин', 'Товар']].copy()
+    y_pred = model.predict(df_predict)
+
+    result_preduction['Предсказанные значения'] = np.round(np.clip(y_pred, 0, None)).astype(int)
+    result_preduction['Товар'] = (CategoricalCodebook.from_encoder(label_encoder_product)
+                                  .decode(result_preduction['Товар'].to_numpy()))
+    result_preduction['Магазин'] = (CategoricalCodebook.from_encoder(label_encoder_shop)
+                                    .decode(result_preduction['Магазин'].to_numpy()))
+    return result_preduction
+
+
+def engine_predict(predictor, df_with_lags, encoders, model, thread_count, batch_size):
+    num_matrix, cat_values, result_predict = predictor.prepare_inference_data(df_with_lags, *encoders)
+    engine = InferenceEngine(model, predictor.numerical_columns, predictor.cat_columns,
+                             thread_count=thread_count, batch_size=batch_size)
+    y_pred = engine.predict_arrays(num_matrix, cat_values)
+    result_predict['Предсказанные значения'] = np.round(np.clip(y_pred, 0, None)).astype(int)
+    return result_predict
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=20)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--days', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--thread-count', type=int, default=-1)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df_all = make_recovery_frame(args.shops, args.products, args.days + 1)
+    last_date = df_all['Дата'].max()
+    df_history = df_all[df_all['Дата'] < last_date]
+    df_next = to_dataframe_names(df_all[df_all['Дата'] == last_date])
+
+    model, encoders = train_small_model(df_history, args.iterations)
+
+    predictor = Use_model_predict()
+    df_season_sales = df_history[df_history['Дата'] >= last_date - np.timedelta64(30, 'D')]
+
+    def legacy_full():
+        df_with_lags = legacy_add_lag_values(df_season_sales, df_next)
+        return legacy_predict(df_with_lags, encoders, model)
+
+    def current_full():
+        df_with_lags = predictor.add_lag_values(df_season_sales, df_next)
+        return engine_predict(predictor, df_with_lags, encoders, model, args.thread_count, args.batch_size)
+
+    df_with_lags = predictor.add_lag_values(df_season_sales, df_next)
+    print(f"Пар для прогноза: {len(df_with_lags)}")
+
+    legacy_time, legacy_result = best_of(legacy_full, args.repeat)
+    engine_time, engine_result = best_of(current_full, args.repeat)
+    legacy_stage, _ = best_of(lambda: legacy_predict(df_with_lags, encoders, model), args.repeat)
+    engine_stage, _ = best_of(
+        lambda: engine_predict(predictor, df_with_lags, encoders, model, args.thread_count, args.batch_size),
+        args.repeat)
+
+    columns = ['Дата', 'Магазин', 'Товар', 'Предсказанные значения']
+    same = legacy_result[columns].reset_index(drop=True).equals(engine_result[columns].reset_index(drop=True))
+
+    print(f"Прогноз на день целиком: прежний путь {legacy_time * 1000:.1f} мс, "
+          f"текущий {engine_time * 1000:.1f} мс, ускорение {legacy_time / engine_time:.1f}x")
+    print(f"Кодирование и предсказание: прежний путь {legacy_stage * 1000:.1f} мс, "
+          f"InferenceEngine {engine_stage * 1000:.1f} мс, ускорение {legacy_stage / engine_stage:.1f}x")
+    print(f"Результаты совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк первичной предобработки истории продаж.
+
+Сравнивает прежний first_preprocess_data (копия истории на каждом шаге,
+merge при отборе пар, сезонности и погоды, apply по строкам) с текущим:
+статистика пар за один проход и обработка истории одной частью или
+группами магазинов. Прежние отбор пар и определение сезонности
+закреплены в бенчмарке (legacy_clining_data, legacy_define_the_season) и
+не зависят от текущего кода. Пиковая память измеряется через tracemalloc
+(сверх входного DataFrame), результаты сравниваются на совпадение.
+Погода подставляется синтетическая, запросов к API нет.
+
+Запуск:
+    python -m benchmarks.bench_preprocess --shops 50 --products 200 --days 400
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from Preprocessing import Preprocessing_data
+from benchmarks.synthetic_data import make_recovery_frame
+
+ORIGIN_COLUMNS = ['Дата', 'Магазин', 'Товар', 'Цена', 'Акция', 'Выходной', 'Категория', 'ПотребГруппа', 'МНН',
+                  'Продано_шт', 'Остаток_шт', 'Поступило_шт', 'Заказ_шт', 'КоличествоЧеков',
+                  'ПроданоСеть_шт', 'ОстатокСеть_шт', 'ПоступилоСеть_шт', 'КоличествоЧековСеть_шт']
+
+
+class OfflinePreprocessing(Preprocessing_data):
+    """Предобработка с синтетической погодой вместо запроса к API"""
+
+    def fetch_daily_weather(self, start, end):
+        days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+        return pd.DataFrame({
+            'Температура (°C)': np.round(10 * np.sin(np.arange(len(days)) / 58), 1),
+            'Давление (мм рт. ст.)': np.round(750 + 5 * np.cos(np.arange(len(days)) / 7), 1)
+        }, index=days)
+
+
+def legacy_clining_data(df):
+    """Preprocessing_data.clining_data исходной версии: отбор пар через два merge"""
+    cutoff_date = df['Дата'].max() - pd.Timedelta(days=365)
+    recent_sales = df[(df['Дата'] >= cutoff_date) & (df['Продано'] > 0)]
+    active_pairs = recent_sales[['Магазин', 'Товар']].drop_duplicates()
+    df = df.merge(active_pairs, on=['Магазин', 'Товар'], how='inner').copy()
+
+    sold_sum = df.groupby(['Магазин', 'Товар'])['Продано'].sum().reset_index()
+    good_groups = sold_sum[sold_sum['Продано'] > 6]
+    return df.merge(good_groups[['Магазин', 'Товар']], on=['Магазин', 'Товар'], how='inner').copy()
+
+
+def legacy_define_the_season(df):
+    """Preprocessing_data.define_the_season исходной версии: groupby/unstack и merge сезонности"""
+    def get_season(month):
+        if month in [12, 1, 2]:
+            return 'Зима'
+        elif month in [3, 4, 5]:
+            return 'Весна'
+        elif month in [6, 7, 8]:
+            return 'Лето'
+        return 'Осень'
+
+    df['Сезон'] = df['Месяц'].apply(get_season)
+    season_summary = (df.groupby(['Магазин', 'Товар', 'Сезон'])['Продано']
+                      .sum().unstack(fill_value=0).reset_index())
+    season_cols = ['Зима', 'Весна', 'Лето', 'Осень']
+    season_summary['Всего'] = season_summary[season_cols].sum(axis=1)
+    shares = season_summary[season_cols].div(season_summary['Всего'], axis=0)
+    season_summary['Сезонность'] = (shares.idxmax(axis=1)
+                                    .where(shares.max(axis=1) >= 0.51, 'Несезонный'))
+    df = df.merge(season_summary[['Магазин', 'Товар', 'Сезонность']], on=['Магазин', 'Товар'], how='left')
+    return df.drop(['Сезон'], axis=1, errors='ignore')
+
+
+def legacy_first_preprocess(processor, df):
+    """Прежний Preprocessing_data.first_preprocess_data"""
+    df_copy = processor.rename_columns(df.copy())
+    df_copy['Цена'] = df_copy.groupby(['Магазин', 'Товар'])['Цена'].transform(processor.fill_zero_prices)
+    df_copy = df_copy.dropna(subset=['Цена'])
+    df_non_negative_values = processor.non_negative_values(df_copy)
+    df_parse_dates = processor.parse_dates(df_non_negative_values)
+    df_cleaning = legacy_clining_data(df_parse_dates)
+    df_define = legacy_define_the_season(df_cleaning)
+    df_define['Сезонность_точн'] = df_define.apply(processor.check_season, axis=1)
+    df_temp = processor.add_weather_data(df_define)
+    if 'key_0' in df_temp.columns:
+        df_temp = df_temp.drop('key_0', axis=1)
+    return processor.data_type_refactor(df_temp).sort_values(by=['Дата', 'Магазин', 'Товар'])
+
+
+def measure(func):
+    """Время выполнения и пиковая память (МБ) сверх уже выделенной"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=50)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--days', type=int, default=400)
+    parser.add_argument('--chunk-stores', type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_recovery_frame(args.shops, args.products, args.days)[ORIGIN_COLUMNS]
+    df['Дата'] = df['Дата'].dt.date
+    input_mb = df.memory_usage(deep=True).sum() / 2 ** 20
+    processor = OfflinePreprocessing()
+
+    cases = [
+        ('прежний', lambda: legacy_first_preprocess(processor, df)),
+        ('одной частью', lambda: processor.first_preprocess_data(df)),
+        (f'по {args.chunk_stores} магазинов', lambda: processor.first_preprocess_data(df, chunk_stores=args.chunk_stores)),
+    ]
+    results = []
+    for name, func in cases:
+        result, seconds, peak_mb = measure(func)
+        results.append(result.reset_index(drop=True))
+        print(f"{name:20s} {seconds:7.2f} с, пик памяти {peak_mb:7.0f} МБ")
+
+    same = all(results[0].equals(result) for result in results[1:])
+    print(f"Строк: {len(df)} -> {len(results[0])}, вход {input_mb:.0f} МБ, результаты совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк восстановления продаж моделями пар.
+
+Сравнивает прежний цикл по парам (маска пары по всему DataFrame, новый
+ColumnTransformer из OneHotEncoder и StandardScaler на каждую пару) с
+матрицей признаков RecoveryDesignMatrix, построенной один раз: модели пар
+обучаются на срезах строк CSR. Для PoissonRegressor фиксируется
+np.random.seed, восстановленные продажи сравниваются на совпадение.
+
+Запуск:
+    python -m benchmarks.bench_recovery --shops 10 --products 40 --days 365
+"""
+import time
+import argparse
+import warnings
+import numpy as np
+import lightgbm as lgb
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.pipeline import Pipeline
+from sklearn.linear_model import PoissonRegressor
+
+from Sales_recovery import (Recovery_sales, RECOVERY_CATEGORICAL_FEATURES, RECOVERY_NUMERICAL_FEATURES,
+                            RECOVERY_STRING_FEATURES)
+from benchmarks.synthetic_data import make_recovery_frame
+
+LGB_PARAMS = {'objective': 'poisson', 'metric': 'poisson', 'num_leaves': 31,
+              'learning_rate': 0.05, 'n_estimators': 100, 'verbose': -1}
+
+
+def legacy_recover(data, make_regressor, to_sales):
+    """Прежний enhance_poison_sales / enhance_non_poison_sales"""
+    data = data.copy()
+    data['Продано_правка'] = data['Продано']
+    for column in RECOVERY_STRING_FEATURES:
+        data[column] = data[column].astype(str)
+    features = RECOVERY_CATEGORICAL_FEATURES + RECOVERY_NUMERICAL_FEATURES
+
+    for _, (shop, product) in data[['Магазин', 'Товар']].drop_duplicates().iterrows():
+        subset = data[(data['Магазин'] == shop) & (data['Товар'] == product)]
+        condition_modify = (subset['Продано'] == 0) & (subset['Остаток'] == 0) & (subset['Поступило'] == 0)
+        nonzero_sales, zero_sales = subset[~condition_modify], subset[condition_modify]
+        if len(zero_sales) == 0:
+            continue
+        try:
+            model = Pipeline([
+                ('preprocessor', ColumnTransformer(transformers=[
+                    ('cat', OneHotEncoder(handle_unknown='ignore'), RECOVERY_CATEGORICAL_FEATURES),
+                    ('num', StandardScaler(), RECOVERY_NUMERICAL_FEATURES)
+                ])),
+                ('regressor', make_regressor())
+            ])
+            model.fit(nonzero_sales[features], nonzero_sales['Продано'].clip(lower=0))
+            data.loc[zero_sales.index, 'Продано_правка'] = to_sales(model.predict(zero_sales[features]))
+        except Exception:
+            continue
+    return data
+
+
+def timed(func):
+    np.random.seed(0)
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=10)
+    parser.add_argument('--products', type=int, default=40)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--zero-share', type=float, default=0.2,
+                        help='Доля строк без продаж, остатка и поступлений')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    recovery = Recovery_sales()
+    df = recovery.first_data_type_refactor(make_recovery_frame(args.shops, args.products, args.days))
+    zero_rows = np.random.default_rng(1).random(len(df)) < args.zero_share
+    df.loc[zero_rows, ['Продано', 'Остаток', 'Поступило']] = 0
+    df = recovery.use_poison_check(df)
+
+    cases = [
+        ('PoissonRegressor', df[df['Пуассон_распр'] == True],
+         lambda: PoissonRegressor(alpha=0.5, max_iter=2000),
+         lambda predicted: np.random.poisson(np.maximum(predicted, 0)),
+         recovery.enhance_poison_sales),
+        ('LightGBM', df[df['Пуассон_распр'] == False],
+         lambda: lgb.LGBMRegressor(**LGB_PARAMS),
+         lambda predicted: np.round(np.maximum(predicted, 0)).astype(int),
+         recovery.enhance_non_poison_sales),
+    ]
+    print(f"Пар: {args.shops * args.products}, строк: {len(df)}")
+    for name, data, make_regressor, to_sales, enhance in cases:
+        expected, legacy_seconds = timed(lambda: legacy_recover(data, make_regressor, to_sales))
+        result, seconds = timed(lambda: enhance(data))
+        print(f"{name:17s} строк {len(data):8d}: прежний {legacy_seconds:6.2f} с, "
+              f"матрица признаков {seconds:6.2f} с, совпадают: {expected.equals(result)}")
+
+
+if __name__ == '__main__':
+    main()
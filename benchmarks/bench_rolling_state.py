@@ -0,0 +1,67 @@
+"""
+Бенчмарк ежедневного расчета лаговых признаков.
+
+Для одного нового дня сравнивается пересчет окон по истории
+(Use_model_predict.add_lag_values по восстановленным данным глубиной
+--days) с добавлением дня в RollingState (кольцевые буферы последних
+21 значения пар) и расчетом признаков следующего дня по буферам.
+Время пересчета растет с глубиной истории, время обновления состояния
+зависит только от количества пар. Признаки сравниваются на совпадение.
+
+Запуск:
+    python -m benchmarks.bench_rolling_state --shops 50 --products 200 --days 30 90 180
+"""
+import time
+import argparse
+import pandas as pd
+
+from Feature_store import LAG_FEATURES, RollingState
+from Next_model_predict import Use_model_predict
+from benchmarks.synthetic_data import make_recovery_frame, to_dataframe_names
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=50)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 180])
+    args = parser.parse_args()
+
+    predictor = Use_model_predict()
+    print(f"Пар: {args.shops * args.products}")
+    for days in args.days:
+        df = make_recovery_frame(args.shops, args.products, days + 2)
+        dates = sorted(df['Дата'].unique())
+        history = df[df['Дата'] < dates[-2]]
+        new_day = to_dataframe_names(df[df['Дата'] == dates[-2]])
+        next_day = to_dataframe_names(df[df['Дата'] == dates[-1]])
+
+        # Признаки следующего дня после new_day: пересчет по истории
+        recomputed, recompute_seconds = timed(lambda: predictor.add_lag_values(
+            pd.concat([history, df[df['Дата'] == dates[-2]]]), next_day))
+
+        state = RollingState.from_history(history)
+        blob = state.to_bytes()
+
+        def update():
+            restored = RollingState.from_bytes(blob)
+            restored.append(new_day)
+            return restored.features()
+
+        features, update_seconds = timed(update)
+
+        expected = (recomputed[['Магазин', 'Товар'] + LAG_FEATURES]
+                    .sort_values(by=['Магазин', 'Товар']).reset_index(drop=True))
+        same = expected.equals(features[['Магазин', 'Товар'] + LAG_FEATURES].astype(expected.dtypes.to_dict()))
+        print(f"история {days:4d} дн.: пересчет {recompute_seconds * 1000:7.0f} мс, "
+              f"состояние {update_seconds * 1000:7.0f} мс ({len(blob) / 2 ** 20:.1f} МБ), совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Бенчмарк масштабирования числовых признаков.
+
+Сравнивает MinMaxScaler (float64-копия блока и запись по столбцам в DataFrame)
+с FeatureScaler (масштабирование float32-матрицы на месте) и проверяет,
+что модель, обученная без масштабирования (scale_features=False),
+дает ту же точность, что и модель с масштабированием.
+
+Запуск:
+    python -m benchmarks.bench_scaling --iterations 300
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from First_model_learning import First_learning_model
+from Feature_scaling import FeatureScaler, feature_matrix
+from benchmarks.bench_predict import train_small_model
+from benchmarks.synthetic_data import make_recovery_frame
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shops', type=int, default=10)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--test-days', type=int, default=14)
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df_all = make_recovery_frame(args.shops, args.products, args.days)
+    learner = First_learning_model()
+    df = learner.add_lag_values(learner.first_data_type_refactor(df_all))
+    (df_encoding, numerical_columns, cat_columns, *encoders) = learner.encoding_futures(df)
+
+    # Скорость масштабирования
+    df_legacy = df_encoding.copy()
+
+    def legacy_scaling():
+        df_legacy[numerical_columns] = MinMaxScaler().fit_transform(df_legacy[numerical_columns])
+
+    def matrix_scaling():
+        FeatureScaler(numerical_columns).fit_transform(feature_matrix(df_encoding, numerical_columns))
+
+    legacy_time = best_of(legacy_scaling, args.repeat)
+    matrix_time = best_of(matrix_scaling, args.repeat)
+
+    legacy_values = MinMaxScaler().fit_transform(df_encoding[numerical_columns])
+    matrix_values = FeatureScaler(numerical_columns).fit_transform(feature_matrix(df_encoding, numerical_columns))
+    scaling_diff = np.abs(legacy_values - matrix_values).max()
+
+    # Точность с масштабированием и без него
+    split_date = df_all['Дата'].max() - np.timedelta64(args.test_days, 'D')
+    df_train = df_all[df_all['Дата'] <= split_date]
+
+    metrics = {}
+    predictions = {}
+    for scale_features in (True, False):
+        model, model_encoders = train_small_model(df_train, args.iterations, scale_features=scale_features)
+        (df_eval, _, _, *_) = learner.encoding_futures(df, scale_features=scale_features)
+        df_eval = df_eval[df_eval['Дата'] > split_date]
+        pool = learner.make_pool(df_eval, None, numerical_columns, cat_columns, model_encoders[-1])
+        y_true = df_eval['Продажи_7д_вперёд'].to_numpy()
+        y_pred = model.predict(pool)
+        predictions[scale_features] = y_pred
+        metrics[scale_features] = (np.sqrt(mean_squared_error(y_true, y_pred)), mean_absolute_error(y_true, y_pred))
+
+    prediction_diff = np.abs(predictions[True] - predictions[False]).max()
+
+    print(f"Строк: {len(df_encoding)}, числовых признаков: {len(numerical_columns)}")
+    print(f"Масштабирование: MinMaxScaler {legacy_time * 1000:.1f} мс, FeatureScaler {matrix_time * 1000:.1f} мс, "
+          f"ускорение {legacy_time / matrix_time:.1f}x, макс. расхождение {scaling_diff:.2e}")
+    print(f"С масштабированием: RMSE {metrics[True][0]:.4f}, MAE {metrics[True][1]:.4f}")
+    print(f"Без масштабирования: RMSE {metrics[False][0]:.4f}, MAE {metrics[False][1]:.4f}")
+    print(f"Макс. расхождение предсказаний: {prediction_diff:.2e}")
+    print(f"Точность совпадает: {np.allclose(metrics[True], metrics[False], rtol=1e-3)}")
+
+
+if __name__ == '__main__':
+    main()
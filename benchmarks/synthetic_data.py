@@ -0,0 +1,106 @@
+"""
+Генерация синтетических данных для бенчмарков.
+Формирует датафреймы в формате таблиц Исходные_данные_продаж и
+Восстановленные_данные_продаж (названия столбцов как в БД).
+"""
+import numpy as np
+import pandas as pd
+
+
+def make_recovery_frame(n_shops=20, n_products=200, n_days=60, start_date='2024-01-01', seed=42):
+    """
+    Создает датафрейм в формате таблицы Восстановленные_данные_продаж.
+
+    Args:
+        n_shops: Количество магазинов
+        n_products: Количество товаров
+        n_days: Количество дней истории
+        start_date: Первая дата истории
+        seed: Зерно генератора случайных чисел
+
+    Returns:
+        pd.DataFrame: Синтетические восстановленные данные
+    """
+    rng = np.random.default_rng(seed)
+
+    dates = pd.date_range(start_date, periods=n_days, freq='D')
+    shops = np.array([f'Аптека_{i}' for i in range(n_shops)], dtype=object)
+    products = np.array([f'Товар_{i}' for i in range(n_products)], dtype=object)
+
+    n_pairs = n_shops * n_products
+    n_rows = n_pairs * n_days
+
+    date_col = np.tile(dates.values, n_pairs)
+    shop_col = np.repeat(shops, n_products * n_days)
+    product_col = np.tile(np.repeat(products, n_days), n_shops)
+
+    product_idx = np.tile(np.repeat(np.arange(n_products), n_days), n_shops)
+    categories = np.array([f'Категория_{i}' for i in range(10)], dtype=object)
+    groups = np.array([f'Группа_{i}' for i in range(25)], dtype=object)
+    mnn = np.array([f'МНН_{i}' for i in range(60)], dtype=object)
+    seasons = np.array(['Зима', 'Весна', 'Лето', 'Осень', 'Несезонный'], dtype=object)
+
+    pair_rate = rng.gamma(1.5, 1.0, n_pairs)
+    rate = np.repeat(pair_rate, n_days)
+    sold = rng.poisson(rate)
+    stock = rng.poisson(rate * 5)
+    received = rng.poisson(rate * 0.8)
+    orders = rng.poisson(rate * 0.8)
+    network_sold = rng.poisson(rate * n_shops)
+
+    date_index = pd.DatetimeIndex(date_col)
+
+    df = pd.DataFrame({
+        'Дата': date_col,
+        'Магазин': shop_col,
+        'Товар': product_col,
+        'Цена': np.round(rng.uniform(50, 2000, n_rows), 2),
+        'Акция': rng.random(n_rows) < 0.1,
+        'Выходной': date_index.dayofweek >= 5,
+        'Категория': categories[product_idx % len(categories)],
+        'ПотребГруппа': groups[product_idx % len(groups)],
+        'МНН': mnn[product_idx % len(mnn)],
+        'Продано_шт': sold,
+        'Остаток_шт': stock,
+        'Поступило_шт': received,
+        'Заказ_шт': orders,
+        'КоличествоЧеков': sold + rng.poisson(1.0, n_rows),
+        'ПроданоСеть_шт': network_sold,
+        'ОстатокСеть_шт': network_sold * 5,
+        'ПоступилоСеть_шт': rng.poisson(rate * n_shops * 0.8),
+        'КоличествоЧековСеть_шт': network_sold + rng.poisson(5.0, n_rows),
+        'ДеньНедели': date_index.dayofweek,
+        'День': date_index.day,
+        'Месяц': date_index.month,
+        'Год': date_index.year,
+        'Пуассон_распр': np.repeat(rng.random(n_pairs) < 0.5, n_days),
+        'Сезонность': seasons[product_idx % len(seasons)],
+        'Сезонность_точн': rng.random(n_rows) < 0.3,
+        'Температура (°C)': np.round(rng.normal(0, 15, n_rows), 1),
+        'Давление (мм рт. ст.)': np.round(rng.normal(750, 5, n_rows), 1),
+        'Медианный_лаг_в_днях': 2.0,
+        'Продано_правка': sold,
+        'Заказы_правка': orders,
+        'Поступило_правка': received,
+        'Остаток_правка': stock,
+    })
+
+    return df.sort_values(by=['Дата', 'Магазин', 'Товар']).reset_index(drop=True)
+
+
+def to_dataframe_names(df_recovery):
+    """
+    Переводит восстановленные данные из названий столбцов БД в названия,
+    с которыми работает пайплайн (как после Recovery_sales.next_full_sales_recovery).
+    """
+    return df_recovery.rename(columns={
+        'Продано_шт': 'Продано',
+        'Остаток_шт': 'Остаток',
+        'Поступило_шт': 'Поступило',
+        'Заказ_шт': 'Заказ',
+        'ПроданоСеть_шт': 'ПроданоСеть',
+        'ОстатокСеть_шт': 'ОстатокСеть',
+        'ПоступилоСеть_шт': 'ПоступилоСеть',
+        'КоличествоЧековСеть_шт': 'КоличествоЧековСеть',
+        'Заказы_правка': 'Смоделированные_заказы',
+    })
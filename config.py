@@ -1,18 +1,38 @@
 """
 Конфигурационный модуль для управления настройками приложения.
 Все секреты и конфигурации загружаются из переменных окружения.
+
+Разделы настроек вычисляются лениво при первом обращении (settings.db,
+settings.sftp, ...) и кэшируются: импорт модуля не читает .env, не ищет
+SSH ключ и не требует переменных БД. Прежние имена DB_CONFIG, SFTP_CONFIG
+и т.д. доступны через from config import ... и вычисляют только свой раздел.
 """
 import os
+import threading
+from functools import cached_property
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Dict, Any
+from urllib.parse import quote_plus
 import logging
 
 # Настройка логирования для config модуля
 logger = logging.getLogger(__name__)
 
-# Загружаем переменные окружения из .env файла
-load_dotenv('.env')
+# Переменные окружения из .env файла загружаются один раз, при первом чтении переменной
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env(env_file: str = '.env') -> None:
+    """Загружает переменные окружения из .env файла (повторные вызовы ничего не делают)"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv(env_file)
+            _env_loaded = True
 
 
 def get_required_env(name: str) -> str:
@@ -28,6 +48,7 @@ def get_required_env(name: str) -> str:
     Raises:
         ValueError: Если переменная не найдена
     """
+    load_env()
     value = os.getenv(name)
     if value is None:
         raise ValueError(f"Environment variable {name} is required but not set")
@@ -45,6 +66,7 @@ def get_optional_env(name: str, default: Any = None) -> Any:
     Returns:
         Значение переменной или значение по умолчанию
     """
+    load_env()
     return os.getenv(name, default)
 
 
@@ -156,44 +178,219 @@ def get_ssh_key_path() -> str:
     raise FileNotFoundError(f"No SSH key found for {env_type} environment")
 
 
-# Конфигурация подключения к базе данных
-DB_CONFIG: Dict[str, Any] = {
-    'db_host': get_required_env('DB_HOST'),
-    'db_port': int(get_required_env('DB_PORT')),
-    'db_name': get_required_env('DB_NAME'),
-    'db_user': get_required_env('DB_USER'),
-    'db_password': get_required_env('DB_PASSWORD')
-}
+class Settings:
+    """
+    Настройки приложения по разделам.
 
-# Конфигурация SFTP
-try:
-    SFTP_CONFIG: Dict[str, Any] = {
-        'host': get_required_env('SFTP_HOST'),
-        'port': int(get_optional_env('SFTP_PORT', '22')),
-        'username': get_required_env('SFTP_USERNAME'),
-        'key_filename': get_ssh_key_path()
-    }
-except (FileNotFoundError, ValueError) as e:
-    # SFTP конфигурация может быть опциональной
-    SFTP_CONFIG: Dict[str, Any] = {
-        'host': get_optional_env('SFTP_HOST', ''),
-        'port': int(get_optional_env('SFTP_PORT', '22')),
-        'username': get_optional_env('SFTP_USERNAME', ''),
-        'key_filename': None
-    }
-
-# Конфигурация приложения
-APP_CONFIG: Dict[str, Any] = {
-    'host': get_optional_env('APP_HOST', '0.0.0.0'),
-    'port': int(get_optional_env('APP_PORT', '8000'))
-}
+    Каждый раздел - словарь, который вычисляется из переменных окружения
+    при первом обращении к атрибуту и кэшируется на время жизни процесса.
+    Ошибка в переменных одного раздела (например, нет DB_HOST) проявляется
+    при обращении к этому разделу, а не при импорте модуля.
+    """
+
+    @cached_property
+    def db(self) -> Dict[str, Any]:
+        """Конфигурация подключения к базе данных"""
+        return {
+            'db_host': get_required_env('DB_HOST'),
+            'db_port': int(get_required_env('DB_PORT')),
+            'db_name': get_required_env('DB_NAME'),
+            'db_user': get_required_env('DB_USER'),
+            'db_password': get_required_env('DB_PASSWORD')
+        }
+
+    @cached_property
+    def sftp(self) -> Dict[str, Any]:
+        """Конфигурация SFTP; поиск SSH ключа (и запись временного файла ключа) - только здесь"""
+        try:
+            return {
+                'host': get_required_env('SFTP_HOST'),
+                'port': int(get_optional_env('SFTP_PORT', '22')),
+                'username': get_required_env('SFTP_USERNAME'),
+                'key_filename': get_ssh_key_path()
+            }
+        except (FileNotFoundError, ValueError) as e:
+            # SFTP конфигурация может быть опциональной
+            return {
+                'host': get_optional_env('SFTP_HOST', ''),
+                'port': int(get_optional_env('SFTP_PORT', '22')),
+                'username': get_optional_env('SFTP_USERNAME', ''),
+                'key_filename': None
+            }
+
+    @cached_property
+    def ingest(self) -> Dict[str, Any]:
+        """Пакетная загрузка исходных данных с SFTP (/model-train/load-origin-batch)"""
+        return {
+            # Количество SFTP каналов в общем транспорте, файлы загружаются и разбираются параллельно
+            'workers': int(get_optional_env('SFTP_BATCH_WORKERS', '4')),
+            'max_files': int(get_optional_env('SFTP_BATCH_MAX_FILES', '1000'))
+        }
+
+    @cached_property
+    def watcher(self) -> Dict[str, Any]:
+        """Наблюдение за директорией SFTP: новые файлы автоматически проходят конвейер прогноза"""
+        return {
+            'enabled': get_optional_env('SFTP_WATCH_ENABLED', 'false').lower() == 'true',
+            'directory': get_optional_env('SFTP_WATCH_DIRECTORY', '/'),
+            'pattern': get_optional_env('SFTP_WATCH_PATTERN', '*.csv'),
+            'interval': float(get_optional_env('SFTP_WATCH_INTERVAL', '30')),
+            # Файл без изменений дольше settle_seconds считается полностью загруженным на сервер
+            'settle_seconds': float(get_optional_env('SFTP_WATCH_SETTLE_SECONDS', '30')),
+            'max_concurrent': int(get_optional_env('SFTP_WATCH_MAX_CONCURRENT', '1')),
+            'max_attempts': int(get_optional_env('SFTP_WATCH_MAX_ATTEMPTS', '3')),
+            # Директория на SFTP для файлов прогноза forecast_<имя файла>; пусто - только запись в БД
+            'output_directory': get_optional_env('SFTP_WATCH_OUTPUT_DIRECTORY', ''),
+            # Формат файлов прогноза: csv, csv.gz или parquet
+            'output_format': get_optional_env('SFTP_WATCH_OUTPUT_FORMAT', 'csv')
+        }
+
+    @cached_property
+    def app(self) -> Dict[str, Any]:
+        """Конфигурация приложения"""
+        return {
+            'host': get_optional_env('APP_HOST', '0.0.0.0'),
+            'port': int(get_optional_env('APP_PORT', '8000'))
+        }
+
+    @cached_property
+    def data(self) -> Dict[str, Any]:
+        """Конфигурация путей к локальным файлам (опционально, только для локальной разработки)"""
+        return {
+            'train_data_path': get_optional_env('TRAIN_DATA_PATH', 'data/train_df.csv'),
+            'test_data_path': get_optional_env('TEST_DATA_PATH', 'data/test_df.csv')
+        }
+
+    @cached_property
+    def predict(self) -> Dict[str, Any]:
+        """Конфигурация предсказания модели"""
+        return {
+            'thread_count': int(get_optional_env('PREDICT_THREAD_COUNT', '-1')),
+            'batch_size': int(get_optional_env('PREDICT_BATCH_SIZE', '100000'))
+        }
+
+    @cached_property
+    def preprocess(self) -> Dict[str, Any]:
+        """Предобработка истории продаж (/model-train/clean-data)"""
+        return {
+            # Количество магазинов в части истории: части читаются из БД, обрабатываются
+            # и записываются по очереди, память не зависит от длины истории; 0 - вся история сразу
+            'chunk_stores': int(get_optional_env('PREPROCESS_CHUNK_STORES', '0'))
+        }
+
+    @cached_property
+    def executor(self) -> Dict[str, Any]:
+        """Пулы потоков для блокирующих этапов API: SFTP и БД - io, pandas и CatBoost - cpu"""
+        return {
+            'io_workers': int(get_optional_env('API_IO_WORKERS', '8')),
+            # Количество одновременно выполняемых тяжелых этапов (обучение, прогноз, предобработка)
+            'cpu_workers': int(get_optional_env('API_CPU_WORKERS', '1'))
+        }
+
+    @cached_property
+    def forecast(self) -> Dict[str, Any]:
+        """Конфигурация чтения прогнозов (/model-predict/forecast)"""
+        return {
+            # Количество ключей (Дата, Магазин) в LRU-кэше прогнозов процесса
+            'cache_entries': int(get_optional_env('FORECAST_CACHE_ENTRIES', '20000')),
+            'max_page_size': int(get_optional_env('FORECAST_MAX_PAGE_SIZE', '100000')),
+            # Количество строк, получаемых серверным курсором за раз при потоковой выгрузке
+            'fetch_size': int(get_optional_env('FORECAST_FETCH_SIZE', '10000'))
+        }
+
+    @cached_property
+    def train(self) -> Dict[str, Any]:
+        """Конфигурация обучения модели"""
+        return {
+            # CatBoost нечувствителен к монотонному масштабированию признаков
+            'scale_features': get_optional_env('TRAIN_SCALE_FEATURES', 'true').lower() == 'true',
+            'thread_count': int(get_optional_env('TRAIN_THREAD_COUNT', '-1')),
+            # Ограничение памяти CatBoost, например '8gb'; пусто - без ограничения
+            'used_ram_limit': get_optional_env('TRAIN_RAM_LIMIT', '') or None,
+            'border_count': int(get_optional_env('TRAIN_BORDER_COUNT', '254')),
+            # Директория кэша квантованных пулов; пусто - пул квантуется при каждом обучении
+            'pool_cache_dir': get_optional_env('TRAIN_POOL_CACHE_DIR', '') or None,
+            # Дообучение (mode=incremental): итерации, проверочные дни и допустимое ухудшение RMSE
+            'incremental_iterations': int(get_optional_env('TRAIN_INCREMENTAL_ITERATIONS', '300')),
+            'validation_days': int(get_optional_env('TRAIN_VALIDATION_DAYS', '7')),
+            'max_degradation': float(get_optional_env('TRAIN_MAX_DEGRADATION', '0.05'))
+        }
+
+    @cached_property
+    def tuning(self) -> Dict[str, Any]:
+        """Конфигурация подбора гиперпараметров (mode=tune)"""
+        return {
+            'storage': get_optuna_storage(),
+            'study_name': get_optional_env('TUNING_STUDY_NAME', 'catboost_sales'),
+            'n_trials': int(get_optional_env('TUNING_N_TRIALS', '50')),
+            # Бюджет времени на весь подбор, секунды
+            'timeout': int(get_optional_env('TUNING_TIMEOUT', '3600')),
+            'n_jobs': int(get_optional_env('TUNING_N_JOBS', '2')),
+            # Доля пар Магазин+Товар для испытаний на подвыборке
+            'subsample': float(get_optional_env('TUNING_SUBSAMPLE', '0.2')),
+            'trial_iterations': int(get_optional_env('TUNING_TRIAL_ITERATIONS', '1000'))
+        }
+
+    @cached_property
+    def segment(self) -> Dict[str, Any]:
+        """Конфигурация сегментированного обучения (mode=segmented)"""
+        return {
+            # Категориальный признак для разбиения: Категория, Магазин, ПотребГруппа и т.п.
+            'segment_column': get_optional_env('SEGMENT_COLUMN', 'Категория'),
+            # JSON-файл {значение признака: сегмент}, например магазин -> кластер; пусто - сегмент на значение
+            'segment_map_file': get_optional_env('SEGMENT_MAP_FILE', '') or None,
+            'min_segment_rows': int(get_optional_env('SEGMENT_MIN_ROWS', '10000')),
+            'n_jobs': int(get_optional_env('SEGMENT_N_JOBS', '2'))
+        }
+
+    @cached_property
+    def log_level(self) -> str:
+        """Конфигурация логирования"""
+        return get_optional_env('LOG_LEVEL', 'INFO').upper()
+
+
+def get_optuna_storage() -> str:
+    """
+    URL RDB-хранилища Optuna для параллельного подбора гиперпараметров.
+
+    Returns:
+        OPTUNA_STORAGE, если задан; иначе SQLite-файл локально
+        и PostgreSQL из settings.db в stage/prod
+    """
+    storage = get_optional_env('OPTUNA_STORAGE')
+    if storage:
+        return storage
+
+    if get_optional_env('ENV_TYPE', 'local').lower() == 'local':
+        return 'sqlite:///optuna.db'
+
+    db_config = settings.db
+    return (f"postgresql+psycopg2://{quote_plus(db_config['db_user'])}:{quote_plus(db_config['db_password'])}"
+            f"@{db_config['db_host']}:{db_config['db_port']}/{db_config['db_name']}")
+
+
+settings = Settings()
 
-# Конфигурация путей к локальным файлам (опционально, только для локальной разработки)
-DATA_CONFIG: Dict[str, Any] = {
-    'train_data_path': get_optional_env('TRAIN_DATA_PATH', 'data/train_df.csv'),
-    'test_data_path': get_optional_env('TEST_DATA_PATH', 'data/test_df.csv')
+# Прежние имена разделов: from config import DB_CONFIG вычисляет только раздел db
+_LEGACY_NAMES = {
+    'DB_CONFIG': 'db',
+    'SFTP_CONFIG': 'sftp',
+    'INGEST_CONFIG': 'ingest',
+    'WATCHER_CONFIG': 'watcher',
+    'APP_CONFIG': 'app',
+    'DATA_CONFIG': 'data',
+    'PREDICT_CONFIG': 'predict',
+    'PREPROCESS_CONFIG': 'preprocess',
+    'EXECUTOR_CONFIG': 'executor',
+    'FORECAST_CONFIG': 'forecast',
+    'TRAIN_CONFIG': 'train',
+    'TUNING_CONFIG': 'tuning',
+    'SEGMENT_CONFIG': 'segment',
+    'LOG_LEVEL': 'log_level',
 }
 
-# Конфигурация логирования
-LOG_LEVEL = get_optional_env('LOG_LEVEL', 'INFO').upper()
 
+def __getattr__(name: str) -> Any:
+    if name in _LEGACY_NAMES:
+        return getattr(settings, _LEGACY_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
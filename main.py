@@ -3,31 +3,78 @@ FastAPI приложение для прогнозирования продаж.
 Основной модуль с API эндпоинтами для обучения и использования модели.
 """
 import logging
-from typing import Optional
-from fastapi import FastAPI, APIRouter, HTTPException
+import datetime
+import importlib
+import posixpath
+from contextlib import asynccontextmanager
+from typing import Optional, List
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 import uvicorn
 
-from Preprocessing import Preprocessing_data
-from Sales_recovery import Recovery_sales
-from First_model_learning import First_learning_model
-from Next_model_predict import Use_model_predict
-from DB_operations import DataLoader, get_db_connection, Last30DaysExtractor, DataExtractor
+from Preprocessing import Preprocessing_data, STATISTICS_COLUMNS
+from DB_operations import DataLoader, get_db_connection, Last30DaysExtractor, DataExtractor, ProcessedFilesRegistry, SeasonalityStorage
+from Feature_store import LagFeatureStore
 from SFTP_Connector import SFTPDataLoader
+from Batch_ingestion import BatchIngestor
+from SFTP_watcher import SFTPWatcher
+from Forecast_cache import ForecastReader, forecast_cache, decode_cursor, iter_json, iter_csv
+from Task_executors import BlockingExecutors
 from main_local import create_tables
-from config import DB_CONFIG, SFTP_CONFIG, APP_CONFIG, LOG_LEVEL
+from config import settings
 
 # Настройка логирования
 logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    level=getattr(logging, settings.log_level, logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+forecast_cache.configure(settings.forecast['cache_entries'])
+
+# Пулы для блокирующих этапов: SFTP и БД - io, pandas и CatBoost - cpu
+executors = BlockingExecutors(**settings.executor)
+
+
+async def _import_stage(module_name, name):
+    """
+    Класс этапа конвейера из модуля с тяжелыми зависимостями (catboost, lightgbm,
+    sklearn, optuna). Модуль импортируется при первом вызове эндпоинта в пуле io,
+    а не при старте приложения, поэтому холодный старт и healthcheck их не ждут.
+    """
+    module = await executors.run_io(importlib.import_module, module_name)
+    return getattr(module, name)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    watcher = None
+    watcher_config = settings.watcher
+    if watcher_config['enabled']:
+        output_directory = watcher_config['output_directory']
+        if output_directory and (output_directory.rstrip('/') or '/') == (watcher_config['directory'].rstrip('/') or '/'):
+            raise ValueError("SFTP_WATCH_OUTPUT_DIRECTORY должна отличаться от SFTP_WATCH_DIRECTORY: "
+                             "файлы прогноза иначе будут обработаны как новые данные")
+        watcher = app.state.watcher = SFTPWatcher(
+            lambda: SFTPDataLoader(settings.sftp),
+            ProcessedFilesRegistry(get_db()),
+            _predict_watched_file,
+            run_blocking=executors.run_io,
+            **{key: value for key, value in watcher_config.items() if key not in ('enabled', 'output_directory', 'output_format')}
+        )
+        watcher.start()
+    yield
+    if watcher is not None:
+        await watcher.stop()
+    executors.shutdown(wait=False)
+
+
 # Инициализация FastAPI приложения
 app = FastAPI(
     title="Sales Forecasting API",
     description="API для прогнозирования продаж",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Создание роутеров
@@ -38,10 +85,10 @@ router_predict = APIRouter(prefix="/model-predict", tags=["Model Prediction"])
 
 def get_db():
     """Получает подключение к базе данных."""
-    return get_db_connection(DB_CONFIG)
+    return get_db_connection(settings.db)
 
 @router_main.get("/")
-def root():
+async def root():
     """Главная страница с информацией о доступных эндпоинтах."""
     return {
         "message": "API для прогнозирования продаж",
@@ -49,21 +96,24 @@ def root():
         "endpoints": {
             "create_tables": "/main/create-tables",
             "sftp_list_files": "/main/list-files",
+            "sftp_watcher": "/main/watcher",
             "load_origin_data": "/model-train/load-origin-data",
+            "load_origin_batch": "/model-train/load-origin-batch",
             "clean_data": "/model-train/clean-data",
             "recover_data": "/model-train/recover-data",
             "train_model": "/model-train/train-model",
             "predict_new_data": "/model-predict/predict-new-data",
+            "forecast": "/model-predict/forecast",
         }
     }
 
 @router_main.post("/create-tables")
-def create_tables_route():
+async def create_tables_route():
     """Эндпоинт для создания таблиц в базе данных."""
     try:
         logger.info("Создание таблиц в базе данных...")
         db = get_db()
-        create_tables(db)
+        await executors.run_io(create_tables, db)
         logger.info("Таблицы успешно созданы")
         return {"message": "Таблицы успешно созданы в базе данных!"}
     except Exception as e:
@@ -71,7 +121,7 @@ def create_tables_route():
         raise HTTPException(status_code=500, detail=f"Ошибка при создании таблиц: {str(e)}")
 
 @router_main.get("/list-files")
-def list_sftp_files(remote_directory: str = "/"):
+async def list_sftp_files(remote_directory: str = "/"):
     """
     Получение списка файлов на SFTP сервере.
     
@@ -80,13 +130,13 @@ def list_sftp_files(remote_directory: str = "/"):
     """
     try:
         logger.info(f"Получение списка файлов из директории: {remote_directory}")
-        sftp_loader = SFTPDataLoader(SFTP_CONFIG)
+        sftp_loader = SFTPDataLoader(settings.sftp)
         
-        if not sftp_loader.connect():
+        if not await executors.run_io(sftp_loader.connect):
             raise HTTPException(status_code=500, detail="Не удалось подключиться к SFTP серверу")
         
         try:
-            files = sftp_loader.list_available_files(remote_directory)
+            files = await executors.run_io(sftp_loader.list_available_files, remote_directory)
             
             if not files:
                 # Если файлов нет, возвращаем информативное сообщение
@@ -106,7 +156,7 @@ def list_sftp_files(remote_directory: str = "/"):
                 "total_files": len(files)
             }
         finally:
-            sftp_loader.disconnect()
+            await executors.run_io(sftp_loader.disconnect)
             
     except HTTPException:
         raise
@@ -114,20 +164,28 @@ def list_sftp_files(remote_directory: str = "/"):
         logger.error(f"Ошибка при получении списка файлов: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ошибка при получении списка файлов: {str(e)}")
 
+@router_main.get("/watcher")
+async def watcher_status(request: Request):
+    """Состояние наблюдателя SFTP директории (SFTP_WATCH_ENABLED)."""
+    watcher = getattr(request.app.state, 'watcher', None)
+    if watcher is None:
+        return {"running": False, "message": "Наблюдение за SFTP директорией отключено"}
+    return watcher.status()
+
 @router_train.post("/load-origin-data")
-def load_data_train(remote_file_path: str):
+async def load_data_train(remote_file_path: str):
     """Эндпоинт для загрузки данных с SFTP сервера в базу данных."""
     try:
         logger.info(f"Загрузка данных с SFTP: {remote_file_path}")
         # 1. Подключаемся к SFTP и загружаем данные
-        sftp_loader = SFTPDataLoader(SFTP_CONFIG)
+        sftp_loader = SFTPDataLoader(settings.sftp)
         
-        if not sftp_loader.connect():
+        if not await executors.run_io(sftp_loader.connect):
             raise HTTPException(status_code=500, detail="Не удалось подключиться к SFTP серверу")
         
         try:
             # Загружаем данные с SFTP
-            df_first = sftp_loader.load_new_data_from_sftp(remote_file_path)
+            df_first = await executors.run_io(sftp_loader.load_new_data_from_sftp, remote_file_path)
             
             if df_first is None:
                 raise HTTPException(
@@ -140,7 +198,7 @@ def load_data_train(remote_file_path: str):
             data_loader = DataLoader(db)
             
             # 3. Загружаем данные в БД
-            data_loader.load_to_origin_table(df_first, batch_size=100000)
+            await executors.run_io(data_loader.load_to_origin_table, df_first, batch_size=100000)
             logger.info(f"Загружено {len(df_first)} строк в базу данных")
             
             return {
@@ -151,7 +209,7 @@ def load_data_train(remote_file_path: str):
             }
             
         finally:
-            sftp_loader.disconnect()
+            await executors.run_io(sftp_loader.disconnect)
             
     except HTTPException:
         raise
@@ -159,30 +217,121 @@ def load_data_train(remote_file_path: str):
         logger.error(f"Ошибка при загрузке данных: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке данных: {str(e)}")
 
+@router_train.post("/load-origin-batch")
+async def load_data_train_batch(remote_pattern: str, check_existing: bool = False):
+    """
+    Эндпоинт для пакетной загрузки файлов с SFTP сервера в базу данных.
+    remote_pattern - директория (все CSV файлы) или шаблон, например /data/sales_2024-*.csv.
+    Файлы загружаются параллельно в одной SFTP сессии, каждый записывается отдельной транзакцией.
+    """
+    try:
+        logger.info(f"Пакетная загрузка данных с SFTP: {remote_pattern}")
+        sftp_loader = SFTPDataLoader(settings.sftp)
+
+        if not await executors.run_io(sftp_loader.connect):
+            raise HTTPException(status_code=500, detail="Не удалось подключиться к SFTP серверу")
+
+        try:
+            ingestor = BatchIngestor(sftp_loader, DataLoader(get_db()), **settings.ingest)
+            try:
+                files = await executors.run_io(ingestor.match_files, remote_pattern)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not files:
+                raise HTTPException(status_code=404, detail=f"Под шаблон {remote_pattern} не подходит ни один файл")
+
+            report = await executors.run_io(ingestor.ingest, remote_pattern, check_existing=check_existing)
+        finally:
+            await executors.run_io(sftp_loader.disconnect)
+
+        failed = [item['file'] for item in report if item['status'] == 'failed']
+        return {
+            "message": "Пакетная загрузка исходных данных завершена" if not failed
+            else "Пакетная загрузка завершена с ошибками",
+            "remote_pattern": remote_pattern,
+            "files_total": len(report),
+            "files_loaded": len(report) - len(failed),
+            "files_failed": len(failed),
+            "rows_loaded": sum(item['rows_loaded'] for item in report),
+            "files": report
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при пакетной загрузке данных: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Ошибка при пакетной загрузке данных: {str(e)}")
+
+async def _clean_data_by_stores(db, chunk_stores):
+    """
+    Очистка истории по группам из chunk_stores магазинов. Первый проход читает
+    только столбцы STATISTICS_COLUMNS и считает статистику пар, второй читает,
+    обрабатывает и записывает в Обогащённые_данные_продаж одну группу за раз.
+
+    Returns:
+        int: Количество записанных строк
+    """
+    table_name = "Исходные_данные_продаж"
+    data_extractor = DataExtractor(db)
+    data_loader = DataLoader(db)
+    processor = Preprocessing_data()
+
+    stores = await executors.run_io(data_extractor.fetch_distinct_values, table_name, 'Магазин')
+    groups = processor.store_groups(stores, chunk_stores)
+    logger.info(f"Очистка по частям: магазинов {len(stores)}, частей {len(groups)}")
+
+    def store_filter(group):
+        return ('"Магазин" = ANY(%s)', [list(group)])
+
+    statistics = []
+    for group in groups:
+        df_part = await executors.run_io(data_extractor.fetch_origin_data, STATISTICS_COLUMNS, store_filter(group))
+        statistics.append(await executors.run_cpu(processor.pair_statistics, df_part))
+    # Запрос погоды за весь период выполняется один раз
+    plan = await executors.run_io(processor.plan_first_preprocess, statistics)
+    await executors.run_io(SeasonalityStorage(db).save, processor.seasonality_table(plan['seasonality']))
+
+    rows = 0
+    for number, group in enumerate(groups, start=1):
+        df_part = await executors.run_io(data_extractor.fetch_origin_data, where=store_filter(group))
+        df_clean = await executors.run_cpu(processor.first_preprocess_chunk, df_part, plan)
+        del df_part
+        await executors.run_io(data_loader.load_to_enriched_table, df_clean, batch_size=100000)
+        rows += len(df_clean)
+        logger.info(f"Часть {number}/{len(groups)}: записано {len(df_clean)} строк")
+    return rows
+
 @router_train.post("/clean-data")
-def clean_data_train():
+async def clean_data_train():
     """Эндпоинт для очистки данных (первичная обработка)."""
     try:
         logger.info("Начало очистки данных...")
-        # Получение полных данных из локальной БД
         db = get_db()
-        data_extractor = DataExtractor(db)
-        df_first = data_extractor.fetch_origin_data()
-        logger.info(f"Загружено {len(df_first)} строк исходных данных")
+        chunk_stores = settings.preprocess['chunk_stores']
+        if chunk_stores > 0:
+            rows = await _clean_data_by_stores(db, chunk_stores)
+        else:
+            # Получение из локальной БД истории пар, оставшихся в ассортименте
+            # (отбор пар plan_first_preprocess выполняется в запросе)
+            data_extractor = DataExtractor(db)
+            df_first = await executors.run_io(data_extractor.fetch_active_origin_data)
+            logger.info(f"Загружено {len(df_first)} строк исходных данных")
 
-        # Очистка данных
-        processor = Preprocessing_data()
-        df_clean = processor.first_preprocess_data(df_first)
+            # Очистка данных
+            processor = Preprocessing_data()
+            df_clean = await executors.run_cpu(processor.first_preprocess_data, df_first)
 
-        # Загрузка очищенных данных в локальную БД
-        logger.info("Загрузка очищенных данных в локальную БД...")
-        data_loader = DataLoader(db)
-        data_loader.load_to_enriched_table(df_clean, batch_size=100000)
-        logger.info(f"Очищенные данные успешно загружены: {len(df_clean)} строк")
+            # Загрузка очищенных данных в локальную БД
+            logger.info("Загрузка очищенных данных в локальную БД...")
+            data_loader = DataLoader(db)
+            await executors.run_io(data_loader.load_to_enriched_table, df_clean, batch_size=100000)
+            await executors.run_io(SeasonalityStorage(db).save, processor.seasonality_table(df_clean))
+            rows = len(df_clean)
+        logger.info(f"Очищенные данные успешно загружены: {rows} строк")
 
         return {
             "message": "Данные успешно очищены и загружены в БД!",
-            "rows": len(df_clean),
+            "rows": rows,
             "database": "Данные сохранены в таблицу enriched_data"
         }
     except Exception as e:
@@ -190,24 +339,26 @@ def clean_data_train():
         raise HTTPException(status_code=500, detail=f"Ошибка при очистке данных: {str(e)}")
 
 @router_train.post("/recover-data")
-def recover_data_train():
+async def recover_data_train():
     """Эндпоинт для восстановления данных."""
     try:
         logger.info("Начало восстановления данных...")
         # Получение полных данных из локальной БД
         db = get_db()
         data_extractor = DataExtractor(db)
-        df_clean = data_extractor.fetch_enriched_data()
+        df_clean = await executors.run_io(data_extractor.fetch_enriched_data)
         logger.info(f"Загружено {len(df_clean)} строк обогащенных данных")
 
         # Восстановление данных
+        Recovery_sales = await _import_stage('Sales_recovery', 'Recovery_sales')
         sales_recovery = Recovery_sales()
-        df_recovery = sales_recovery.first_full_sales_recovery(df_clean)
+        df_recovery = await executors.run_cpu(sales_recovery.first_full_sales_recovery, df_clean)
 
         # Загрузка данных в локальную БД
         logger.info("Загрузка восстановленных данных в локальную БД...")
         data_loader = DataLoader(db)
-        data_loader.load_to_recovery_table(df_recovery, batch_size=100000)
+        await executors.run_io(data_loader.load_to_recovery_table, df_recovery, batch_size=100000)
+        await executors.run_io(LagFeatureStore(db).update, df_recovery)
         logger.info(f"Восстановленные данные успешно загружены: {len(df_recovery)} строк")
 
         return {
@@ -220,19 +371,82 @@ def recover_data_train():
         raise HTTPException(status_code=500, detail=f"Ошибка при восстановлении данных: {str(e)}")
 
 @router_train.post("/train-model")
-def train_model():
-    """Эндпоинт для обучения модели."""
+async def train_model(
+    thread_count: Optional[int] = None,
+    used_ram_limit: Optional[str] = None,
+    border_count: Optional[int] = None,
+    use_pool_cache: bool = True,
+    mode: str = "full",
+    segment_column: Optional[str] = None
+):
+    """
+    Эндпоинт для обучения модели.
+
+    Args:
+        thread_count: Количество потоков CatBoost (по умолчанию TRAIN_THREAD_COUNT)
+        used_ram_limit: Ограничение памяти CatBoost, например 8gb (по умолчанию TRAIN_RAM_LIMIT)
+        border_count: Количество границ квантования (по умолчанию TRAIN_BORDER_COUNT)
+        use_pool_cache: Использовать кэш квантованных пулов из TRAIN_POOL_CACHE_DIR
+        mode: full - полное обучение, incremental - дообучение последней модели на новых днях
+            (при новых магазинах/товарах автоматически выполняется полное обучение),
+            tune - подбор гиперпараметров Optuna (TUNING_*) и полное обучение с лучшими параметрами,
+            segmented - отдельная модель для каждого сегмента (SEGMENT_*), обучаемая в пуле процессов
+        segment_column: Признак сегментации для mode=segmented (по умолчанию SEGMENT_COLUMN)
+    """
+    if mode not in ("full", "incremental", "tune", "segmented"):
+        raise HTTPException(status_code=400, detail=f"Неизвестный режим обучения: {mode}. Допустимые: full, incremental, tune, segmented")
+
     try:
-        logger.info("Начало обучения модели...")
-        # Получение полных данных из локальной БД
+        logger.info(f"Начало обучения модели (режим {mode})...")
         db = get_db()
+        First_learning_model = await _import_stage('First_model_learning', 'First_learning_model')
+        first_model_learn = First_learning_model()
+        train_params = dict(
+            scale_features=settings.train['scale_features'],
+            thread_count=thread_count if thread_count is not None else settings.train['thread_count'],
+            used_ram_limit=used_ram_limit or settings.train['used_ram_limit'],
+            border_count=border_count or settings.train['border_count'],
+            pool_cache_dir=settings.train['pool_cache_dir'] if use_pool_cache else None
+        )
+
+        # Для дообучения достаточно истории от даты отсечения модели, иначе - полные данные
         data_extractor = DataExtractor(db)
-        df_recovery = data_extractor.fetch_recovery_data()
+        history_start = None
+        if mode == "incremental":
+            history_start = await executors.run_io(first_model_learn.incremental_history_start, db)
+        if history_start is not None:
+            df_recovery = await executors.run_io(data_extractor.fetch_recovery_data,
+                                                 where=('"Дата" >= %s', [history_start.date()]))
+        else:
+            df_recovery = await executors.run_io(data_extractor.fetch_recovery_data)
         logger.info(f"Загружено {len(df_recovery)} строк восстановленных данных")
 
-        # Обучение модели
-        first_model_learn = First_learning_model()
-        df_preduction = first_model_learn.first_learning_model(df_recovery, db)
+        # Обучение модели (вместе с сохранением модели и метрик) - в пуле cpu
+        if mode == "incremental":
+            df_preduction = await executors.run_cpu(
+                first_model_learn.incremental_learning_model,
+                df_recovery, db,
+                iterations=settings.train['incremental_iterations'],
+                validation_days=settings.train['validation_days'],
+                max_degradation=settings.train['max_degradation'],
+                **train_params
+            )
+        elif mode == "tune":
+            CatBoostTuner = await _import_stage('Hyperparameter_tuning', 'CatBoostTuner')
+            tuner = CatBoostTuner(**settings.tuning)
+            df_preduction = await executors.run_cpu(first_model_learn.first_learning_model,
+                                                    df_recovery, db, tuner=tuner, **train_params)
+        elif mode == "segmented":
+            segment_params = dict(settings.segment)
+            if segment_column:
+                segment_params.update(segment_column=segment_column, segment_map_file=None)
+            SegmentedTrainer = await _import_stage('Segmented_models', 'SegmentedTrainer')
+            segmentation = SegmentedTrainer(**segment_params)
+            df_preduction = await executors.run_cpu(first_model_learn.first_learning_model,
+                                                    df_recovery, db, segmentation=segmentation, **train_params)
+        else:
+            df_preduction = await executors.run_cpu(first_model_learn.first_learning_model,
+                                                    df_recovery, db, **train_params)
         logger.info(f"Модель обучена, создано {len(df_preduction)} предсказаний")
 
         return {
@@ -245,11 +459,114 @@ def train_model():
         raise HTTPException(status_code=500, detail=f"Ошибка при обучении модели: {str(e)}")
 
 
+async def _connect_sftp():
+    """Подключается к SFTP серверу; сессия используется и для загрузки данных, и для выгрузки прогноза"""
+    sftp_loader = SFTPDataLoader(settings.sftp)
+    if not await executors.run_io(sftp_loader.connect):
+        raise ConnectionError("Не удалось подключиться к SFTP серверу")
+    return sftp_loader
+
+
+async def _load_sftp_file(sftp_loader, remote_file_path):
+    """Загружает файл исходных данных с SFTP сервера (None, если файл не загружен)"""
+    df_next = await executors.run_io(sftp_loader.load_new_data_from_sftp, remote_file_path)
+    if df_next is not None:
+        logger.info(f"Загружено {len(df_next)} строк с SFTP сервера")
+    return df_next
+
+
+async def _run_prediction(df_next, db):
+    """
+    Конвейер прогноза для новых исходных данных: запись в Исходные_данные_продаж,
+    предобработка, восстановление продаж, прогноз и запись в таблицу Прогноз.
+    """
+    Recovery_sales = await _import_stage('Sales_recovery', 'Recovery_sales')
+    Use_model_predict = await _import_stage('Next_model_predict', 'Use_model_predict')
+    processor = Preprocessing_data()
+    sales_recovery = Recovery_sales()
+    use_model_prediction = Use_model_predict()
+    data_loader = DataLoader(db)
+
+    # Загружаем в таблицу origin_data
+    logger.info("Загрузка данных в таблицу origin_data...")
+    await executors.run_io(data_loader.load_to_origin_table, df_next, batch_size=100000)
+
+    # Получаем данные за последние 30 дней
+    logger.info("Получение данных за последние 30 дней...")
+    df_last_30_days_origin, df_last_30_days_recovery = await executors.run_io(_get_last_30_days_data, db)
+    seasonality = await executors.run_io(SeasonalityStorage(db).load)
+
+    # Очищаем данные
+    logger.info("Предобработка данных...")
+    df_clean = await executors.run_cpu(processor.next_preprocess_data,
+                                       df_last_30_days_origin, df_next, df_last_30_days_recovery, seasonality)
+
+    # Загружаем в таблицу enriched_data
+    logger.info("Загрузка данных в таблицу enriched_data...")
+    await executors.run_io(data_loader.load_to_enriched_table, df_clean, batch_size=100000)
+
+    # Восстанавливаем продажи
+    logger.info("Восстановление продаж...")
+    df_recovery = await executors.run_cpu(
+        sales_recovery.next_full_sales_recovery,
+        df_last_30_days_origin, df_clean, df_last_30_days_recovery
+    )
+
+    # Загружаем в таблицу recovery_data
+    logger.info("Загрузка данных в таблицу recovery_data...")
+    await executors.run_io(data_loader.load_to_recovery_table, df_recovery, batch_size=100000)
+
+    # Лаговые признаки новых строк сохранены при предыдущем восстановлении;
+    # признаки следующего дня пересчитываются по новым строкам
+    lag_store = LagFeatureStore(db)
+    lag_features = await executors.run_io(lag_store.load, df_recovery)
+    await executors.run_io(lag_store.update, df_last_30_days_recovery, df_recovery)
+
+    # Делаем прогноз
+    logger.info("Выполнение прогноза...")
+    df_preduction = await executors.run_cpu(
+        use_model_prediction.use_model_predict,
+        df_last_30_days_origin, df_recovery, df_last_30_days_recovery, db,
+        thread_count=settings.predict['thread_count'],
+        batch_size=settings.predict['batch_size'],
+        lag_features=lag_features
+    )
+
+    # Загружаем в таблицу forecast_data
+    logger.info("Загрузка прогноза в таблицу forecast_data...")
+    await executors.run_io(data_loader.load_to_forecast_table, df_preduction, batch_size=100000)
+    logger.info(f"Прогноз успешно создан для {len(df_preduction)} записей")
+    return df_preduction
+
+
+async def _predict_watched_file(remote_file_path):
+    """Обработка файла, найденного наблюдателем SFTP: прогноз и (опционально) выгрузка результата"""
+    sftp_loader = await _connect_sftp()
+    try:
+        df_next = await _load_sftp_file(sftp_loader, remote_file_path)
+        if df_next is None:
+            raise ValueError(f"Не удалось загрузить файл {remote_file_path} с SFTP сервера")
+        df_preduction = await _run_prediction(df_next, get_db())
+
+        output_directory = settings.watcher['output_directory']
+        if output_directory:
+            output_format = settings.watcher['output_format']
+            name = posixpath.splitext(posixpath.basename(remote_file_path))[0]
+            output_path = posixpath.join(output_directory, f"forecast_{name}.{output_format}")
+            if not await executors.run_io(sftp_loader.upload_predictions_to_sftp, df_preduction, output_path,
+                                          file_format=output_format):
+                raise IOError(f"Не удалось выгрузить прогноз на SFTP: {output_path}")
+        return len(df_preduction)
+    finally:
+        await executors.run_io(sftp_loader.disconnect)
+
+
 @router_predict.post("/predict-new-data")
-def data_predict(
+async def data_predict(
     remote_file_path: str,
     upload_to_sftp: bool = False,
-    sftp_output_path: Optional[str] = None
+    sftp_output_path: Optional[str] = None,
+    output_format: str = "csv"
 ):
     """
     Эндпоинт для прогнозирования с данными с SFTP сервера.
@@ -258,100 +575,56 @@ def data_predict(
         remote_file_path: Путь к файлу на SFTP сервере (обязательный)
         upload_to_sftp: Загружать ли результат на SFTP сервер
         sftp_output_path: Путь для сохранения результата на SFTP сервере (обязателен если upload_to_sftp=True)
+        output_format: Формат файла результата: csv, csv.gz или parquet
     """
+    if upload_to_sftp and not sftp_output_path:
+        raise HTTPException(
+            status_code=400,
+            detail="sftp_output_path обязателен, если upload_to_sftp=True"
+        )
+    if output_format not in ("csv", "csv.gz", "parquet"):
+        raise HTTPException(status_code=400,
+                            detail=f"Неизвестный формат: {output_format}. Допустимые: csv, csv.gz, parquet")
+    
     try:
         logger.info(f"Начало прогнозирования для файла: {remote_file_path}")
-        db = get_db()
-        processor = Preprocessing_data()
-        sales_recovery = Recovery_sales()
-        use_model_prediction = Use_model_predict()
-        data_loader = DataLoader(db)
-        
-        # Загружаем данные с SFTP сервера
-        sftp_loader = SFTPDataLoader(SFTP_CONFIG)
-        if not sftp_loader.connect():
-            raise HTTPException(status_code=500, detail="Не удалось подключиться к SFTP серверу")
+        try:
+            sftp_loader = await _connect_sftp()
+        except ConnectionError as e:
+            raise HTTPException(status_code=500, detail=str(e))
         
+        # Сессия SFTP остается открытой до выгрузки результата (keepalive)
         try:
-            df_next = sftp_loader.load_new_data_from_sftp(remote_file_path)
+            df_next = await _load_sftp_file(sftp_loader, remote_file_path)
             if df_next is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Не удалось загрузить файл {remote_file_path} с SFTP сервера"
                 )
-            logger.info(f"Загружено {len(df_next)} строк с SFTP сервера")
-        finally:
-            sftp_loader.disconnect()
-        
-        # Загружаем в таблицу origin_data
-        logger.info("Загрузка данных в таблицу origin_data...")
-        data_loader.load_to_origin_table(df_next, batch_size=100000)
-        
-        # Получаем данные за последние 30 дней
-        logger.info("Получение данных за последние 30 дней...")
-        df_last_30_days_origin, df_last_30_days_recovery = _get_last_30_days_data(db)
-        
-        # Очищаем данные
-        logger.info("Предобработка данных...")
-        df_clean = processor.next_preprocess_data(df_last_30_days_origin, df_next, df_last_30_days_recovery)
-        
-        # Загружаем в таблицу enriched_data
-        logger.info("Загрузка данных в таблицу enriched_data...")
-        data_loader.load_to_enriched_table(df_clean, batch_size=100000)
-        
-        # Восстанавливаем продажи
-        logger.info("Восстановление продаж...")
-        df_recovery = sales_recovery.next_full_sales_recovery(
-            df_last_30_days_origin, df_clean, df_last_30_days_recovery
-        )
-        
-        # Загружаем в таблицу recovery_data
-        logger.info("Загрузка данных в таблицу recovery_data...")
-        data_loader.load_to_recovery_table(df_recovery, batch_size=100000)
-        
-        # Делаем прогноз
-        logger.info("Выполнение прогноза...")
-        df_preduction = use_model_prediction.use_model_predict(
-            df_last_30_days_origin, df_recovery, df_last_30_days_recovery, db
-        )
-        
-        # Загружаем в таблицу forecast_data
-        logger.info("Загрузка прогноза в таблицу forecast_data...")
-        data_loader.load_to_forecast_table(df_preduction, batch_size=100000)
-        logger.info(f"Прогноз успешно создан для {len(df_preduction)} записей")
-        
-        # Загружаем результат на SFTP сервер (если требуется)
-        result = {
-            "message": "Прогноз успешно сделан и данные загружены в БД",
-            "rows": len(df_preduction),
-            "database": "Данные сохранены в таблицу forecast_data"
-        }
-        
-        if upload_to_sftp:
-            if not sftp_output_path:
-                raise HTTPException(
-                    status_code=400,
-                    detail="sftp_output_path обязателен, если upload_to_sftp=True"
-                )
+            df_preduction = await _run_prediction(df_next, get_db())
             
-            try:
-                logger.info(f"Загрузка результатов на SFTP: {sftp_output_path}")
-                sftp_loader = SFTPDataLoader(SFTP_CONFIG)
-                if sftp_loader.connect():
-                    try:
-                        success = sftp_loader.upload_predictions_to_sftp(df_preduction, sftp_output_path)
-                        if success:
-                            result["sftp"] = f"Результат загружен на SFTP: {sftp_output_path}"
-                            result["message"] = "Прогноз успешно сделан, данные загружены в БД и на SFTP сервер"
-                        else:
-                            result["sftp_error"] = "Не удалось загрузить на SFTP сервер"
-                    finally:
-                        sftp_loader.disconnect()
-                else:
-                    result["sftp_error"] = "Не удалось подключиться к SFTP серверу"
-            except Exception as sftp_error:
-                logger.error(f"Ошибка при загрузке на SFTP: {sftp_error}", exc_info=True)
-                result["sftp_error"] = str(sftp_error)
+            # Загружаем результат на SFTP сервер (если требуется)
+            result = {
+                "message": "Прогноз успешно сделан и данные загружены в БД",
+                "rows": len(df_preduction),
+                "database": "Данные сохранены в таблицу forecast_data"
+            }
+            
+            if upload_to_sftp:
+                try:
+                    logger.info(f"Загрузка результатов на SFTP: {sftp_output_path}")
+                    success = await executors.run_io(sftp_loader.upload_predictions_to_sftp,
+                                                     df_preduction, sftp_output_path, file_format=output_format)
+                    if success:
+                        result["sftp"] = f"Результат загружен на SFTP: {sftp_output_path}"
+                        result["message"] = "Прогноз успешно сделан, данные загружены в БД и на SFTP сервер"
+                    else:
+                        result["sftp_error"] = "Не удалось загрузить на SFTP сервер"
+                except Exception as sftp_error:
+                    logger.error(f"Ошибка при загрузке на SFTP: {sftp_error}", exc_info=True)
+                    result["sftp_error"] = str(sftp_error)
+        finally:
+            await executors.run_io(sftp_loader.disconnect)
         
         return result
         
@@ -362,6 +635,66 @@ def data_predict(
         raise HTTPException(status_code=500, detail=f"Ошибка при прогнозировании: {str(e)}")
 
 
+@router_predict.get("/forecast")
+async def read_forecast(
+    store: Optional[List[str]] = Query(None),
+    product: Optional[List[str]] = Query(None),
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    format: str = "json",
+    limit: int = 1000,
+    cursor: Optional[str] = None
+):
+    """
+    Чтение прогнозов из таблицы Прогноз.
+
+    Args:
+        store: Магазины (параметр можно повторять), по умолчанию все
+        product: Товары (параметр можно повторять), по умолчанию все
+        date_from: Первая дата прогноза (включительно)
+        date_to: Последняя дата прогноза (включительно)
+        format: json или csv
+        limit: Размер страницы (не больше FORECAST_MAX_PAGE_SIZE); 0 - вся выборка потоком без страниц
+        cursor: Курсор следующей страницы из next_cursor / заголовка X-Next-Cursor
+    """
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}. Допустимые: json, csv")
+    if limit < 0 or limit > settings.forecast['max_page_size']:
+        raise HTTPException(status_code=400,
+                            detail=f"limit должен быть от 0 до {settings.forecast['max_page_size']}")
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from не может быть позже date_to")
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        reader = ForecastReader(get_db(), fetch_size=settings.forecast['fetch_size'])
+        filters = dict(stores=store, products=product, date_from=date_from, date_to=date_to, after=after)
+
+        headers = {}
+        if limit:
+            # Страница читается до ответа: ошибки БД возвращаются кодом 500
+            rows, next_cursor = await executors.run_io(reader.read_page, limit, **filters)
+            if next_cursor:
+                headers["X-Next-Cursor"] = next_cursor
+        else:
+            rows, next_cursor = reader.iter_rows(**filters), None
+
+        # Части ответа формируются в пуле io: чтение серверным курсором не блокирует event loop
+        if format == "csv":
+            headers["Content-Disposition"] = 'attachment; filename="forecast.csv"'
+            return StreamingResponse(executors.iterate_io(iter_csv(rows)),
+                                     media_type="text/csv; charset=utf-8", headers=headers)
+        return StreamingResponse(executors.iterate_io(iter_json(rows, next_cursor)),
+                                 media_type="application/json", headers=headers)
+    except Exception as e:
+        logger.error(f"Ошибка при чтении прогноза: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Ошибка при чтении прогноза: {str(e)}")
+
+
 def _get_last_30_days_data(db):
     """Получает данные за последние 30 дней из базы данных."""
     extractor = Last30DaysExtractor(db)
@@ -379,6 +712,6 @@ app.include_router(router_predict)
 if __name__ == "__main__":
     uvicorn.run(
         app,
-        host=APP_CONFIG['host'],
-        port=APP_CONFIG['port']
+        host=settings.app['host'],
+        port=settings.app['port']
     )
\ No newline at end of file
@@ -6,21 +6,19 @@ import pandas as pd
 import numpy as np
 import logging
 from Preprocessing import Preprocessing_data
-from Sales_recovery import Recovery_sales
-from First_model_learning import First_learning_model
-from Next_model_predict import Use_model_predict
 from DB_Connector import DBConnector
 from DB_operations import Create_tables
 from DB_operations import DataLoader
 from DB_operations import get_db_connection
 from DB_operations import ModelStorage
 from DB_operations import Last30DaysExtractor
-from config import DB_CONFIG, DATA_CONFIG
+from DB_operations import SeasonalityStorage
+from Feature_store import LagFeatureStore
+from config import settings
 
 # Настройка логирования
-from config import LOG_LEVEL
 logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL, logging.INFO),
+    level=getattr(logging, settings.log_level, logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -35,10 +33,18 @@ def create_tables(db):
     create_tables_obj.create_recovery_data_table(db)
     create_tables_obj.saved_ml_data_table(db)
     create_tables_obj.create_forecast_table(db)
+    create_tables_obj.create_metrics_table(db)
+    create_tables_obj.create_processed_files_table(db)
+    create_tables_obj.create_seasonality_table(db)
+    create_tables_obj.create_lag_features_table(db)
     logger.info("Все таблицы успешно созданы")
 
 def first_model_learn(df_first, db):
     """Обучает модель на исходных данных."""
+    # Модули с catboost, lightgbm и sklearn импортируются только для обучения и прогноза
+    from Sales_recovery import Recovery_sales
+    from First_model_learning import First_learning_model
+
     df_first_copy = df_first.copy()
     df_first_copy = df_first_copy.sort_values(by=['Дата', 'Магазин', 'Товар'])
 
@@ -54,7 +60,8 @@ def first_model_learn(df_first, db):
 
     # Предобработка данных
     logger.info("Предобработка данных...")
-    df_clean = processor.first_preprocess_data(df_first_copy)
+    df_clean = processor.first_preprocess_data(df_first_copy, chunk_stores=settings.preprocess['chunk_stores'])
+    SeasonalityStorage(db).save(processor.seasonality_table(df_clean))
 
     # Восстановление продаж
     logger.info("Восстановление продаж...")
@@ -62,15 +69,26 @@ def first_model_learn(df_first, db):
 
     logger.info("Загрузка восстановленных данных в локальную БД...")
     data_loader.load_to_recovery_table(df_recovery, batch_size=100000)
+    LagFeatureStore(db).update(df_recovery)
     logger.info("Восстановленные данные успешно загружены в локальную БД!")
 
     # Обучение модели
     logger.info("Обучение модели...")
-    df_preduction = first_model_learn_obj.first_learning_model(df_recovery, db)
+    df_preduction = first_model_learn_obj.first_learning_model(
+        df_recovery, db,
+        scale_features=settings.train['scale_features'],
+        thread_count=settings.train['thread_count'],
+        used_ram_limit=settings.train['used_ram_limit'],
+        border_count=settings.train['border_count'],
+        pool_cache_dir=settings.train['pool_cache_dir']
+    )
     logger.info("Обучение модели завершено")
 
 def use_model_predict(df_first, df_next, df_season_sales, db):
     """Использует обученную модель для предсказания."""
+    from Sales_recovery import Recovery_sales
+    from Next_model_predict import Use_model_predict
+
     df_first_copy = df_first.copy()
     df_next_copy = df_next.copy()
     df_season_sales_copy = df_season_sales.copy()
@@ -87,7 +105,8 @@ def use_model_predict(df_first, df_next, df_season_sales, db):
 
     # Предобработка данных
     logger.info("Предобработка новых данных...")
-    df_clean = processor.next_preprocess_data(df_first_copy, df_next_copy, df_season_sales_copy)
+    seasonality = SeasonalityStorage(db).load()
+    df_clean = processor.next_preprocess_data(df_first_copy, df_next_copy, df_season_sales_copy, seasonality)
 
     # Восстановление продаж
     logger.info("Восстановление продаж для новых данных...")
@@ -97,9 +116,19 @@ def use_model_predict(df_first, df_next, df_season_sales, db):
     data_loader.load_to_recovery_table(df_recovery, batch_size=100000)
     logger.info("Восстановленные данные успешно загружены в локальную БД!")
 
+    # Лаговые признаки новых строк сохранены при предыдущем восстановлении
+    lag_store = LagFeatureStore(db)
+    lag_features = lag_store.load(df_recovery)
+    lag_store.update(df_season_sales_copy, df_recovery)
+
     # Предсказание
     logger.info("Выполнение предсказания...")
-    df_preduction = use_model_prediction.use_model_predict(df_first_copy, df_recovery, df_season_sales_copy, db)
+    df_preduction = use_model_prediction.use_model_predict(
+        df_first_copy, df_recovery, df_season_sales_copy, db,
+        thread_count=settings.predict['thread_count'],
+        batch_size=settings.predict['batch_size'],
+        lag_features=lag_features
+    )
 
     # Загрузка прогноза в БД
     logger.info("Загрузка прогноза в локальную БД...")
@@ -112,15 +141,15 @@ def main():
     try:
         # Инициализация подключения к локальной БД
         logger.info("Подключение к базе данных...")
-        db = get_db_connection(DB_CONFIG)
+        db = get_db_connection(settings.db)
         
         # Создание таблиц в локальной БД
         create_tables(db)
 
         # Загрузка данных
         logger.info("Загрузка данных из CSV файлов...")
-        train_path = DATA_CONFIG['train_data_path']
-        test_path = DATA_CONFIG['test_data_path']
+        train_path = settings.data['train_data_path']
+        test_path = settings.data['test_data_path']
         logger.info(f"Загрузка обучающих данных из: {train_path}")
         logger.info(f"Загрузка тестовых данных из: {test_path}")
         df_first = pd.read_csv(train_path, parse_dates=["Дата"])
@@ -0,0 +1,29 @@
+"""
+Смоук-проверка создания таблиц: каждый метод Create_tables, который вызывает
+main_local.create_tables (и эндпоинт /main/create-tables), существует.
+БД не нужна - вызовы читаются из исходного кода main_local.
+"""
+import ast
+import os
+
+from DB_operations import Create_tables
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_tables_calls():
+    """Имена методов, вызываемых в main_local.create_tables"""
+    with open(os.path.join(PROJECT_ROOT, 'main_local.py'), encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    function = next(node for node in tree.body
+                    if isinstance(node, ast.FunctionDef) and node.name == 'create_tables')
+    return [node.func.attr for node in ast.walk(function)
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == 'create_tables_obj']
+
+
+def test_create_tables_methods_exist():
+    calls = create_tables_calls()
+    assert 'create_seasonality_table' in calls
+    missing = [name for name in calls if not callable(getattr(Create_tables, name, None))]
+    assert not missing, f"В Create_tables нет методов: {missing}"
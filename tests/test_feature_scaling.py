@@ -0,0 +1,30 @@
+"""
+Проверка отказа от масштабирования: модель, обученная без масштабирования
+(scale_features=False), дает те же предсказания, что и с масштабированием.
+CatBoost разбивает числовые признаки по порогам, монотонное преобразование
+на разбиения не влияет.
+"""
+import numpy as np
+
+from First_model_learning import First_learning_model
+from benchmarks.bench_predict import train_small_model
+from benchmarks.synthetic_data import make_recovery_frame
+
+
+def test_scale_features_does_not_change_predictions():
+    df_all = make_recovery_frame(3, 10, 60)
+    split_date = df_all['Дата'].max() - np.timedelta64(10, 'D')
+    learner = First_learning_model()
+    df = learner.add_lag_values(learner.first_data_type_refactor(df_all))
+
+    predictions = {}
+    for scale_features in (True, False):
+        model, encoders = train_small_model(df_all[df_all['Дата'] <= split_date], 50,
+                                            scale_features=scale_features)
+        (df_eval, numerical_columns, cat_columns, *_) = learner.encoding_futures(df, scale_features=scale_features)
+        df_eval = df_eval[df_eval['Дата'] > split_date]
+        pool = learner.make_pool(df_eval, None, numerical_columns, cat_columns, encoders[-1])
+        predictions[scale_features] = model.predict(pool)
+
+    assert len(predictions[True]) > 0
+    np.testing.assert_allclose(predictions[True], predictions[False], rtol=1e-3, atol=1e-3)
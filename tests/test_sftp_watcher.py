@@ -0,0 +1,141 @@
+"""
+Проверка SFTPWatcher на заглушках: SFTP директория и учет обработанных файлов
+хранятся в памяти, блокирующие вызовы выполняются в event loop без потоков.
+"""
+import time
+import asyncio
+
+from SFTP_watcher import SFTPWatcher
+
+
+class FakeConnector:
+    def __init__(self, files):
+        self.files = files
+
+    def list_files(self, directory):
+        return list(self.files)
+
+    def get_file_info(self, path):
+        size, mtime = self.files[path.rsplit('/', 1)[-1]]
+        return {'size': size, 'modified_time': mtime, 'permissions': 0o100644}
+
+
+class FakeLoader:
+    def __init__(self, files):
+        self.sftp_connector = FakeConnector(files)
+
+    def connect(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+
+class FakeRegistry:
+    """Учет файлов в памяти с семантикой ProcessedFilesRegistry"""
+
+    def __init__(self):
+        self.state = {}
+
+    def load(self, file_paths):
+        return {key: value for key, value in self.state.items() if key[0] in file_paths}
+
+    def mark(self, file_path, file_size, file_mtime, status, rows_count=None, error=None):
+        key = (file_path, file_size, file_mtime)
+        _, attempts = self.state.get(key, (None, 0))
+        self.state[key] = (status, attempts + 1)
+
+
+async def run_inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def make_watcher(files, process_file, registry=None, max_attempts=3):
+    return SFTPWatcher(lambda: FakeLoader(files), registry or FakeRegistry(), process_file,
+                       directory='/upload', settle_seconds=30, max_attempts=max_attempts,
+                       run_blocking=run_inline)
+
+
+async def poll(watcher):
+    ready = await watcher.poll_once()
+    await watcher.drain()
+    return [path for path, _, _ in ready]
+
+
+def test_growing_file_is_skipped_until_it_settles():
+    now = int(time.time())
+    files = {'sales.csv': (100, now)}
+    processed = []
+
+    async def process_file(path):
+        processed.append(path)
+        return 1
+
+    async def scenario():
+        watcher = make_watcher(files, process_file)
+        assert await poll(watcher) == []
+        files['sales.csv'] = (200, now + 1)
+        assert await poll(watcher) == []
+        # Размер и mtime не изменились с прошлого опроса - загрузка завершена
+        assert await poll(watcher) == ['/upload/sales.csv']
+
+    asyncio.run(scenario())
+    assert processed == ['/upload/sales.csv']
+
+
+def test_settled_file_is_processed_once():
+    files = {'sales.csv': (100, int(time.time()) - 3600)}
+    processed = []
+
+    async def process_file(path):
+        processed.append(path)
+        return 10
+
+    async def scenario():
+        registry = FakeRegistry()
+        watcher = make_watcher(files, process_file, registry)
+        assert await poll(watcher) == ['/upload/sales.csv']
+        assert await poll(watcher) == []
+        return registry
+
+    registry = asyncio.run(scenario())
+    assert processed == ['/upload/sales.csv']
+    assert registry.state[('/upload/sales.csv', 100, files['sales.csv'][1])] == ('done', 1)
+
+
+def test_failed_file_is_retried_up_to_max_attempts():
+    files = {'sales.csv': (100, int(time.time()) - 3600)}
+    calls = []
+
+    async def process_file(path):
+        calls.append(path)
+        raise ValueError("некорректный файл")
+
+    async def scenario():
+        watcher = make_watcher(files, process_file, max_attempts=2)
+        for _ in range(4):
+            await poll(watcher)
+        return watcher
+
+    watcher = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert watcher.failed == 2
+    assert watcher.processed == 0
+
+
+def test_done_file_is_not_reprocessed():
+    files = {'sales.csv': (100, int(time.time()) - 3600)}
+    registry = FakeRegistry()
+    registry.mark('/upload/sales.csv', 100, files['sales.csv'][1], 'done', rows_count=5)
+    processed = []
+
+    async def process_file(path):
+        processed.append(path)
+        return 1
+
+    async def scenario():
+        watcher = make_watcher(files, process_file, registry)
+        assert await poll(watcher) == []
+
+    asyncio.run(scenario())
+    assert processed == []